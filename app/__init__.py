@@ -1,16 +1,49 @@
-from flask import Flask
-import logging
+from flask import Flask, request
+from flask.json.provider import DefaultJSONProvider
 
-# Set up basic configuration
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s %(levelname)s %(name)s %(threadName)s : %(message)s')
+from .logging_config import configure_logging
 
 
-def create_app():
+class JSONProvider(DefaultJSONProvider):
+    """Encode values JSON has no type for (e.g. BLOB columns) as strings, like the streamed responses do"""
+
+    @staticmethod
+    def default(o):
+        try:
+            return DefaultJSONProvider.default(o)
+        except TypeError:
+            return str(o)
+
+
+def create_app(warmup=True, shared_log_file=False):
+    # Logging is set up here (and in the command line tools), not on import, so settings
+    # overridden before the app is created apply to it. Server workers sharing one log
+    # file (shared_log_file) leave its rotation to an external rotator.
+    configure_logging(shared_file=shared_log_file)
     app = Flask(__name__)
+    app.json = JSONProvider(app)
     
     # Register blueprints or routes
     from .views import main as main_blueprint
     app.register_blueprint(main_blueprint)
     
+    # Request ids and latency metrics for every request (see /metrics)
+    from .metrics import start_request, finish_request, get_request_id
+    
+    @app.before_request
+    def begin_request_metrics():
+        start_request(request.headers.get('X-Request-ID'))
+    
+    @app.after_request
+    def end_request_metrics(response):
+        finish_request(request.endpoint, request.method, response.status_code)
+        response.headers['X-Request-ID'] = get_request_id()
+        return response
+    
+    # Optionally pull the hot indexes into the page cache before traffic arrives
+    # (the production server warms up once, before forking its workers)
+    if warmup:
+        from .db import start_warmup
+        start_warmup()
+    
     return app
\ No newline at end of file
@@ -0,0 +1,317 @@
+import argparse
+import logging
+import sqlite3
+import time
+from datetime import datetime
+
+from .db import get_database_path
+
+logger = logging.getLogger(__name__)
+
+# FTS5 trigram tables over the name/title columns, stored as external-content indexes
+# keyed on the source table's rowid so the text is not duplicated
+FTS_TABLES = {
+    "people_fts": ("people", ["name"]),
+    "titles_fts": ("titles", ["primary_title", "original_title"]),
+    "akas_fts": ("akas", ["title"]),
+}
+
+# Summary tables built by `aggregates`; each is dropped and recreated from the base tables
+AGGREGATE_TABLES = {
+    # Credits per person, crew category, title type and release year (career charts)
+    "person_year_counts": ("""
+        CREATE TABLE person_year_counts (
+            person_id VARCHAR NOT NULL,
+            category VARCHAR NOT NULL,
+            type VARCHAR NOT NULL,
+            year INTEGER NOT NULL,
+            title_count INTEGER NOT NULL,
+            PRIMARY KEY (person_id, category, type, year)
+        ) WITHOUT ROWID
+    """, """
+        INSERT INTO person_year_counts (person_id, category, type, year, title_count)
+        SELECT c.person_id, c.category, t.type, t.premiered, COUNT(*)
+        FROM crew c
+        JOIN titles t ON c.title_id = t.title_id
+        WHERE c.person_id IS NOT NULL AND c.category IS NOT NULL
+        AND t.type IS NOT NULL AND t.premiered IS NOT NULL
+        GROUP BY c.person_id, c.category, t.type, t.premiered
+    """, []),
+    # Movie filmography summary per person and crew category
+    "person_career_stats": ("""
+        CREATE TABLE person_career_stats (
+            person_id VARCHAR NOT NULL,
+            category VARCHAR NOT NULL,
+            title_count INTEGER NOT NULL,
+            first_year INTEGER,
+            last_year INTEGER,
+            rated_titles INTEGER NOT NULL,
+            avg_rating REAL,
+            total_votes INTEGER,
+            PRIMARY KEY (person_id, category)
+        ) WITHOUT ROWID
+    """, """
+        INSERT INTO person_career_stats
+        SELECT c.person_id, c.category, COUNT(DISTINCT t.title_id), MIN(t.premiered), MAX(t.premiered),
+               COUNT(DISTINCT r.title_id), AVG(r.rating), SUM(r.votes)
+        FROM crew c
+        JOIN titles t ON c.title_id = t.title_id
+        LEFT JOIN ratings r ON t.title_id = r.title_id
+        WHERE c.person_id IS NOT NULL AND c.category IS NOT NULL
+        AND t.type IN ('movie', 'tvMovie')
+        GROUP BY c.person_id, c.category
+    """, ["CREATE INDEX ix_person_career_stats_category ON person_career_stats (category, title_count)"]),
+    # Title counts and ratings per release decade and title type
+    "decade_type_stats": ("""
+        CREATE TABLE decade_type_stats (
+            decade INTEGER NOT NULL,
+            type VARCHAR NOT NULL,
+            title_count INTEGER NOT NULL,
+            rated_titles INTEGER NOT NULL,
+            avg_rating REAL,
+            avg_votes REAL,
+            total_votes INTEGER,
+            PRIMARY KEY (decade, type)
+        ) WITHOUT ROWID
+    """, """
+        INSERT INTO decade_type_stats
+        SELECT (t.premiered / 10) * 10, t.type, COUNT(*), COUNT(r.rating), AVG(r.rating), AVG(r.votes), SUM(r.votes)
+        FROM titles t
+        LEFT JOIN ratings r ON t.title_id = r.title_id
+        WHERE t.premiered IS NOT NULL AND t.type IS NOT NULL
+        GROUP BY (t.premiered / 10) * 10, t.type
+    """, []),
+    # Title counts and ratings per genre, title type and release decade (needs title_genres)
+    "genre_stats": ("""
+        CREATE TABLE genre_stats (
+            genre VARCHAR NOT NULL,
+            type VARCHAR NOT NULL,
+            decade INTEGER NOT NULL,
+            title_count INTEGER NOT NULL,
+            rated_titles INTEGER NOT NULL,
+            avg_rating REAL,
+            total_votes INTEGER,
+            PRIMARY KEY (genre, type, decade)
+        ) WITHOUT ROWID
+    """, """
+        INSERT INTO genre_stats
+        SELECT g.genre, t.type, (t.premiered / 10) * 10, COUNT(*), COUNT(r.rating), AVG(r.rating), SUM(r.votes)
+        FROM genres g
+        JOIN title_genres tg ON tg.genre_id = g.genre_id
+        JOIN titles t ON t.title_id = tg.title_id
+        LEFT JOIN ratings r ON t.title_id = r.title_id
+        WHERE t.premiered IS NOT NULL AND t.type IS NOT NULL
+        GROUP BY g.genre, t.type, (t.premiered / 10) * 10
+    """, []),
+}
+
+# Base tables each build step reads; their fingerprints are recorded to detect stale steps
+STEP_SOURCES = {
+    "fts": ["people", "titles", "akas"],
+    "genres": ["titles"],
+    "aggregates": ["people", "titles", "crew", "ratings"],
+}
+
+
+def connect_writable(db_path):
+    """Open the database for a build step (the app itself only ever opens it read-only)"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -1048576")
+    return conn
+
+
+def build_fts(conn):
+    """
+    (Re)build the FTS5 trigram indexes. Trigram tokenization matches arbitrary substrings,
+    which is what the LIKE '%...%' lookups they replace need. The tables are external
+    content indexes on rowid, so rebuild them after re-importing or VACUUMing the database.
+    """
+    timings = {}
+    for fts_table, (source_table, columns) in FTS_TABLES.items():
+        start = time.perf_counter()
+        column_list = ", ".join(columns)
+        with conn:
+            conn.execute(f"DROP TABLE IF EXISTS {fts_table}")
+            conn.execute(
+                f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+                f"{column_list}, content='{source_table}', content_rowid='rowid', tokenize='trigram')"
+            )
+            conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+            conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('optimize')")
+        timings[fts_table] = time.perf_counter() - start
+        logger.info(f"Built {fts_table} over {source_table}({column_list}) in {timings[fts_table]:.1f}s")
+    return timings
+
+
+def build_genres(conn):
+    """
+    (Re)build the genre bridge tables from the comma-joined titles.genres column:
+    genres maps each genre name to a small integer code and title_genres holds one
+    (genre_id, title_id) row per title and genre, clustered by genre with a reverse
+    index on title_id.
+    """
+    start = time.perf_counter()
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS title_genres")
+        conn.execute("DROP TABLE IF EXISTS genres")
+        conn.execute("""
+            CREATE TEMP TABLE split_genres AS
+            WITH RECURSIVE split(title_id, genre, rest) AS (
+                SELECT title_id, '', genres || ',' FROM titles WHERE genres IS NOT NULL AND genres != ''
+                UNION ALL
+                SELECT title_id, trim(substr(rest, 1, instr(rest, ',') - 1)), substr(rest, instr(rest, ',') + 1)
+                FROM split WHERE rest != ''
+            )
+            SELECT title_id, genre FROM split WHERE genre != ''
+        """)
+        conn.execute("CREATE TABLE genres (genre_id INTEGER PRIMARY KEY, genre VARCHAR NOT NULL UNIQUE)")
+        conn.execute("INSERT INTO genres (genre) SELECT DISTINCT genre FROM split_genres ORDER BY genre")
+        conn.execute("""
+            CREATE TABLE title_genres (
+                genre_id INTEGER NOT NULL,
+                title_id VARCHAR NOT NULL,
+                PRIMARY KEY (genre_id, title_id)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO title_genres (genre_id, title_id)
+            SELECT g.genre_id, s.title_id FROM split_genres s JOIN genres g ON g.genre = s.genre
+            ORDER BY g.genre_id, s.title_id
+        """)
+        conn.execute("CREATE INDEX ix_title_genres_title_id ON title_genres (title_id, genre_id)")
+        conn.execute("DROP TABLE split_genres")
+    conn.execute("ANALYZE genres")
+    conn.execute("ANALYZE title_genres")
+
+    genre_count = conn.execute("SELECT COUNT(*) FROM genres").fetchone()[0]
+    row_count = conn.execute("SELECT COUNT(*) FROM title_genres").fetchone()[0]
+    elapsed = time.perf_counter() - start
+    logger.info(f"Built title_genres ({row_count} rows, {genre_count} genres) in {elapsed:.1f}s")
+    return {"title_genres": elapsed}
+
+
+def build_aggregates(conn):
+    """
+    (Re)build the materialized summary tables the rewrite layer and prompt use for
+    per-person, per-decade and per-genre analyses. genre_stats is derived from the
+    bridge tables, so they are built first if missing.
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if not {"genres", "title_genres"} <= tables:
+        build_genres(conn)
+        record_build(conn, "genres")
+
+    timings = {}
+    for table, (create_sql, insert_sql, index_sqls) in AGGREGATE_TABLES.items():
+        start = time.perf_counter()
+        with conn:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(create_sql)
+            conn.execute(insert_sql)
+            for index_sql in index_sqls:
+                conn.execute(index_sql)
+        conn.execute(f"ANALYZE {table}")
+        timings[table] = time.perf_counter() - start
+        row_count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        logger.info(f"Built {table} ({row_count} rows) in {timings[table]:.1f}s")
+    return timings
+
+
+def source_fingerprint(conn, step):
+    """Cheap fingerprint of the base tables a step reads (highest rowid of each)"""
+    return ",".join(
+        f"{table}:{conn.execute(f'SELECT MAX(rowid) FROM {table}').fetchone()[0]}"
+        for table in STEP_SOURCES[step]
+    )
+
+
+def record_build(conn, step):
+    """Remember when a step ran and which base data it was built from"""
+    with conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS build_info (
+                step VARCHAR PRIMARY KEY,
+                built_at VARCHAR NOT NULL,
+                source_fingerprint VARCHAR NOT NULL
+            )
+        """)
+        conn.execute(
+            "INSERT OR REPLACE INTO build_info (step, built_at, source_fingerprint) VALUES (?, ?, ?)",
+            (step, datetime.now().isoformat(timespec="seconds"), source_fingerprint(conn, step))
+        )
+
+
+def stale_steps(conn):
+    """Build steps that never ran or whose base tables changed since they ran"""
+    has_info = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'build_info'").fetchone()
+    recorded = dict(conn.execute("SELECT step, source_fingerprint FROM build_info")) if has_info else {}
+    return [step for step in BUILD_STEPS if recorded.get(step) != source_fingerprint(conn, step)]
+
+
+def show_status(conn):
+    """Log when each build step last ran and whether it is stale"""
+    stale = set(stale_steps(conn))
+    has_info = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'build_info'").fetchone()
+    built = dict(conn.execute("SELECT step, built_at FROM build_info")) if has_info else {}
+    for step in BUILD_STEPS:
+        state = "stale" if step in stale else "up to date"
+        logger.info(f"{step}: built {built.get(step, 'never')}, {state}")
+
+
+def refresh(conn, force=False):
+    """Rebuild every derived step (only stale ones unless forced); run after each import"""
+    steps = list(BUILD_STEPS) if force else stale_steps(conn)
+    if not steps:
+        logger.info("All derived tables are up to date")
+    timings = {}
+    for step in steps:
+        timings.update(BUILD_STEPS[step](conn))
+        record_build(conn, step)
+    return timings
+
+
+# Build steps in dependency order
+BUILD_STEPS = {
+    "fts": build_fts,
+    "genres": build_genres,
+    "aggregates": build_aggregates,
+}
+
+COMMANDS = {
+    **BUILD_STEPS,
+    "refresh": refresh,
+    "status": show_status,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.build",
+        description="Build derived tables and indexes in the IMDb database. Stop the app "
+                    "first: it opens the database as immutable and must be restarted afterwards.",
+    )
+    parser.add_argument("command", choices=sorted(COMMANDS), help="build step to run")
+    parser.add_argument("--db", default=None, help="database path (defaults to DATABASE_PATH from config.py)")
+    parser.add_argument("--force", action="store_true", help="refresh: rebuild every step, not only stale ones")
+    args = parser.parse_args(argv)
+    from .logging_config import configure_logging
+    configure_logging()
+
+    db_path = args.db or get_database_path()
+    start = time.perf_counter()
+    conn = connect_writable(db_path)
+    try:
+        if args.command == "refresh":
+            refresh(conn, force=args.force)
+        else:
+            COMMANDS[args.command](conn)
+            if args.command in BUILD_STEPS:
+                record_build(conn, args.command)
+    finally:
+        conn.close()
+    logger.info(f"'{args.command}' finished on {db_path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+import logging
+import math
+import uuid
+from collections import Counter
+
+from .settings import get_setting
+from .tool_results import COUNT_COLUMNS, MULTI_VALUE_COLUMNS, YEAR_COLUMNS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_POINTS = 200
+DEFAULT_HISTOGRAM_BINS = 10
+# Series beyond this many (by total) are merged into "Other"
+MAX_SERIES = 8
+
+CHART_TYPES = ("bar", "line", "pie", "histogram", "stacked_bar", "multi_line")
+# Chart types drawn from the rows of a generated query rather than a person's per-year counts
+ROW_CHART_TYPES = ("histogram", "stacked_bar", "multi_line")
+SERIES_CHART_TYPES = ("stacked_bar", "multi_line")
+BUCKETS = ("year", "decade")
+
+# Column names looked for, in order, when a chart does not name its columns
+X_COLUMNS = ("year", "x") + tuple(column for column in YEAR_COLUMNS if column != "year") + ("label", "decade")
+Y_COLUMNS = ("y",) + COUNT_COLUMNS + ("value", "total")
+SERIES_COLUMNS = ("series", "category", "genres", "genre", "type")
+HISTOGRAM_COLUMNS = ("rating", "votes", "runtime_minutes", "value", "y")
+
+PRIMARY_COLOR = (54, 162, 235)
+PALETTE = [
+    (54, 162, 235), (255, 99, 132), (255, 205, 86), (75, 192, 192),
+    (153, 102, 255), (255, 159, 64), (46, 204, 113), (201, 203, 207),
+]
+
+
+def rgba(color, alpha):
+    return f"rgba({color[0]}, {color[1]}, {color[2]}, {alpha})"
+
+
+def to_number(value):
+    """value as a number, or None for NULLs, IMDb's '\\N' and other non-numbers"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if isinstance(value, float) and math.isnan(value) else value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def tidy(value):
+    """Whole totals as ints (numpy sums are floats), others rounded for the wire"""
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 2)
+
+
+def first_column(candidates, column_names):
+    return next((column for column in candidates if column in column_names), None)
+
+
+def series_name(value, column):
+    """The series a row belongs to; multi-value columns (genres) use their first value"""
+    if value is None or value == "" or value == "\\N":
+        return "Unknown"
+    if column in MULTI_VALUE_COLUMNS:
+        return str(value).split(",")[0].strip() or "Unknown"
+    return str(value)
+
+
+def bucket_label(start, bucket):
+    return f"{start}s" if bucket == "decade" else str(start)
+
+
+def format_edge(value):
+    return f"{value:,.0f}" if abs(value) >= 1000 else f"{round(value, 2):g}"
+
+
+# Binning of materialized rows: numpy when it is installed, plain Python otherwise
+
+def numeric_column(rows, column):
+    """A column as floats, NaN where missing (numpy array) or None (list without numpy)"""
+    values = [row.get(column) for row in rows]
+    if np is None:
+        return [to_number(value) for value in values]
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.array([to_number(value) if to_number(value) is not None else np.nan for value in values], dtype=float)
+
+
+def is_numeric_axis(rows, column):
+    """Whether every present value of a column is a number (years) rather than a category"""
+    present = [row.get(column) for row in rows if row.get(column) not in (None, "", "\\N")]
+    return bool(present) and all(to_number(value) is not None for value in present)
+
+
+def aggregate_time_series(rows, x_column, bucket="year", weight_column=None, series_column=None):
+    """
+    Totals per year or decade start, per series: (starts, {series: totals aligned with starts}).
+    Rows count 1 each unless weight_column holds pre-aggregated counts; rows without a year
+    are skipped. Without series_column everything is one series named None.
+    """
+    years = numeric_column(rows, x_column)
+    weights = numeric_column(rows, weight_column) if weight_column else None
+    names = [series_name(row.get(series_column), series_column) for row in rows] if series_column else None
+
+    if np is not None:
+        keep = ~np.isnan(years)
+        starts = years[keep].astype(np.int64)
+        if bucket == "decade":
+            starts = starts // 10 * 10
+        weights = np.nan_to_num(weights[keep]) if weights is not None else np.ones(len(starts))
+        distinct, x_index = np.unique(starts, return_inverse=True)
+        if names is None:
+            totals = np.bincount(x_index, weights=weights, minlength=len(distinct))
+            return distinct.tolist(), {None: [tidy(total) for total in totals]}
+        series, series_index = np.unique(np.array(names, dtype=object)[keep].astype(str), return_inverse=True)
+        totals = np.bincount(series_index * len(distinct) + x_index, weights=weights,
+                             minlength=len(series) * len(distinct)).reshape(len(series), len(distinct))
+        return distinct.tolist(), {name: [tidy(total) for total in row] for name, row in zip(series.tolist(), totals)}
+
+    totals = Counter()
+    for i, year in enumerate(years):
+        if year is None:
+            continue
+        start = int(year) // 10 * 10 if bucket == "decade" else int(year)
+        weight = (weights[i] or 0) if weights is not None else 1
+        totals[(names[i] if names else None, start)] += weight
+    starts = sorted({start for _, start in totals})
+    series = sorted({name for name, _ in totals}, key=lambda name: (name is None, name or "")) if names else [None]
+    return starts, {name: [tidy(totals.get((name, start), 0)) for start in starts] for name in series}
+
+
+def aggregate_categories(rows, x_column, weight_column=None, series_column=None):
+    """Totals per category value (in first-seen order), per series, for non-time x axes"""
+    totals = Counter()
+    labels = {}
+    for row in rows:
+        label = str(row.get(x_column, ""))
+        labels.setdefault(label, None)
+        weight = to_number(row.get(weight_column)) if weight_column else 1
+        name = series_name(row.get(series_column), series_column) if series_column else None
+        totals[(name, label)] += weight or 0
+    series = sorted({name for name, _ in totals}, key=lambda name: (name is None, name or ""))
+    return list(labels), {name: [tidy(totals.get((name, label), 0)) for label in labels] for name in series}
+
+
+def histogram_counts(values, bins):
+    """(bin labels, counts) for equal-width bins over the range of the present values"""
+    if np is not None:
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return [], []
+        low, high = float(values.min()), float(values.max())
+        if low == high:
+            return [format_edge(low)], [int(len(values))]
+        # Same binning as histogram_sql(), so pushed-down and in-memory charts agree
+        index = np.minimum(((values - low) * bins / (high - low)).astype(np.int64), bins - 1)
+        counts = np.bincount(index, minlength=bins)
+        return histogram_labels(bin_edges(low, high, bins)), counts.tolist()
+
+    values = [value for value in values if value is not None]
+    if not values:
+        return [], []
+    low, high = min(values), max(values)
+    if low == high:
+        return [format_edge(low)], [len(values)]
+    counts = [0] * bins
+    for value in values:
+        counts[min(int((value - low) * bins / (high - low)), bins - 1)] += 1
+    return histogram_labels(bin_edges(low, high, bins)), counts
+
+
+def bin_edges(low, high, bins):
+    return [low + (high - low) * i / bins for i in range(bins + 1)]
+
+
+def histogram_labels(edges):
+    return [f"{format_edge(low)}–{format_edge(high)}" for low, high in zip(edges, edges[1:])]
+
+
+def limit_series(series, max_series=MAX_SERIES):
+    """The largest series by total, with the rest summed into "Other" """
+    if len(series) <= max_series:
+        return series
+    ranked = sorted(series, key=lambda name: sum(series[name]), reverse=True)
+    kept = {name: series[name] for name in ranked[:max_series - 1]}
+    kept["Other"] = [tidy(sum(values)) for values in zip(*(series[name] for name in ranked[max_series - 1:]))]
+    return kept
+
+
+# Downsampling
+
+def lttb_indices(xs, ys, threshold):
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps: the first and last points and,
+    from each of threshold - 2 buckets in between, the one forming the largest triangle with
+    the previously kept point and the next bucket's average. Peaks and troughs survive, unlike
+    with plain striding.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    if np is not None:
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if np is not None:
+            avg_x, avg_y = xs[end:next_end].mean(), ys[end:next_end].mean()
+            areas = np.abs((xs[a] - avg_x) * (ys[start:end] - ys[a]) - (xs[a] - xs[start:end]) * (avg_y - ys[a]))
+            a = start + int(areas.argmax())
+        else:
+            count = next_end - end
+            avg_x, avg_y = sum(xs[end:next_end]) / count, sum(ys[end:next_end]) / count
+            a = max(range(start, end), key=lambda j: abs(
+                (xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a])))
+        selected.append(a)
+    selected.append(n - 1)
+    return selected
+
+
+def downsample(xs, series, max_points):
+    """(xs, series) cut down to about max_points x values, keeping every series' shape"""
+    if not max_points or len(xs) <= max_points:
+        return xs, series
+    positions = xs if all(isinstance(x, (int, float)) for x in xs) else list(range(len(xs)))
+    per_series = max(3, max_points // len(series))
+    keep = sorted({i for values in series.values() for i in lttb_indices(positions, values, per_series)})
+    logger.debug(f"Downsampled chart from {len(xs)} to {len(keep)} points")
+    return [xs[i] for i in keep], {name: [values[i] for i in keep] for name, values in series.items()}
+
+
+# SQL pushdown: aggregate a statement's full result inside SQLite instead of fetching its rows
+
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def source_sql(sql_query):
+    return sql_query.strip().rstrip(";").strip()
+
+
+def time_series_sql(sql_query, x_column, bucket="year", weight_column=None, series_column=None):
+    """
+    A statement totalling sql_query's rows per year or decade (and per series) in SQLite, with
+    columns x, series and total. It takes the same bind parameters as sql_query.
+    """
+    x = quote_identifier(x_column)
+    start = f"CAST({x} AS INTEGER) / 10 * 10" if bucket == "decade" else f"CAST({x} AS INTEGER)"
+    total = f"SUM({quote_identifier(weight_column)})" if weight_column else "COUNT(*)"
+    if not series_column:
+        series = "NULL"
+    elif series_column in MULTI_VALUE_COLUMNS:
+        column = quote_identifier(series_column)
+        series = f"CASE WHEN instr({column}, ',') > 0 THEN substr({column}, 1, instr({column}, ',') - 1) ELSE {column} END"
+    else:
+        series = f"CAST({quote_identifier(series_column)} AS TEXT)"
+    return (f"SELECT {start} AS x, {series} AS series, {total} AS total "
+            f"FROM ({source_sql(sql_query)}) WHERE CAST({x} AS INTEGER) > 0 GROUP BY 1, 2 ORDER BY 1, 2")
+
+
+def histogram_sql(sql_query, value_column, bins):
+    """
+    A statement counting sql_query's rows per equal-width bin of value_column in SQLite, with
+    columns bin, total, low and high. It takes the same bind parameters as sql_query.
+    """
+    v = quote_identifier(value_column)
+    bins = int(bins)
+    # Window functions take the bounds in the same pass, instead of a join against a second scan
+    return (f"SELECT CASE WHEN high = low THEN 0 ELSE MIN(CAST((value - low) * {bins} / (high - low) AS INTEGER), {bins - 1}) END AS bin, "
+            f"COUNT(*) AS total, MIN(low) AS low, MIN(high) AS high "
+            f"FROM (SELECT {v} AS value, MIN({v}) OVER () AS low, MAX({v}) OVER () AS high "
+            f"FROM ({source_sql(sql_query)}) WHERE typeof({v}) IN ('integer', 'real')) "
+            f"GROUP BY 1 ORDER BY 1")
+
+
+def histogram_from_bins(rows, bins):
+    """(bin labels, counts) from histogram_sql() rows, with empty bins filled in"""
+    if not rows:
+        return [], []
+    low, high = rows[0]["low"], rows[0]["high"]
+    if low == high:
+        return [format_edge(low)], [rows[0]["total"]]
+    counts = [0] * bins
+    for row in rows:
+        counts[row["bin"]] = row["total"]
+    return histogram_labels(bin_edges(low, high, bins)), counts
+
+
+# Chart.js configs
+
+def chart_config(chart_type, labels, datasets, title, x_label="", y_label=""):
+    """Chart.js config; datasets is [(label, values), ...]"""
+    if chart_type == "pie":
+        label, values = datasets[0]
+        return {
+            "type": "pie",
+            "data": {
+                "labels": labels,
+                "datasets": [{
+                    "data": values,
+                    "backgroundColor": [rgba(PALETTE[i % len(PALETTE)], 0.6) for i in range(len(labels))]
+                }]
+            },
+            "options": {
+                "responsive": True,
+                "plugins": {"title": {"display": True, "text": title}}
+            }
+        }
+
+    line = chart_type in ("line", "multi_line")
+    chart_datasets = []
+    for i, (label, values) in enumerate(datasets):
+        color = PRIMARY_COLOR if len(datasets) == 1 else PALETTE[i % len(PALETTE)]
+        dataset = {
+            "label": label,
+            "data": values,
+            "backgroundColor": rgba(color, 0.2 if line else 0.6),
+            "borderColor": rgba(color, 1),
+            "borderWidth": 2 if line else 1
+        }
+        if line:
+            dataset.update({"fill": False, "tension": 0.2, "pointRadius": 0 if len(labels) > 60 else 3})
+        if chart_type == "histogram":
+            dataset.update({"barPercentage": 1.0, "categoryPercentage": 1.0})
+        chart_datasets.append(dataset)
+
+    stacked = chart_type == "stacked_bar"
+    return {
+        "type": "line" if line else "bar",
+        "data": {"labels": labels, "datasets": chart_datasets},
+        "options": {
+            "responsive": True,
+            "plugins": {
+                "title": {"display": True, "text": title},
+                "legend": {"display": len(datasets) > 1}
+            },
+            "scales": {
+                "x": {"stacked": stacked, "title": {"display": True, "text": x_label}},
+                "y": {"stacked": stacked, "beginAtZero": True, "title": {"display": True, "text": y_label}}
+            }
+        }
+    }
+
+
+def chart_from_series(chart_type, xs, series, title, x_label, y_label, bucket="year", numeric=True):
+    """A generate_chart result for aggregated totals per x (and series)"""
+    series = limit_series(series)
+    if chart_type != "pie":
+        xs, series = downsample(xs, series, get_setting('CHART_MAX_POINTS', DEFAULT_MAX_POINTS))
+    labels = [bucket_label(x, bucket) for x in xs] if numeric else [str(x) for x in xs]
+    datasets = [(y_label if name is None else name, values) for name, values in series.items()]
+    return {
+        "success": True,
+        "chart_data": chart_config(chart_type, labels, datasets, title, x_label, y_label),
+        "chart_id": str(uuid.uuid4())
+    }
+
+
+def histogram_chart(labels, counts, title, x_label, y_label):
+    return {
+        "success": True,
+        "chart_data": chart_config("histogram", labels, [(y_label, counts)], title, x_label, y_label),
+        "chart_id": str(uuid.uuid4())
+    }
+
+
+def build_chart(chart_type, rows, title, x_label="", y_label="", bucket="year",
+                x_column=None, y_column=None, series_column=None, bins=None):
+    """
+    A generate_chart result ({"success", "chart_data", "chart_id"}) from row dicts, which may be
+    raw rows (counted per year or decade) or already aggregated (x and a count column). Columns
+    not named are picked from the usual names (year/x, count/y, label/value for pies).
+    """
+    if chart_type not in CHART_TYPES:
+        return {"success": False, "error": f"Unsupported chart type: {chart_type}"}
+    if bucket not in BUCKETS:
+        bucket = "year"
+    column_names = set().union(*(row.keys() for row in rows))
+
+    if chart_type == "histogram":
+        value_column = y_column or first_column(HISTOGRAM_COLUMNS, column_names)
+        if not value_column:
+            return {"success": False, "error": "No numeric column to chart a distribution of"}
+        labels, counts = histogram_counts(numeric_column(rows, value_column), int(bins or DEFAULT_HISTOGRAM_BINS))
+        if not labels:
+            return {"success": False, "error": f"No {value_column} values to chart"}
+        return histogram_chart(labels, counts, title, x_label or value_column.replace("_", " ").title(),
+                               y_label or "Count")
+
+    if chart_type == "pie":
+        x_column = x_column or first_column(("label", "x") + X_COLUMNS, column_names)
+        y_column = y_column or first_column(("value",) + Y_COLUMNS, column_names)
+    else:
+        x_column = x_column or first_column(X_COLUMNS, column_names)
+        y_column = y_column or first_column(Y_COLUMNS, column_names)
+    if not x_column:
+        return {"success": False, "error": "No x-axis column in chart data"}
+    if chart_type in SERIES_CHART_TYPES:
+        series_column = series_column or first_column(SERIES_COLUMNS, column_names)
+
+    numeric = chart_type != "pie" and is_numeric_axis(rows, x_column)
+    if numeric:
+        xs, series = aggregate_time_series(rows, x_column, bucket, y_column, series_column)
+        default_x_label = "Decade" if bucket == "decade" else "Year"
+    else:
+        xs, series = aggregate_categories(rows, x_column, y_column, series_column)
+        default_x_label = ""
+    if not xs:
+        return {"success": False, "error": "No data points to chart"}
+    return chart_from_series(chart_type, xs, series, title, x_label or default_x_label, y_label or "Count",
+                             bucket, numeric)
+
+
+def run_pushdown(run_query, sql_query, params):
+    """Rows of an aggregating statement, or None when it fails (the chart then bins the fetched rows)"""
+    try:
+        return run_query(sql_query, params)
+    except Exception as e:
+        logger.warning(f"Chart aggregation in SQL failed, binning the fetched rows instead: {str(e)}")
+        return None
+
+
+def chart_from_result(result, chart_type, title, bucket="year", run_query=None, x_label="", y_label=""):
+    """
+    A chart for a search_imdb_database result. Rows cut off at the row limit are aggregated
+    over the full statement in SQLite by run_query(sql, params) -> row dicts, so the chart
+    counts every row; complete results are binned in memory.
+    """
+    rows = result.get("results") or []
+    column_names = result.get("column_names") or (list(rows[0]) if rows else [])
+    sql_query = result.get("sql_query")
+    pushdown = bool(result.get("has_more") and sql_query and run_query)
+
+    if chart_type == "histogram":
+        value_column = first_column(HISTOGRAM_COLUMNS, column_names)
+        bins = DEFAULT_HISTOGRAM_BINS
+        aggregated = None
+        if pushdown and value_column:
+            aggregated = run_pushdown(run_query, histogram_sql(sql_query, value_column, bins), result.get("params"))
+        if aggregated is None:
+            return build_chart("histogram", rows, title, x_label, y_label, y_column=value_column, bins=bins)
+        labels, counts = histogram_from_bins(aggregated, bins)
+        if not labels:
+            return {"success": False, "error": f"No {value_column} values to chart"}
+        return histogram_chart(labels, counts, title, x_label or value_column.replace("_", " ").title(),
+                               y_label or "Count")
+
+    x_column = first_column(X_COLUMNS, column_names)
+    weight_column = first_column(COUNT_COLUMNS, column_names)
+    series_column = first_column(SERIES_COLUMNS, column_names) if chart_type in SERIES_CHART_TYPES else None
+    aggregated = None
+    if pushdown and x_column and is_numeric_axis(rows, x_column):
+        aggregated = run_pushdown(run_query, time_series_sql(sql_query, x_column, bucket, weight_column, series_column),
+                                  result.get("params"))
+    if aggregated is None:
+        return build_chart(chart_type, rows, title, x_label, y_label, bucket,
+                           x_column=x_column, y_column=weight_column, series_column=series_column)
+    return build_chart(chart_type, aggregated, title, x_label, y_label, bucket,
+                       x_column="x", y_column="total", series_column="series" if series_column else None)
@@ -0,0 +1,141 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrencyLimiter:
+    """Bounded number of callers inside a section at once, with wait time metrics"""
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._max_active = 0
+        self._entered = 0
+        self._waited = 0
+        self._wait_ms = 0.0
+        self._max_wait_ms = 0.0
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the limiter's slots for the duration of the block"""
+        started = time.perf_counter()
+        waited = not self._semaphore.acquire(blocking=False)
+        if waited:
+            self._semaphore.acquire()
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._active += 1
+            self._entered += 1
+            self._max_active = max(self._max_active, self._active)
+            if waited:
+                self._waited += 1
+                self._wait_ms += wait_ms
+                self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        """Current and peak occupancy and how often callers had to wait"""
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "active": self._active,
+                "max_active": self._max_active,
+                "entered": self._entered,
+                "waited": self._waited,
+                "avg_wait_ms": round(self._wait_ms / self._waited, 2) if self._waited else 0.0,
+                "max_wait_ms": round(self._max_wait_ms, 2),
+            }
+
+
+_executor = None
+_limiters = {}
+_pid = os.getpid()
+_lock = threading.Lock()
+
+
+def _check_fork():
+    """Threads and held slots do not survive fork(): a forked process starts afresh"""
+    global _executor, _limiters, _pid
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _executor, _limiters, _pid = None, {}, os.getpid()
+
+
+def get_tool_executor():
+    """Process-wide thread pool that runs the tool calls of chat turns"""
+    global _executor
+    _check_fork()
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                workers = get_setting('TOOL_CALL_WORKERS', 8)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool")
+                logger.info(f"Created tool call executor with {workers} workers")
+    return _executor
+
+
+def submit_tool_call(func, *args):
+    """Run func on the tool executor in a copy of the caller's context (request id, spans)"""
+    return get_tool_executor().submit(contextvars.copy_context().run, func, *args)
+
+
+def shutdown_tool_executor(wait=True):
+    """Let running tool calls finish and stop the executor's threads"""
+    global _executor
+    _check_fork()
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def get_limiter(name):
+    """
+    Limiter for a shared backend: "db" (defaults to DB_POOL_SIZE so concurrent tool
+    calls queue here rather than time out on the pool) or "llm" (defaults to
+    LLM_MAX_CONNECTIONS).
+    """
+    _check_fork()
+    if name not in _limiters:
+        with _lock:
+            if name not in _limiters:
+                if name == "db":
+                    limit = get_setting('DB_MAX_CONCURRENCY', get_setting('DB_POOL_SIZE', 4))
+                elif name == "llm":
+                    limit = get_setting('LLM_MAX_CONCURRENCY', get_setting('LLM_MAX_CONNECTIONS', 20))
+                else:
+                    raise ValueError(f"Unknown limiter: {name}")
+                _limiters[name] = ConcurrencyLimiter(name, limit)
+    return _limiters[name]
+
+
+def db_slot():
+    """Hold a database concurrency slot"""
+    return get_limiter("db").slot()
+
+
+def llm_slot():
+    """Hold an LLM concurrency slot"""
+    return get_limiter("llm").slot()
+
+
+def concurrency_stats():
+    """Occupancy of the database and LLM limiters"""
+    return {name: get_limiter(name).stats() for name in ("db", "llm")}
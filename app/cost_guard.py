@@ -0,0 +1,196 @@
+import logging
+import math
+import re
+import threading
+
+from .db import get_pool, InvalidQueryError
+from .index_advisor import explain_query_plan
+from .settings import get_setting
+from .sql_rewrite import table_references
+
+logger = logging.getLogger(__name__)
+
+# Row visits a query may be estimated to need before the guard steps in
+DEFAULT_QUERY_COST_LIMIT = 100_000_000
+
+# Planner-style guesses used when sqlite_stat1 has nothing better
+DEFAULT_TABLE_ROWS = 100_000
+DEFAULT_ROWS_PER_KEY = 10
+DEFAULT_VIRTUAL_TABLE_ROWS = 100
+DEFAULT_SUBQUERY_ROWS = 1_000
+RANGE_SELECTIVITY = 4  # each range bound or unindexed filter keeps ~1/4 of the rows
+
+_LOOP_PATTERN = re.compile(
+    r"^(SCAN|SEARCH) (\S+)(?: USING (?:(?:AUTOMATIC )?(?:COVERING |PARTIAL )*INDEX(?: (\w+))?|"
+    r"(INTEGER PRIMARY KEY)|(PRIMARY KEY)))?(?: \((.*)\))?"
+)
+_AGGREGATE_PATTERN = re.compile(r"\b(?:COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(|\bGROUP\s+BY\b", re.IGNORECASE)
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+class QueryCostError(InvalidQueryError):
+    """Raised when a query is estimated to be too expensive to run"""
+
+
+def table_statistics(conn, db_path):
+    """
+    Row counts per table and average rows per key prefix per index, from sqlite_stat1
+    when the database has been ANALYZEd and MAX(rowid) otherwise. Cached per database.
+    """
+    with _stats_lock:
+        if db_path in _stats:
+            return _stats[db_path]
+
+    table_rows, index_stats = {}, {}
+    has_stat1 = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    if has_stat1:
+        for table, index_name, stat in conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1"):
+            numbers = [int(n) for n in stat.split() if n.isdigit()]
+            if not numbers:
+                continue
+            table_rows[table] = max(table_rows.get(table, 0), numbers[0])
+            if index_name:
+                index_stats[index_name] = numbers
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+        if table not in table_rows:
+            try:
+                table_rows[table] = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+            except Exception:
+                table_rows[table] = DEFAULT_TABLE_ROWS  # WITHOUT ROWID or virtual table
+
+    stats = {"table_rows": table_rows, "index_stats": index_stats}
+    with _stats_lock:
+        _stats[db_path] = stats
+    return stats
+
+
+class CostEstimate:
+    """Estimated row visits for a plan, the rows it produces and the steps that dominate"""
+
+    def __init__(self, cost, rows, blocking, steps, plan=None):
+        self.cost = cost
+        self.rows = rows
+        self.blocking = blocking
+        self.steps = steps
+        self.plan = plan
+
+    def explain(self, limit=3):
+        """Human readable summary of the most expensive plan steps"""
+        top = sorted(self.steps, key=lambda step: step[1], reverse=True)[:limit]
+        return "; ".join(f"{detail} (~{visits:,.0f} rows)" for detail, visits in top)
+
+
+def estimate_query_cost(conn, sql_query, stats, params=()):
+    """
+    Estimate how many rows SQLite will visit for a query from its EXPLAIN QUERY PLAN:
+    nested loops multiply, so a full scan inside another loop (the shape of a cartesian
+    join) is charged once per outer row. Table sizes and rows per index key come from
+    `stats` (see table_statistics); filters the plan does not use an index for are assumed to keep
+    a quarter of the rows each, as SQLite's planner does without statistics.
+    """
+    plan = explain_query_plan(conn, sql_query, params)
+    references = table_references(sql_query)
+    children = {}
+    for node_id, parent, detail in plan:
+        children.setdefault(parent, []).append((node_id, detail))
+    materialized = {}
+    steps = []
+    blocking = bool(_AGGREGATE_PATTERN.search(sql_query))
+
+    def loop_rows(detail, kind, name, index_name, integer_key, primary_key, constraints):
+        """Rows visited by one pass of a loop and rows it hands to the next loop"""
+        if name in materialized:
+            return materialized[name], materialized[name]
+        if "VIRTUAL TABLE" in detail:
+            return DEFAULT_VIRTUAL_TABLE_ROWS, DEFAULT_VIRTUAL_TABLE_ROWS
+        table = references.get(name.lower(), name)
+        if table not in stats["table_rows"]:
+            return DEFAULT_SUBQUERY_ROWS, DEFAULT_SUBQUERY_ROWS
+        table_rows = stats["table_rows"][table]
+        if kind == "SCAN":
+            filters = len(re.findall(rf"\b{re.escape(name)}\.\w+\s*(?:=|<|>|IN\b|LIKE\b|BETWEEN\b)",
+                                     sql_query, re.IGNORECASE))
+            return table_rows, max(1, table_rows / RANGE_SELECTIVITY ** min(filters, 3))
+        if integer_key:
+            return 1, 1
+        terms = [term.strip() for term in (constraints or "").split(" AND ") if term.strip()]
+        equalities = sum(1 for term in terms if term.endswith("=?"))
+        ranges = len(terms) - equalities
+        if index_name in stats["index_stats"] and equalities:
+            numbers = stats["index_stats"][index_name]
+            rows = numbers[min(equalities, len(numbers) - 1)]
+        elif equalities and (primary_key or (index_name or "").startswith("sqlite_autoindex_")):
+            rows = 1
+        elif equalities:
+            rows = DEFAULT_ROWS_PER_KEY
+        else:
+            rows = table_rows
+        rows = max(1, rows / RANGE_SELECTIVITY ** min(ranges, 2))
+        return rows, rows
+
+    def estimate_block(parent):
+        """Cost and output rows of the nested loops (and subqueries) under one plan node"""
+        nonlocal blocking
+        cost, rows = 0.0, 1.0
+        for node_id, detail in children.get(parent, []):
+            match = _LOOP_PATTERN.match(detail)
+            if match:
+                visited, produced = loop_rows(detail, *match.groups())
+                cost += rows * visited
+                steps.append((detail, rows * visited))
+                rows *= produced
+            elif detail.startswith(("MULTI-INDEX OR", "COMPOUND QUERY")):
+                # Branches run one after another and their rows add up
+                branch_rows = 0.0
+                for branch_id, _ in children.get(node_id, []):
+                    sub_cost, sub_rows = estimate_block(branch_id)
+                    cost += rows * sub_cost
+                    branch_rows += sub_rows
+                rows *= branch_rows
+            elif detail.startswith("USE TEMP B-TREE"):
+                blocking = True
+                cost += rows * math.log2(max(rows, 2))
+            elif node_id in children:
+                sub_cost, sub_rows = estimate_block(node_id)
+                cost += rows * sub_cost if "CORRELATED" in detail else sub_cost
+                if detail.startswith(("MATERIALIZE ", "CO-ROUTINE ")):
+                    materialized[detail.split(" ", 1)[1]] = sub_rows
+        return cost, rows
+
+    cost, rows = estimate_block(0)
+    return CostEstimate(cost, rows, blocking, steps, plan)
+
+
+def guard_query(sql_query, needed_rows, pool=None, params=None):
+    """
+    Decide whether a query may run. Returns (max_rows, plan): max_rows is None when its
+    estimated cost is within QUERY_COST_LIMIT, or a row cap to wrap it in when it is
+    expensive but can stop after `needed_rows` rows (COST_GUARD_ACTION = "limit"); plan
+    is the EXPLAIN QUERY PLAN the estimate used (None with the guard off), for the plan
+    observers to reuse. Raises QueryCostError with the dominating plan steps otherwise.
+    """
+    if not get_setting('COST_GUARD_ENABLED', True):
+        return None, None
+    cost_limit = get_setting('QUERY_COST_LIMIT', DEFAULT_QUERY_COST_LIMIT)
+    pool = pool or get_pool()
+    with pool.connection() as conn:
+        estimate = estimate_query_cost(conn, sql_query, table_statistics(conn, pool.db_path), params or ())
+    if estimate.cost <= cost_limit:
+        return None, estimate.plan
+
+    if get_setting('COST_GUARD_ACTION', 'limit') == 'limit' and not estimate.blocking:
+        # Without sorting or aggregation rows stream out in plan order, so the work done
+        # shrinks with the fraction of the result that is actually read
+        bounded_cost = estimate.cost * min(1.0, needed_rows / max(estimate.rows, 1.0))
+        if bounded_cost <= cost_limit:
+            logger.warning(f"Query estimated at {estimate.cost:,.0f} row visits; capping it at {needed_rows} rows")
+            return needed_rows, estimate.plan
+
+    logger.warning(f"Rejected query estimated at {estimate.cost:,.0f} row visits: {estimate.explain()}")
+    raise QueryCostError(
+        f"Query is estimated to visit about {estimate.cost:,.0f} rows, over the limit of {cost_limit:,}. "
+        f"Most expensive steps: {estimate.explain()}. Add more selective filters (names, years, "
+        f"types) or join conditions, or avoid sorting/aggregating the whole table."
+    )
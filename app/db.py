@@ -0,0 +1,714 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .settings import get_setting, resolve_project_path
+
+logger = logging.getLogger(__name__)
+
+# Per-connection tuning applied to every pooled connection
+DEFAULT_CACHE_SIZE_KB = 262144  # 256MB page cache per connection
+DEFAULT_MMAP_SIZE = 268435456   # 256MB memory-mapped window
+
+# Indexes the generation prompt steers queries towards
+DEFAULT_WARMUP_INDEXES = ["ix_people_name", "ix_crew_category", "ix_titles_type"]
+
+# Prepared statements each connection keeps (sqlite3's per-connection LRU, keyed on SQL text)
+DEFAULT_STATEMENT_CACHE_SIZE = 256
+
+# Rows pulled from SQLite per fetchmany() call when streaming results
+FETCH_BATCH_SIZE = 500
+
+# SQLite VM instructions between time budget checks
+PROGRESS_CHECK_INSTRUCTIONS = 10000
+
+# Authorizer actions a read-only query may perform
+READ_ONLY_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+# Introspection PRAGMAs used internally (warm-up, plan inspection); all other PRAGMAs are denied
+READ_ONLY_PRAGMAS = {"index_info", "index_xinfo", "index_list", "table_info", "table_xinfo", "data_version"}
+
+# Error messages SQLite raises while preparing (as opposed to running) a statement
+PREPARE_ERROR_PREFIXES = (
+    "near ", "no such ", "ambiguous column", "incomplete input", "unrecognized token",
+    "wrong number of arguments", "misuse of", "not authorized", "sub-select returns", "table ",
+)
+
+_AUTHORIZER_ACTION_NAMES = {
+    getattr(sqlite3, f"SQLITE_{name}"): name
+    for name in (
+        "CREATE_INDEX", "CREATE_TABLE", "CREATE_TEMP_INDEX", "CREATE_TEMP_TABLE", "CREATE_TEMP_TRIGGER",
+        "CREATE_TEMP_VIEW", "CREATE_TRIGGER", "CREATE_VIEW", "DELETE", "DROP_INDEX", "DROP_TABLE",
+        "DROP_TEMP_INDEX", "DROP_TEMP_TABLE", "DROP_TEMP_TRIGGER", "DROP_TEMP_VIEW", "DROP_TRIGGER",
+        "DROP_VIEW", "INSERT", "PRAGMA", "TRANSACTION", "UPDATE", "ATTACH", "DETACH", "ALTER_TABLE",
+        "REINDEX", "ANALYZE", "CREATE_VTABLE", "DROP_VTABLE", "SAVEPOINT",
+    )
+    if hasattr(sqlite3, f"SQLITE_{name}")
+}
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class InvalidQueryError(ValueError):
+    """Raised when SQL does not prepare or is not a read-only query"""
+
+
+class QueryTimeoutError(RuntimeError):
+    """Raised when a query runs past its time budget and is interrupted"""
+
+
+class InvalidPageTokenError(ValueError):
+    """Raised when a page token is malformed or belongs to a different query"""
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    SQLite connection with a permanently installed read-only authorizer and a progress
+    handler that interrupts the running statement once `deadline` (a time.monotonic()
+    value, set by whoever runs it) has passed. It also mirrors sqlite3's prepared-statement
+    LRU (cached_statements), which has no counters of its own, to count how often a query
+    reused an already prepared plan.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.denied_actions = []
+        self.deadline = None
+        self.statement_cache_size = kwargs.get('cached_statements', 128)
+        self.prepared = OrderedDict()  # SQL text -> None, least recently used first
+        self.statement_hits = 0
+        self.statement_misses = 0
+
+    def note_statement(self, sql_query):
+        """Record that a statement is about to run, as a hit or a miss of the statement cache"""
+        if sql_query in self.prepared:
+            self.prepared.move_to_end(sql_query)
+            self.statement_hits += 1
+            return
+        self.statement_misses += 1
+        self.prepared[sql_query] = None
+        if len(self.prepared) > self.statement_cache_size:
+            self.prepared.popitem(last=False)
+
+    def past_deadline(self):
+        """SQLite progress handler: non-zero interrupts the running statement"""
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def authorize(self, action, arg1, arg2, db_name, source):
+        """SQLite authorizer callback, invoked while a statement is being prepared"""
+        if action in READ_ONLY_ACTIONS:
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_PRAGMA and arg1 and arg1.lower() in READ_ONLY_PRAGMAS:
+            return sqlite3.SQLITE_OK
+        # FTS5 tables read the schema this way when they are first connected; real writes to
+        # sqlite_master are refused by SQLite itself (and query_only blocks all writes)
+        if action == sqlite3.SQLITE_UPDATE and arg1 == "sqlite_master":
+            return sqlite3.SQLITE_OK
+        self.denied_actions.append(_AUTHORIZER_ACTION_NAMES.get(action, str(action)))
+        return sqlite3.SQLITE_DENY
+
+
+class ConnectionPool:
+    """
+    Thread-aware pool of read-only SQLite connections.
+
+    Connections are opened lazily up to `size`, handed to one thread at a time and
+    returned warm (page cache intact) for the next request. Nested checkouts from the
+    same thread reuse the connection that thread already holds, so helpers can call
+    each other without exhausting the pool.
+    """
+
+    def __init__(self, db_path, size=4, timeout=10.0, immutable=True,
+                 cache_size_kb=DEFAULT_CACHE_SIZE_KB, mmap_size=DEFAULT_MMAP_SIZE,
+                 statement_cache_size=DEFAULT_STATEMENT_CACHE_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.immutable = immutable
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.statement_cache_size = statement_cache_size
+        self.effective_mmap_size = None
+        self._table_names = None
+        self.pid = os.getpid()  # SQLite connections must not be used across fork()
+
+        self._idle = queue.LifoQueue()  # LIFO keeps the warmest connection in use
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._open = 0
+        self._closed = False
+        self._connections = []  # every open connection, for statement cache metrics
+
+        # Metrics
+        self._acquisitions = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _uri(self):
+        uri = pathlib.Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        if self.immutable:
+            uri += "&immutable=1"
+        return uri
+
+    def _connect(self):
+        conn = sqlite3.connect(self._uri(), uri=True, check_same_thread=False, factory=PooledConnection,
+                               cached_statements=self.statement_cache_size)
+        conn.row_factory = sqlite3.Row  # This allows dict-like access to rows
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kb)}")
+        # SQLite silently caps the window at SQLITE_MAX_MMAP_SIZE, so read back what we got
+        effective = conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}").fetchone()
+        effective = effective[0] if effective else 0
+        if self.effective_mmap_size is None and effective != self.mmap_size:
+            logger.warning(f"Requested mmap_size={self.mmap_size} but SQLite is using {effective}")
+        self.effective_mmap_size = effective
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA query_only = ON")
+        # Installed once: changing the authorizer would expire every cached prepared statement
+        conn.set_authorizer(conn.authorize)
+        conn.set_progress_handler(conn.past_deadline, PROGRESS_CHECK_INSTRUCTIONS)
+        logger.info(f"Opened pooled database connection to {self.db_path} (mmap_size={effective})")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def acquire(self):
+        """Check out a connection, opening a new one if the pool is not full yet"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                can_open = self._open < self.size
+                if can_open:
+                    self._open += 1
+            if can_open:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._open -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available after {self.timeout}s "
+                        f"({self.size} connections in use)"
+                    )
+                waited = time.perf_counter() - start
+                with self._lock:
+                    self._waits += 1
+                    self._total_wait += waited
+                    self._max_wait = max(self._max_wait, waited)
+
+        with self._lock:
+            self._acquisitions += 1
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection checked out with acquire()"""
+        if getattr(self._local, 'conn', None) is not conn:
+            raise RuntimeError("Connection released by a thread that does not hold it")
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+        if self._closed:
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        conn.close()
+        with self._lock:
+            self._open -= 1
+            self._connections.remove(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager wrapping acquire()/release()"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def table_names(self):
+        """Names of the tables and views in the database, read once per pool"""
+        if self._table_names is None:
+            with self.connection() as conn:
+                rows = conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')").fetchall()
+            self._table_names = frozenset(row[0] for row in rows)
+        return self._table_names
+
+    def statement_cache_stats(self):
+        """How often queries reused a plan already prepared on their connection"""
+        with self._lock:
+            connections = list(self._connections)
+        hits = sum(conn.statement_hits for conn in connections)
+        misses = sum(conn.statement_misses for conn in connections)
+        return {
+            "size_per_connection": self.statement_cache_size,
+            "prepared": sum(len(conn.prepared) for conn in connections),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+
+    def stats(self):
+        """Pool size, wait-time and statement cache metrics"""
+        statement_cache = self.statement_cache_stats()
+        with self._lock:
+            idle = self._idle.qsize()
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": idle,
+                "in_use": self._open - idle,
+                "acquisitions": self._acquisitions,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "total_wait_ms": round(self._total_wait * 1000, 3),
+                "avg_wait_ms": round(self._total_wait * 1000 / self._waits, 3) if self._waits else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+                "mmap_size": self.effective_mmap_size,
+                "statement_cache": statement_cache,
+            }
+
+    def close(self):
+        """Close idle connections; connections in use are closed when released"""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+def execute_read_only(conn, sql_query, params=()):
+    """
+    Parse, authorize and execute a statement in a single pass on one connection.
+
+    The connection's authorizer rejects anything that is not a plain read while the
+    statement is prepared, so there is no separate validation round trip. Returns the
+    open cursor; raises InvalidQueryError if the SQL does not prepare or is not allowed.
+    """
+    conn.denied_actions.clear()
+    conn.note_statement(sql_query)
+    try:
+        cursor = conn.execute(sql_query, params)
+    except (sqlite3.ProgrammingError, sqlite3.Warning) as e:
+        raise InvalidQueryError(str(e)) from e
+    except sqlite3.DatabaseError as e:
+        if conn.denied_actions:
+            disallowed = ', '.join(sorted(set(conn.denied_actions)))
+            raise InvalidQueryError(f"Only read-only queries are allowed (disallowed: {disallowed})") from e
+        if str(e).startswith(PREPARE_ERROR_PREFIXES):
+            raise InvalidQueryError(str(e)) from e
+        raise
+
+    if cursor.description is None:
+        cursor.close()
+        raise InvalidQueryError("Only queries that return rows are allowed")
+    return cursor
+
+
+# Top-level structure of a statement: literals and quoted names (skipped), parentheses,
+# and the keywords that delimit its select list and ORDER BY
+_STATEMENT_STRUCTURE = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|[()]|\b(?:SELECT|FROM|ORDER\s+BY|LIMIT|UNION|INTERSECT|EXCEPT)\b",
+    re.IGNORECASE,
+)
+# One ORDER BY term a page can continue from: a (qualified) column and a plain direction
+_ORDER_TERM = re.compile(r"(?:(\w+)\.)?(\w+)(?:\s+(ASC|DESC))?", re.IGNORECASE)
+
+
+def order_by_keys(sql_query):
+    """
+    The (column name, descending) pairs of a statement's ORDER BY when every term is a
+    selected column with a plain direction, so rows can be continued after a key in SQL
+    (keyset pagination). None for anything else: expressions, ordinals, COLLATE or NULLS
+    clauses, compound statements, or a qualified column that is not selected as-is.
+    """
+    sql_query = sql_query.strip().rstrip(";")
+    depth = 0
+    select_start = select_list = order_start = order_end = None
+    for match in _STATEMENT_STRUCTURE.finditer(sql_query):
+        token = match.group(0).upper()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth or token[0] in "'\"":
+            continue
+        elif token in ("UNION", "INTERSECT", "EXCEPT"):
+            return None
+        elif token == "SELECT" and select_start is None:
+            select_start = match.end()
+        elif token == "FROM" and select_start is not None and select_list is None:
+            select_list = sql_query[select_start:match.start()]
+        elif token.startswith("ORDER"):
+            order_start, order_end = match.end(), len(sql_query)
+        elif token == "LIMIT" and order_start is not None:
+            order_end = match.start()
+    if order_start is None or select_list is None:
+        return None
+
+    keys = []
+    for term in sql_query[order_start:order_end].split(","):
+        match = _ORDER_TERM.fullmatch(term.strip())
+        if not match or match.group(2).isdigit():
+            return None
+        qualifier, column, direction = match.groups()
+        # `alias.column` names the output column `column` only when selected without an alias
+        if qualifier and not re.search(rf"(?<![\w.]){re.escape(qualifier)}\.{re.escape(column)}\s*(?:,|$)",
+                                       select_list.strip(), re.IGNORECASE):
+            return None
+        keys.append((column, (direction or "").upper() == "DESC"))
+    return keys
+
+
+def _after_keys(sql_query, params, keys, values):
+    """
+    Wrap a statement to return only its rows past the order key `values`, for `keys`
+    from order_by_keys(). SQLite sorts NULLs first, so for descending keys the NULL rows,
+    which come after every value, are kept too.
+    """
+    named = isinstance(params, dict)
+    params = dict(params) if named else list(params)
+
+    def bind(i):
+        if named:
+            params[f"_after_{i}"] = values[i]
+            return f":_after_{i}"
+        params.append(values[i])
+        return "?"
+
+    def after(i):
+        name, descending = keys[i]
+        column = '"' + name.replace('"', '""') + '"'
+        terms = [f"{column} {'<' if descending else '>'} {bind(i)}"]
+        if descending:
+            terms.append(f"{column} IS NULL")
+        if i < len(keys) - 1:
+            terms.append(f"({column} = {bind(i)} AND {after(i + 1)})")
+        return terms[0] if len(terms) == 1 else "(" + " OR ".join(terms) + ")"
+
+    condition = after(0)
+    return f"SELECT * FROM (\n{sql_query.strip().rstrip(';')}\n) WHERE {condition}", \
+        params if named else tuple(params)
+
+
+class QueryStream:
+    """
+    Lazily iterates the rows of a read-only query while holding a pooled connection.
+
+    Rows are pulled in fetchmany() batches, so memory stays flat however large the
+    result is. At most `limit` rows are yielded after skipping `offset`; once iteration
+    stops, `has_more` tells whether the query had further rows. The connection goes back
+    to the pool when the stream is exhausted or closed. `max_rows` wraps the statement in
+    a LIMIT and `timeout` interrupts it (QueryTimeoutError) once SQLite has spent that many
+    seconds executing it; time the caller spends between batches (e.g. writing a streamed
+    response to a slow client) does not count against the budget.
+    `params` are bound to the statement's parameters rather than spliced into its text,
+    so the same template reuses one prepared plan whatever its values. `plan` keeps the
+    EXPLAIN QUERY PLAN rows the caller checked the statement with, for the plan observers.
+
+    When the statement is ordered by selected columns (order_by_keys), `after` (from
+    next_after() of the previous page) is an order key and a row count: the statement is
+    filtered to the rows past that key, so SQLite seeks there instead of producing and
+    discarding the `offset` rows before it, and only `count` of those rows are skipped.
+    """
+
+    def __init__(self, sql_query, params=(), offset=0, limit=None, batch_size=FETCH_BATCH_SIZE, pool=None,
+                 max_rows=None, timeout=None, plan=None, after=None):
+        self.sql_query = sql_query
+        self.params = params
+        self.plan = plan
+        self.offset = offset
+        self.limit = limit
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.time_used = 0.0
+        self.rows_returned = 0
+        self.has_more = False
+
+        keys = order_by_keys(sql_query)
+        if after is not None and (keys is None or len(after[0]) != len(keys)):
+            after = None
+        self._after = after
+        self._skip = after[1] if after is not None else offset
+        self._last_row = None
+        self._next_row = None
+
+        self._pool = pool or get_pool()
+        self._conn = self._pool.acquire()
+        try:
+            executed_sql = sql_query
+            if max_rows is not None:
+                # Bound the statement itself so SQLite can stop (or keep only the top rows) early;
+                # the cap is a parameter too, so every page shares the wrapped statement
+                if isinstance(params, dict):
+                    executed_sql = f"SELECT * FROM (\n{sql_query.strip().rstrip(';')}\n) LIMIT :_max_rows"
+                    params = {**params, "_max_rows": int(max_rows)}
+                else:
+                    executed_sql = f"SELECT * FROM (\n{sql_query.strip().rstrip(';')}\n) LIMIT ?"
+                    params = (*params, int(max_rows))
+            if after is not None:
+                executed_sql, params = _after_keys(executed_sql, params, keys, after[0])
+            self._cursor = self._run(execute_read_only, self._conn, executed_sql, params)
+        except Exception:
+            self._release()
+            raise
+        self.column_names = [description[0] for description in self._cursor.description]
+
+        # Positions of the order key in each row, when every key column is selected once
+        self._key_indexes = None
+        if keys:
+            names = [name.lower() for name in self.column_names]
+            if all(names.count(name.lower()) == 1 for name, _ in keys):
+                self._key_indexes = [names.index(name.lower()) for name, _ in keys]
+
+    def _run(self, func, *args):
+        # Each call (execute or fetchmany) gets what is left of the budget; the previous
+        # deadline is put back afterwards, so a stream nested on the same connection
+        # leaves the outer one's budget alone
+        started = time.monotonic()
+        previous = self._conn.deadline
+        if self.timeout:
+            self._conn.deadline = started + self.timeout - self.time_used
+        try:
+            return func(*args)
+        except sqlite3.OperationalError as e:
+            if self.timeout and str(e) == "interrupted":
+                raise QueryTimeoutError(f"Query exceeded the {self.timeout}s time budget and was stopped") from e
+            raise
+        finally:
+            self._conn.deadline = previous
+            self.time_used += time.monotonic() - started
+
+    def __iter__(self):
+        try:
+            skipped = 0
+            while self._cursor is not None:
+                rows = self._run(self._cursor.fetchmany, self.batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    if skipped < self._skip:
+                        skipped += 1
+                        continue
+                    if self.limit is not None and self.rows_returned >= self.limit:
+                        self.has_more = True
+                        self._next_row = row
+                        return
+                    self.rows_returned += 1
+                    self._last_row = row
+                    yield row
+        finally:
+            self.close()
+
+    def next_offset(self):
+        """Offset of the next page, or None if the result is exhausted"""
+        return self.offset + self.rows_returned if self.has_more else None
+
+    def next_after(self):
+        """
+        Keyset continuation for the next page, or None when it uses its offset. When the
+        page ends between two order keys, the next one starts past the last row's key.
+        Rows tied on a key may come back in another order from a differently filtered
+        statement, so a page ending inside a tie (or on a NULL or BLOB key) continues the
+        statement this page ran instead, skipping the rows read so far.
+        """
+        if not self.has_more:
+            return None
+        if self._key_indexes is not None and self._last_row is not None:
+            last_key = [self._last_row[i] for i in self._key_indexes]
+            next_key = [self._next_row[i] for i in self._key_indexes]
+            if last_key != next_key and all(isinstance(value, (str, int, float)) for value in last_key):
+                return last_key, 0
+        if self._after is not None:
+            return self._after[0], self._skip + self.rows_returned
+        return None
+
+    def close(self):
+        """Finalize the statement and return the connection to the pool"""
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+        self._release()
+
+    def _release(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _sql_fingerprint(sql_query, params=None):
+    text = " ".join(sql_query.split())
+    if params:
+        text += "\x00" + json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_page_token(sql_query, offset, params=None, after=None):
+    """
+    Opaque token for fetching the page of `sql_query` (with `params`) that starts at
+    `offset`, continuing after the order key in `after` (QueryStream.next_after()) if given
+    """
+    payload = {"q": _sql_fingerprint(sql_query, params), "o": offset}
+    if after is not None:
+        payload["k"], payload["t"] = after
+    payload = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_page_token(sql_query, page_token, params=None):
+    """
+    Return (offset, after) from a page token issued for `sql_query` with `params`;
+    after is the keyset continuation, or None for tokens that only carry the offset
+    """
+    try:
+        padded = page_token + "=" * (-len(page_token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        offset = int(payload["o"])
+        fingerprint = payload["q"]
+        after = None
+        if "k" in payload:
+            values, ties = payload["k"], int(payload["t"])
+            if not isinstance(values, list) or ties < 0 or \
+                    not all(isinstance(value, (str, int, float)) for value in values):
+                raise ValueError("invalid order key")
+            after = (values, ties)
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidPageTokenError("Malformed page token") from e
+    if fingerprint != _sql_fingerprint(sql_query, params) or offset < 0:
+        raise InvalidPageTokenError("Page token does not belong to this query")
+    return offset, after
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_database_path():
+    """Absolute path of the IMDb database configured in config.py"""
+    return resolve_project_path(get_setting('DATABASE_PATH', 'db/imdb.db'))
+
+
+def get_pool():
+    """
+    Return the process-wide connection pool, creating it on first use. A process forked
+    after the pool was opened (e.g. a server worker) gets a pool of its own.
+    """
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = ConnectionPool(
+                    get_database_path(),
+                    size=get_setting('DB_POOL_SIZE', 4),
+                    timeout=get_setting('DB_POOL_TIMEOUT', 10.0),
+                    immutable=get_setting('DB_IMMUTABLE', True),
+                    cache_size_kb=get_setting('DB_CACHE_SIZE_KB', DEFAULT_CACHE_SIZE_KB),
+                    mmap_size=get_setting('DB_MMAP_SIZE', DEFAULT_MMAP_SIZE),
+                    statement_cache_size=get_setting('DB_STATEMENT_CACHE_SIZE', DEFAULT_STATEMENT_CACHE_SIZE),
+                )
+                logger.info(f"Created database connection pool (size={_pool.size}) for {_pool.db_path}")
+    return _pool
+
+
+def close_pool():
+    """Close this process's connection pool, if it has one (on shutdown or before forking)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.close()
+            logger.info(f"Closed database connection pool for {_pool.db_path}")
+        _pool = None
+
+
+def warm_up_indexes(index_names=None, pool=None):
+    """
+    Pre-touch every page of the given indexes so the first queries after a deploy
+    do not pay cold-disk latency. A full covering scan of each index pulls its pages
+    into the OS page cache (and the mmap window when memory-mapped I/O is enabled).
+    """
+    pool = pool or get_pool()
+    index_names = index_names if index_names is not None else get_setting('DB_WARMUP_INDEXES', DEFAULT_WARMUP_INDEXES)
+    timings = {}
+
+    with pool.connection() as conn:
+        for index_name in index_names:
+            row = conn.execute(
+                "SELECT tbl_name FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,)
+            ).fetchone()
+            if row is None:
+                logger.warning(f"Warm-up skipped unknown index: {index_name}")
+                continue
+            columns = [info[2] for info in conn.execute(f'PRAGMA index_info("{index_name}")') if info[2]]
+            if not columns:
+                logger.warning(f"Warm-up skipped expression index: {index_name}")
+                continue
+
+            start = time.perf_counter()
+            entries = conn.execute(
+                f'SELECT COUNT("{columns[0]}") FROM "{row["tbl_name"]}" INDEXED BY "{index_name}"'
+            ).fetchone()[0]
+            timings[index_name] = time.perf_counter() - start
+            logger.info(f"Warmed index {index_name} ({entries} entries) in {timings[index_name]:.2f}s")
+
+    return timings
+
+
+def start_warmup():
+    """Warm up the hot indexes in a background thread if DB_WARMUP_ON_START is enabled"""
+    if not get_setting('DB_WARMUP_ON_START', False):
+        return None
+
+    def run():
+        try:
+            start = time.perf_counter()
+            warm_up_indexes()
+            logger.info(f"Database warm-up finished in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            logger.error(f"Database warm-up failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name="db-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,282 @@
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from .db import get_pool, get_database_path, execute_read_only
+from .jsonl_log import JsonLinesLog
+from .settings import get_setting
+from .sql_rewrite import table_references
+
+logger = logging.getLogger(__name__)
+
+# Tables large enough that a full scan is worth an index
+DEFAULT_LARGE_TABLES = ["crew", "titles", "akas", "people", "episodes", "ratings"]
+
+# Columns beyond this are left out of a recommended index
+MAX_INDEX_COLUMNS = 5
+
+# Share of executed queries whose plan is logged
+DEFAULT_PLAN_SAMPLE_RATE = 0.1
+
+_SCAN_PATTERN = re.compile(r"^SCAN (\w+)(?: USING (COVERING )?INDEX (\w+))?$")
+
+_table_columns = {}
+
+
+def explain_query_plan(conn, sql_query, params=()):
+    """EXPLAIN QUERY PLAN rows as (id, parent, detail) tuples"""
+    return [(row[0], row[1], row[3]) for row in execute_read_only(conn, f"EXPLAIN QUERY PLAN {sql_query}", params)]
+
+
+def table_columns(conn, table):
+    """Column names of a table, cached per process"""
+    if table not in _table_columns:
+        _table_columns[table] = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+    return _table_columns[table]
+
+
+def find_scans(sql_query, plan, large_tables):
+    """Full scans of large tables in a plan, with the alias and any index the scan walks"""
+    references = table_references(sql_query)
+    scans = []
+    first_loop = next((detail for _, _, detail in plan if detail.startswith(("SCAN ", "SEARCH "))), None)
+    for _, _, detail in plan:
+        match = _SCAN_PATTERN.match(detail)
+        if not match:
+            continue
+        alias = match.group(1)
+        table = references.get(alias.lower(), alias.lower())
+        if table in large_tables:
+            scans.append({
+                "table": table,
+                "alias": alias,
+                "index": match.group(3),
+                "covering": bool(match.group(2)),
+                "outer": detail == first_loop,
+            })
+    return scans
+
+
+def recommend_index(sql_query, table, alias, columns, outer=False):
+    """
+    Covering index for one scanned table: columns compared to constants first (most
+    selective), then join keys, then one range filter, then every other column the query
+    reads from the table so the lookup never touches the table itself. For the outermost
+    loop join keys cannot be used for seeking, so the range filter comes before them.
+    """
+    references = table_references(sql_query)
+    single_table = len(set(references.values())) == 1
+    # Qualified references, or bare column names when the query only reads this table
+    prefix = rf"\b{re.escape(alias)}\." if not single_table else rf"(?:\b{re.escape(alias)}\.)?"
+    known = {column.lower(): column for column in columns}
+
+    def matching(pattern):
+        found = []
+        for match in re.finditer(prefix + r"(\w+)" + pattern, sql_query, re.IGNORECASE):
+            column = known.get(match.group(1).lower())
+            if column and column not in found:
+                found.append(column)
+        return found
+
+    # Constants are literals or bind parameters (:name, ?, @name, $name)
+    equality = matching(r"\s*(?:=\s*(?:'|\d|-|[:?@$]\w*)|IN\s*\()")
+    joins = matching(r"\s*=\s*\w+\.\w+") + [
+        known[match.group(1).lower()]
+        for match in re.finditer(r"\w+\.\w+\s*=\s*" + prefix + r"(\w+)", sql_query, re.IGNORECASE)
+        if match.group(1).lower() in known
+    ]
+    ranges = matching(r"\s*(?:<|>|BETWEEN\b)")
+    referenced = matching(r"\b")
+
+    seek_columns = equality + ranges[:1] + joins if outer else equality + joins + ranges[:1]
+    ordered = []
+    for column in seek_columns + referenced:
+        if column not in ordered:
+            ordered.append(column)
+    return ordered[:MAX_INDEX_COLUMNS]
+
+
+plan_log = JsonLinesLog('QUERY_PLAN_LOG', 'logs/query_plans.jsonl', 'QUERY_PLAN_LOG_MAX_BYTES', 50 * 1024 * 1024)
+
+
+def _log_path():
+    return plan_log.path()
+
+
+def plan_entry(sql_query, elapsed=None, pool=None, params=None, plan=None):
+    """
+    Plan log entry for an executed query: its plan (EXPLAINed here unless given) and the
+    full scans of large tables, with the covering index that would avoid each
+    """
+    large_tables = set(get_setting('INDEX_ADVISOR_LARGE_TABLES', DEFAULT_LARGE_TABLES))
+    with (pool or get_pool()).connection() as conn:
+        if plan is None:
+            plan = explain_query_plan(conn, sql_query, params or ())
+        scans = find_scans(sql_query, plan, large_tables)
+        for scan in scans:
+            scan["recommended_columns"] = recommend_index(
+                sql_query, scan["table"], scan["alias"], table_columns(conn, scan["table"]), scan["outer"]
+            )
+    for scan in scans:
+        logger.debug(f"Query scans large table {scan['table']}; suggested index on "
+                     f"{scan['table']}({', '.join(scan['recommended_columns'])})")
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "sql_query": sql_query,
+        "elapsed_ms": round(elapsed * 1000, 2) if elapsed is not None else None,
+        "plan": [detail for _, _, detail in plan],
+        "scans": scans,
+    }
+
+
+def record_query_plan(sql_query, elapsed=None, pool=None, params=None, plan=None):
+    """
+    Queue the plan of a sample (QUERY_PLAN_SAMPLE_RATE) of executed queries for the plan
+    log. `plan` is the EXPLAIN QUERY PLAN the query was already checked with (see
+    guard_query); the entry is built and written on a background thread, so the request
+    never waits on a second EXPLAIN or on disk. Returns whether the query was sampled.
+    """
+    if not get_setting('INDEX_ADVISOR_ENABLED', True) or not _log_path():
+        return False
+    if random.random() >= get_setting('QUERY_PLAN_SAMPLE_RATE', DEFAULT_PLAN_SAMPLE_RATE):
+        return False
+    plan_log.append(lambda: plan_entry(sql_query, elapsed, pool, params, plan))
+    return True
+
+
+def read_plan_log(path):
+    """Entries of a plan log and its rotated predecessor"""
+    entries = []
+    for log_file in (path + ".1", path):
+        if not os.path.exists(log_file):
+            continue
+        with open(log_file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+
+def existing_indexes(conn):
+    """Leading columns of every index, per table"""
+    indexes = defaultdict(list)
+    for table, index_name in conn.execute("SELECT tbl_name, name FROM sqlite_master WHERE type = 'index'"):
+        columns = [row[2] for row in conn.execute(f'PRAGMA index_info("{index_name}")')]
+        indexes[table].append(columns)
+    return indexes
+
+
+def aggregate_recommendations(entries, indexes=None):
+    """
+    Rank recommended indexes across logged queries by how often and how long the scans
+    they would avoid ran. Recommendations already served by an existing index (same
+    leading columns) are dropped, as are ones that are a prefix of a stronger candidate.
+    """
+    candidates = {}
+    for entry in entries:
+        for scan in entry.get("scans", []):
+            columns = tuple(scan.get("recommended_columns") or ())
+            if not columns:
+                continue
+            key = (scan["table"], columns)
+            candidate = candidates.setdefault(key, {
+                "table": scan["table"], "columns": list(columns), "queries": 0, "total_ms": 0.0, "examples": [],
+            })
+            candidate["queries"] += 1
+            candidate["total_ms"] += entry.get("elapsed_ms") or 0.0
+            if len(candidate["examples"]) < 3 and entry["sql_query"] not in candidate["examples"]:
+                candidate["examples"].append(entry["sql_query"])
+
+    indexes = indexes or {}
+    recommendations = []
+    for (table, columns), candidate in candidates.items():
+        if any(tuple(existing[:len(columns)]) == columns for existing in indexes.get(table, [])):
+            continue
+        if any(other_table == table and len(other) > len(columns) and other[:len(columns)] == columns
+               for other_table, other in candidates):
+            continue
+        candidate["total_ms"] = round(candidate["total_ms"], 2)
+        candidate["create_sql"] = create_index_sql(table, columns)
+        recommendations.append(candidate)
+    recommendations.sort(key=lambda c: (c["total_ms"], c["queries"]), reverse=True)
+    return recommendations
+
+
+def create_index_sql(table, columns):
+    """CREATE INDEX statement for a recommendation"""
+    name = f"ix_advisor_{table}_{'_'.join(columns)}"
+    return f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({", ".join(columns)})'
+
+
+def apply_recommendations(db_path, copy_path, recommendations):
+    """
+    Copy the database with SQLite's online backup API and create the recommended indexes
+    on the copy, leaving the serving database untouched. Point DATABASE_PATH at the copy
+    (or swap the files) once it has been checked.
+    """
+    if os.path.abspath(copy_path) == os.path.abspath(db_path):
+        raise ValueError("Refusing to modify the serving database; choose a different --copy path")
+    source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    target = sqlite3.connect(copy_path)
+    try:
+        start = time.perf_counter()
+        source.backup(target)
+        logger.info(f"Copied {db_path} to {copy_path} in {time.perf_counter() - start:.1f}s")
+        for recommendation in recommendations:
+            start = time.perf_counter()
+            target.execute(recommendation["create_sql"])
+            target.commit()
+            logger.info(f"{recommendation['create_sql']} ({time.perf_counter() - start:.1f}s)")
+        target.execute("ANALYZE")
+        target.commit()
+    finally:
+        source.close()
+        target.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.index_advisor",
+        description="Recommend covering indexes from the query plan log and apply them to a copy of the database.",
+    )
+    parser.add_argument("command", choices=["report", "apply"])
+    parser.add_argument("--log", default=None, help="plan log (defaults to QUERY_PLAN_LOG from config.py)")
+    parser.add_argument("--db", default=None, help="database path (defaults to DATABASE_PATH from config.py)")
+    parser.add_argument("--copy", default=None, help="apply: writable copy to create the indexes on")
+    parser.add_argument("--top", type=int, default=5, help="number of recommendations to report or apply")
+    args = parser.parse_args(argv)
+    # Imported here: app.logging_config imports the metrics module, which imports this one
+    from .logging_config import configure_logging
+    configure_logging()
+
+    db_path = args.db or get_database_path()
+    log_path = args.log or _log_path()
+    entries = read_plan_log(log_path)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        recommendations = aggregate_recommendations(entries, existing_indexes(conn))[:args.top]
+    finally:
+        conn.close()
+
+    logger.info(f"{len(entries)} logged queries, {len(recommendations)} index recommendations")
+    for recommendation in recommendations:
+        logger.info(f"{recommendation['create_sql']}  -- avoids scans in {recommendation['queries']} "
+                    f"queries ({recommendation['total_ms']} ms)")
+
+    if args.command == "apply":
+        if not args.copy:
+            parser.error("apply needs --copy PATH")
+        apply_recommendations(db_path, args.copy, recommendations)
+
+
+if __name__ == "__main__":
+    main()
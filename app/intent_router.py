@@ -0,0 +1,314 @@
+import logging
+import re
+import threading
+
+from .db import get_pool
+from .metrics import span
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Routes scoring below this are left to the LLM
+DEFAULT_MIN_CONFIDENCE = 0.8
+
+# Votes a title needs before it can be among the "best" of a period
+BEST_MIN_VOTES = 1000
+
+# Tuned templates, written the way the SQL generation prompt's index-optimized examples
+# are: selective name or type filters first, DISTINCT over the crew joins, rated first
+ACTOR_MOVIES_SQL = """
+SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes
+FROM people p
+JOIN crew c ON p.person_id = c.person_id
+JOIN titles t ON c.title_id = t.title_id
+LEFT JOIN ratings r ON t.title_id = r.title_id
+WHERE p.name = :name
+AND c.category IN ('actor', 'actress')
+AND t.type IN ('movie', 'tvMovie')
+ORDER BY r.rating DESC, r.votes DESC
+"""
+
+DIRECTOR_MOVIES_SQL = """
+SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes
+FROM people p
+JOIN crew c ON p.person_id = c.person_id
+JOIN titles t ON c.title_id = t.title_id
+LEFT JOIN ratings r ON t.title_id = r.title_id
+WHERE p.name = :name
+AND c.category = 'director'
+AND t.type IN ('movie', 'tvMovie')
+ORDER BY r.rating DESC, r.votes DESC
+"""
+
+PERSON_TITLES_SQL = """
+SELECT DISTINCT t.title_id, t.primary_title, t.type, t.premiered, t.genres, c.category, r.rating, r.votes
+FROM people p
+JOIN crew c ON p.person_id = c.person_id
+JOIN titles t ON c.title_id = t.title_id
+LEFT JOIN ratings r ON t.title_id = r.title_id
+WHERE p.name = :name
+ORDER BY r.votes DESC, r.rating DESC
+"""
+
+# Also used for chart requests by search_imdb_database; served from person_year_counts
+# by rewrite_sql when the summary tables have been built
+PERSON_YEAR_COUNTS_SQL = """
+SELECT t.premiered as year, COUNT(*) as count
+FROM people p
+JOIN crew c ON p.person_id = c.person_id
+JOIN titles t ON c.title_id = t.title_id
+WHERE p.name = :name
+AND c.category IN ('actor', 'actress')
+AND t.type IN ('movie', 'tvMovie')
+AND t.premiered IS NOT NULL
+GROUP BY t.premiered
+ORDER BY t.premiered
+"""
+
+BEST_MOVIES_SQL = """
+SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes
+FROM titles t
+JOIN ratings r ON t.title_id = r.title_id
+WHERE t.type IN ('movie', 'tvMovie')
+AND t.premiered BETWEEN :start_year AND :end_year{genre_filter}
+AND r.votes >= :min_votes
+ORDER BY r.rating DESC, r.votes DESC
+"""
+
+GENRES = [
+    "Action", "Adventure", "Animation", "Biography", "Comedy", "Crime", "Documentary", "Drama",
+    "Family", "Fantasy", "Film-Noir", "History", "Horror", "Music", "Musical", "Mystery",
+    "Romance", "Sci-Fi", "Sport", "Thriller", "War", "Western",
+]
+GENRE_ALIASES = {genre.lower(): genre for genre in GENRES}
+GENRE_ALIASES.update({
+    "sci fi": "Sci-Fi", "scifi": "Sci-Fi", "science fiction": "Sci-Fi", "animated": "Animation",
+    "comedies": "Comedy", "dramas": "Drama", "thrillers": "Thriller", "westerns": "Western",
+    "musicals": "Musical", "mysteries": "Mystery", "documentaries": "Documentary", "noir": "Film-Noir",
+})
+
+_MEDIA = r"(?:movies|movie|films|film)"
+_LEAD_IN = r"^(?:(?:show|give|find|list|get)(?: me)? )?(?:all )?(?:the )?"
+_NAME = r"(?P<name>[^\d?!,;:()\"]+?)"
+_GENRE = "|".join(sorted((re.escape(alias) for alias in GENRE_ALIASES), key=len, reverse=True))
+_PERIOD = r"(?P<period>(?:19|20)\d0s|'?\d0s|(?:18|19|20)\d\d)"
+
+# (intent, pattern) in priority order; the first pattern that matches the whole question wins
+RULES = [
+    ("person_movies_by_year", re.compile(
+        rf"^(?:(?:draw|show|make|plot|give)(?: me)? )?(?:an? )?(?:(?:chart|graph|plot) (?:of )?)?"
+        rf"{_NAME}(?:'s?)? {_MEDIA} (?:by year|per year|over time|over the years)$", re.IGNORECASE)),
+    ("director_movies", re.compile(rf"{_LEAD_IN}{_MEDIA} (?:directed|made) by {_NAME}$", re.IGNORECASE)),
+    ("director_movies", re.compile(rf"{_LEAD_IN}{_NAME} directed {_MEDIA}$", re.IGNORECASE)),
+    ("actor_movies", re.compile(rf"{_LEAD_IN}{_MEDIA} (?:with|starring|featuring) {_NAME}$", re.IGNORECASE)),
+    ("best_movies", re.compile(
+        rf"{_LEAD_IN}(?:best|top|top rated|top-rated|highest rated|highest-rated|greatest) "
+        rf"(?:(?P<genre>{_GENRE}) )?{_MEDIA} (?:(?:from|of|in|released in) )?(?:the )?{_PERIOD}$", re.IGNORECASE)),
+    ("person_movies", re.compile(rf"{_LEAD_IN}{_NAME}(?:'s?)? {_MEDIA}$", re.IGNORECASE)),
+    ("person_titles", re.compile(r"^(?P<name>[^\W\d_][\w.'\- ]*[\w.])$", re.IGNORECASE)),
+]
+
+# Words that mean a captured "name" is really a description (e.g. "best sci-fi movies")
+_NOT_NAME_WORDS = {
+    "best", "top", "worst", "new", "old", "recent", "popular", "rated", "highest", "lowest",
+    "all", "good", "great", "classic", "famous", "longest", "shortest", "most", "least",
+    "which", "what", "who", "how", "when", "where", "why", "some", "any", "my", "your",
+} | set(GENRE_ALIASES)
+
+
+class Route:
+    """A question answered by a template: the intent, the SQL template and its bind parameters"""
+
+    def __init__(self, intent, template, params, confidence):
+        self.intent = intent
+        self.sql_query = template.strip()
+        self.params = params
+        self.confidence = confidence
+
+
+def person_year_counts_query(person_name):
+    """(sql, params) of per-year credit counts of an actor or actress, for career charts"""
+    return PERSON_YEAR_COUNTS_SQL.strip(), {"name": person_name}
+
+
+def normalize_question(user_query):
+    """Whitespace collapsed, trailing punctuation and quotes dropped"""
+    question = " ".join(user_query.split())
+    return question.strip(" \"'").rstrip("?.!").strip()
+
+
+def looks_like_name(name):
+    words = name.split()
+    if not 1 < len(words) <= 5 or len(name) > 60:
+        return False
+    return not any(word.lower() in _NOT_NAME_WORDS for word in words)
+
+
+def resolve_person(conn, name):
+    """
+    (canonical name, exact) for a person in the people table, trying the name as typed
+    and then in title case; both are ix_people_name lookups. None if neither exists.
+    """
+    for candidate, exact in ((name, True), (name.title(), False)):
+        row = conn.execute("SELECT name FROM people WHERE name = ? LIMIT 1", (candidate,)).fetchone()
+        if row:
+            return row[0], exact
+    return None
+
+
+def dominant_role(conn, name):
+    """'director' or 'actor', whichever the person has more credits as, or None without either"""
+    counts = dict(conn.execute(
+        "SELECT CASE WHEN c.category = 'director' THEN 'director' ELSE 'actor' END, COUNT(*) "
+        "FROM people p JOIN crew c ON p.person_id = c.person_id "
+        "WHERE p.name = ? AND c.category IN ('actor', 'actress', 'director') GROUP BY 1",
+        (name,),
+    ).fetchall())
+    if not counts:
+        return None
+    return "director" if counts.get("director", 0) > counts.get("actor", 0) else "actor"
+
+
+def is_title(conn, text):
+    """Whether some title is called exactly this (so a bare name is ambiguous)"""
+    return conn.execute(
+        "SELECT 1 FROM titles WHERE primary_title = ? LIMIT 1", (text,)
+    ).fetchone() is not None
+
+
+def parse_period(period):
+    """(start year, end year) of '2020', '1990s', '90s' or "'90s" """
+    digits = period.lstrip("'").rstrip("sS")
+    if len(digits) == 2:
+        decade = int(digits)
+        start = (1900 if decade >= 30 else 2000) + decade
+    else:
+        start = int(digits)
+    if period.lower().endswith("s"):
+        return start, start + 9
+    return start, start
+
+
+class IntentRouter:
+    """
+    Rule-based router in front of SQL generation. Questions matching a known shape
+    ("movies with X", "X movies by year", "best movies from 2020", a bare person name)
+    are answered from tuned templates, with names checked against the people index.
+    Anything it is not confident about returns None and goes to the LLM.
+    """
+
+    def __init__(self, min_confidence=DEFAULT_MIN_CONFIDENCE, pool=None):
+        self.min_confidence = min_confidence
+        self.pool = pool
+        self._lock = threading.Lock()
+        self.routed = {}
+        self.fallbacks = 0
+
+    def route(self, user_query):
+        """The Route for a question, or None when the LLM should answer it"""
+        question = normalize_question(user_query)
+        route = None
+        if question:
+            pool = self.pool or get_pool()
+            with pool.connection() as conn:
+                for intent, pattern in RULES:
+                    match = pattern.match(question)
+                    if match:
+                        route = self._build(conn, intent, match, question)
+                        if route:
+                            break
+        if route and route.confidence < self.min_confidence:
+            logger.debug(f"Fast path {route.intent} only {route.confidence:.2f} confident for '{question}'")
+            route = None
+        with self._lock:
+            if route:
+                self.routed[route.intent] = self.routed.get(route.intent, 0) + 1
+            else:
+                self.fallbacks += 1
+        return route
+
+    def _build(self, conn, intent, match, question):
+        if intent == "best_movies":
+            start_year, end_year = parse_period(match.group("period"))
+            params = {"start_year": start_year, "end_year": end_year, "min_votes": BEST_MIN_VOTES}
+            genre = match.group("genre")
+            genre_filter = ""
+            if genre:
+                genre_filter = "\nAND t.genres LIKE :genre_pattern"
+                params["genre_pattern"] = f"%{GENRE_ALIASES[genre.lower()]}%"
+            return Route(intent, BEST_MOVIES_SQL.replace("{genre_filter}", genre_filter), params, 1.0)
+
+        name = match.group("name").strip()
+        if not looks_like_name(name):
+            return None
+        resolved = resolve_person(conn, name)
+        if not resolved:
+            return None
+        name, exact = resolved
+        confidence = 1.0 if exact else 0.9
+
+        if intent == "person_movies_by_year":
+            # The template counts acting credits, which says little about a director
+            if dominant_role(conn, name) != "actor":
+                confidence = min(confidence, 0.5)
+            return Route(intent, PERSON_YEAR_COUNTS_SQL, {"name": name}, confidence)
+        if intent == "actor_movies":
+            return Route(intent, ACTOR_MOVIES_SQL, {"name": name}, confidence)
+        if intent == "director_movies":
+            return Route(intent, DIRECTOR_MOVIES_SQL, {"name": name}, confidence)
+        if intent == "person_movies":
+            role = dominant_role(conn, name)
+            if role is None:
+                return None
+            template = DIRECTOR_MOVIES_SQL if role == "director" else ACTOR_MOVIES_SQL
+            return Route(f"{role}_movies", template, {"name": name}, confidence)
+        # A bare name could also be a title ("Alexander Hamilton")
+        if is_title(conn, question) or is_title(conn, name):
+            confidence = min(confidence, 0.5)
+        return Route(intent, PERSON_TITLES_SQL, {"name": name}, confidence - 0.1)
+
+    def stats(self):
+        with self._lock:
+            routed = dict(self.routed)
+            fallbacks = self.fallbacks
+        total = sum(routed.values()) + fallbacks
+        return {
+            "routed": sum(routed.values()),
+            "fallbacks": fallbacks,
+            "routed_rate": round(sum(routed.values()) / total, 4) if total else 0.0,
+            "by_intent": routed,
+        }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router():
+    """Return the process-wide intent router, or None if FAST_PATH_ENABLED is off"""
+    global _router
+    if not get_setting('FAST_PATH_ENABLED', True):
+        return None
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = IntentRouter(min_confidence=get_setting('FAST_PATH_MIN_CONFIDENCE', DEFAULT_MIN_CONFIDENCE))
+    return _router
+
+
+def route_question(user_query):
+    """Route for a question if the fast path can answer it confidently, else None. Never raises."""
+    router = get_intent_router()
+    if router is None:
+        return None
+    try:
+        with span("fast_path_routing"):
+            return router.route(user_query)
+    except Exception as e:
+        logger.warning(f"Fast path routing failed, falling back to the LLM: {str(e)}")
+        return None
+
+
+def fast_path_stats():
+    """Questions answered by each fast path intent and those left to the LLM"""
+    return _router.stats() if _router else None
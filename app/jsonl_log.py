@@ -0,0 +1,102 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+
+from .settings import get_setting, resolve_project_path
+
+logger = logging.getLogger(__name__)
+
+# Entries waiting for the writer thread; beyond this they are dropped rather than
+# making request threads wait on disk
+DEFAULT_QUEUE_SIZE = 1000
+
+# Set when several processes append to the same files (see set_external_rotation)
+_external_rotation = False
+
+
+def set_external_rotation(enabled):
+    """
+    Leave rotation to an external rotator such as logrotate. Server workers sharing a file
+    would each rotate it on their own and lose entries; every entry reopens the file by
+    path, so appends continue in the new file once it has been moved.
+    """
+    global _external_rotation
+    _external_rotation = enabled
+
+
+class JsonLinesLog:
+    """
+    Append-only JSON lines file written by a background thread, rotated to .1 beyond a
+    size limit (unless rotation is external). append() never blocks: it queues an entry, or a function building one
+    (so work such as EXPLAIN runs on the writer thread), and drops it when the queue is full.
+    """
+
+    def __init__(self, path_setting, default_path, max_bytes_setting, default_max_bytes):
+        self.path_setting = path_setting
+        self.default_path = default_path
+        self.max_bytes_setting = max_bytes_setting
+        self.default_max_bytes = default_max_bytes
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def path(self):
+        path = get_setting(self.path_setting, self.default_path)
+        return resolve_project_path(path) if path else None
+
+    def _start(self):
+        # A forked process (e.g. a server worker) gets its own writer thread
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(get_setting('JSONL_LOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+                self._thread = threading.Thread(target=self._run, name=f"jsonl-{self.path_setting.lower()}",
+                                                daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+                atexit.register(self.flush)
+
+    def append(self, entry):
+        """Queue an entry (a dict, or a function returning one or None) for writing"""
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wait until every queued entry has been written"""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def _run(self):
+        entries = self._queue
+        while True:
+            entry = entries.get()
+            try:
+                if callable(entry):
+                    entry = entry()
+                if entry is not None:
+                    self._write(entry)
+            except Exception as e:
+                logger.warning(f"Could not write to {self.path_setting}: {str(e)}")
+            finally:
+                entries.task_done()
+
+    def _write(self, entry):
+        path = self.path()
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not _external_rotation:
+            max_bytes = get_setting(self.max_bytes_setting, self.default_max_bytes)
+            if os.path.exists(path) and os.path.getsize(path) > max_bytes:
+                os.replace(path, path + ".1")
+        # One unbuffered append per entry, so lines from several processes never interleave
+        with open(path, "ab", buffering=0) as f:
+            f.write((json.dumps(entry, default=str) + "\n").encode("utf-8"))
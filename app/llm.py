@@ -0,0 +1,269 @@
+import logging
+import os
+import threading
+import time
+
+import httpx
+from openai import AzureOpenAI, OpenAI
+
+from .metrics import record_tokens
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+# httpcore trace events that open a new connection, and the event that marks a request
+# actually going out on a (new or reused) connection
+_HANDSHAKE_STEPS = ("connection.connect_tcp", "connection.start_tls")
+_SEND_EVENTS = ("http11.send_request_headers.started", "http2.send_request_headers.started")
+
+
+class LLMClientMetrics:
+    """Thread-safe counters for requests made through the shared LLM HTTP pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._new_connections = 0
+        self._rate_limited = 0
+        self._server_errors = 0
+        self._transport_errors = 0
+        self._handshake_ms = 0.0
+        self._max_handshake_ms = 0.0
+        self._queue_ms = 0.0
+        self._max_queue_ms = 0.0
+        self._response_ms = 0.0
+
+    def record(self, queue_ms, handshake_ms, response_ms, status_code=None):
+        """Record one HTTP attempt (each retry counts as its own attempt)"""
+        with self._lock:
+            self._requests += 1
+            self._queue_ms += queue_ms
+            self._max_queue_ms = max(self._max_queue_ms, queue_ms)
+            self._response_ms += response_ms
+            if handshake_ms is not None:
+                self._new_connections += 1
+                self._handshake_ms += handshake_ms
+                self._max_handshake_ms = max(self._max_handshake_ms, handshake_ms)
+            if status_code is None:
+                self._transport_errors += 1
+            elif status_code == 429:
+                self._rate_limited += 1
+            elif status_code >= 500:
+                self._server_errors += 1
+
+    def stats(self):
+        """Connection reuse, handshake and pool queueing times"""
+        with self._lock:
+            requests = self._requests
+            return {
+                "requests": requests,
+                "new_connections": self._new_connections,
+                "reused_connections": requests - self._new_connections - self._transport_errors,
+                "rate_limited": self._rate_limited,
+                "server_errors": self._server_errors,
+                "transport_errors": self._transport_errors,
+                "total_handshake_ms": round(self._handshake_ms, 2),
+                "avg_handshake_ms": round(self._handshake_ms / self._new_connections, 2) if self._new_connections else 0.0,
+                "max_handshake_ms": round(self._max_handshake_ms, 2),
+                "total_queue_ms": round(self._queue_ms, 2),
+                "avg_queue_ms": round(self._queue_ms / requests, 2) if requests else 0.0,
+                "max_queue_ms": round(self._max_queue_ms, 2),
+                "avg_response_headers_ms": round(self._response_ms / requests, 2) if requests else 0.0,
+            }
+
+
+class InstrumentedTransport(httpx.HTTPTransport):
+    """
+    HTTP transport that times each attempt through httpcore's trace hook: queue time is
+    spent waiting for a pooled connection, handshake time is TCP connect plus TLS.
+    """
+
+    def __init__(self, metrics, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = metrics
+
+    def handle_request(self, request):
+        started = time.perf_counter()
+        timings = {}
+
+        def trace(event_name, info):
+            now = time.perf_counter()
+            timings.setdefault("first_event", now)
+            timings[event_name] = now
+
+        request.extensions = {**request.extensions, "trace": trace}
+        status_code = None
+        try:
+            response = super().handle_request(request)
+            status_code = response.status_code
+            return response
+        finally:
+            finished = time.perf_counter()
+            queue_ms = (timings.get("first_event", finished) - started) * 1000
+            handshake_ms = None
+            if "connection.connect_tcp.started" in timings:
+                handshake_ms = sum(
+                    (timings.get(f"{step}.complete", finished) - timings[f"{step}.started"]) * 1000
+                    for step in _HANDSHAKE_STEPS if f"{step}.started" in timings
+                )
+            sent = next((timings[event] for event in _SEND_EVENTS if event in timings), started)
+            self.metrics.record(queue_ms, handshake_ms, (finished - sent) * 1000, status_code)
+
+
+class LLMUsageMetrics:
+    """Thread-safe token totals per kind of LLM call (sql_generation, tool_selection, ...)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # call -> [calls, prompt, cached prompt, completion, estimated calls]
+
+    def record(self, call, prompt_tokens, completion_tokens, cached_tokens=0, estimated=False):
+        with self._lock:
+            totals = self._calls.setdefault(call, [0, 0, 0, 0, 0])
+            totals[0] += 1
+            totals[1] += prompt_tokens
+            totals[2] += cached_tokens
+            totals[3] += completion_tokens
+            totals[4] += 1 if estimated else 0
+
+    def stats(self):
+        """Calls, token totals and average prompt size per kind of call"""
+        with self._lock:
+            return {
+                call: {
+                    "calls": calls,
+                    "prompt_tokens": prompt,
+                    "cached_prompt_tokens": cached,
+                    "completion_tokens": completion,
+                    "avg_prompt_tokens": round(prompt / calls, 1) if calls else 0.0,
+                    "cached_ratio": round(cached / prompt, 4) if prompt else 0.0,
+                    "estimated_calls": estimated,
+                }
+                for call, (calls, prompt, cached, completion, estimated) in sorted(self._calls.items())
+            }
+
+
+metrics = LLMClientMetrics()
+usage_metrics = LLMUsageMetrics()
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def build_http_client():
+    """httpx client with keep-alive pooling and timeouts derived from QUERY_TIMEOUT"""
+    query_timeout = get_setting('QUERY_TIMEOUT', 30)
+    limits = httpx.Limits(
+        max_connections=get_setting('LLM_MAX_CONNECTIONS', 20),
+        max_keepalive_connections=get_setting('LLM_MAX_KEEPALIVE_CONNECTIONS', 10),
+        keepalive_expiry=get_setting('LLM_KEEPALIVE_EXPIRY', 60),
+    )
+    timeout = httpx.Timeout(
+        get_setting('LLM_TIMEOUT', query_timeout),
+        connect=min(get_setting('LLM_CONNECT_TIMEOUT', 5), query_timeout),
+        pool=query_timeout,
+    )
+    return httpx.Client(transport=InstrumentedTransport(metrics, limits=limits), timeout=timeout)
+
+
+def get_llm_client():
+    """
+    Return the process-wide OpenAI client. It shares one HTTP connection pool across
+    requests and retries 429s and transient failures with exponential backoff (honouring
+    Retry-After) up to LLM_MAX_RETRIES times. If OPENAI_BASE_URL is configured the client
+    talks to that OpenAI-compatible server instead of Azure. Forked processes open their
+    own pool rather than sharing the parent's sockets.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                http_client = build_http_client()
+                max_retries = get_setting('LLM_MAX_RETRIES', 3)
+                base_url = get_setting('OPENAI_BASE_URL')
+                if base_url:
+                    _client = OpenAI(
+                        api_key=get_setting('AZURE_OPENAI_API_KEY'),
+                        base_url=base_url,
+                        http_client=http_client,
+                        max_retries=max_retries,
+                    )
+                else:
+                    _client = AzureOpenAI(
+                        api_key=get_setting('AZURE_OPENAI_API_KEY'),
+                        api_version=get_setting('AZURE_OPENAI_API_VERSION'),
+                        azure_endpoint=get_setting('AZURE_OPENAI_ENDPOINT'),
+                        http_client=http_client,
+                        max_retries=max_retries,
+                    )
+                _client_pid = os.getpid()
+                logger.info(f"Created shared LLM client (max_retries={max_retries}, timeout={http_client.timeout})")
+    return _client
+
+
+def close_llm_client():
+    """Close the shared client's connections, if this process opened any"""
+    global _client
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+
+
+def llm_stats():
+    """Metrics for the shared LLM HTTP pool"""
+    return metrics.stats()
+
+
+def llm_usage_stats():
+    """Token usage per kind of LLM call"""
+    return usage_metrics.stats()
+
+
+def prompt_cache_options():
+    """
+    Extra create() arguments for provider prompt caching. Prompts are laid out with their
+    fixed part first, which OpenAI-compatible servers cache on their own; PROMPT_CACHE_KEY
+    additionally routes requests sharing a prefix to the same cache.
+    """
+    key = get_setting('PROMPT_CACHE_KEY')
+    return {"extra_body": {"prompt_cache_key": key}} if key else {}
+
+
+def estimate_tokens(messages):
+    """Rough prompt size (about four characters per token) for calls the provider reports no usage for"""
+    chars = 0
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+        chars += len(content or "")
+    return chars // 4
+
+
+def _usage_value(value, name):
+    if value is None:
+        return 0
+    found = value.get(name) if isinstance(value, dict) else getattr(value, name, None)
+    return found or 0
+
+
+def record_usage(call, usage, messages=(), completion_text=""):
+    """
+    Count one completion's tokens from the usage the provider reported, including prompt
+    tokens served from its cache. Streamed completions usually report none; their tokens
+    are estimated from the message and answer sizes. Never raises.
+    """
+    try:
+        if usage is not None:
+            prompt_tokens = _usage_value(usage, "prompt_tokens")
+            completion_tokens = _usage_value(usage, "completion_tokens")
+            details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(usage, "prompt_tokens_details", None)
+            cached_tokens = _usage_value(details, "cached_tokens")
+        else:
+            prompt_tokens = estimate_tokens(messages)
+            completion_tokens = len(completion_text or "") // 4
+            cached_tokens = 0
+        usage_metrics.record(call, prompt_tokens, completion_tokens, cached_tokens, estimated=usage is None)
+        record_tokens(call, prompt_tokens, completion_tokens, cached_tokens)
+    except Exception as e:
+        logger.warning(f"Could not record LLM usage: {str(e)}")
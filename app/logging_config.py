@@ -0,0 +1,158 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+
+from .jsonl_log import set_external_rotation
+from .metrics import get_request_id
+from .settings import get_setting, resolve_project_path
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s %(threadName)s : %(message)s'
+
+# Records waiting for the writer thread; beyond this they are dropped rather than
+# making request threads wait on disk
+DEFAULT_LOG_QUEUE_SIZE = 10000
+
+_lock = threading.Lock()
+_pid = None
+_queue_handler = None
+_listener = None
+_payload_sample_rate = 0.0
+
+
+class RequestIdFilter(logging.Filter):
+    """Tag records with the request id of the context that logged them"""
+
+    def filter(self, record):
+        record.request_id = get_request_id()
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler that never blocks the logging thread: records are handed to the writer
+    thread already formatted, and dropped (and counted) when the queue is full.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(shared_file=False):
+    """
+    Route all logging through a queue to a background writer thread, which writes to a
+    rotating LOG_FILE and the console as text or JSON lines (LOG_FORMAT). Safe to call
+    repeatedly; a forked process (e.g. a server worker) replaces the handler it inherited,
+    whose writer thread did not survive the fork.
+
+    With shared_file (several server workers appending to one LOG_FILE) the file is never
+    rotated in-process, where each worker would rotate it on its own and lose records;
+    it is reopened whenever an external rotator such as logrotate moves it. The same goes
+    for the JSON lines logs (query plans, slow queries).
+    """
+    global _pid, _queue_handler, _listener, _payload_sample_rate
+    set_external_rotation(shared_file)
+    with _lock:
+        if _pid == os.getpid():
+            return
+        root = logging.getLogger()
+        if _queue_handler is not None:
+            root.removeHandler(_queue_handler)
+
+        formatter = JsonFormatter() if get_setting('LOG_FORMAT', 'text') == 'json' else logging.Formatter(TEXT_FORMAT)
+        handlers = []
+        log_file = get_setting('LOG_FILE', 'app.log')
+        if log_file and shared_file:
+            handlers.append(WatchedFileHandler(resolve_project_path(log_file), encoding='utf-8', delay=True))
+        elif log_file:
+            handlers.append(RotatingFileHandler(
+                resolve_project_path(log_file),
+                maxBytes=get_setting('LOG_MAX_BYTES', 50 * 1024 * 1024),
+                backupCount=get_setting('LOG_BACKUP_COUNT', 5),
+                encoding='utf-8',
+                delay=True,
+            ))
+        if get_setting('LOG_TO_CONSOLE', True):
+            handlers.append(logging.StreamHandler())
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(get_setting('LOG_QUEUE_SIZE', DEFAULT_LOG_QUEUE_SIZE)))
+        _queue_handler.addFilter(RequestIdFilter())
+        _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+        root.addHandler(_queue_handler)
+        root.setLevel(getattr(logging, str(get_setting('LOG_LEVEL', 'INFO')).upper(), logging.INFO))
+        _payload_sample_rate = get_setting('LOG_PAYLOAD_SAMPLE_RATE', 0.01)
+        _pid = os.getpid()
+
+
+def stop_logging():
+    """Write out queued records and stop the writer thread (on shutdown)"""
+    global _pid, _listener
+    with _lock:
+        if _listener is not None and _pid == os.getpid():
+            logging.getLogger().removeHandler(_queue_handler)
+            _listener.stop()
+            _listener, _pid = None, None
+
+
+def should_log_payload(logger):
+    """
+    Whether to log a verbose payload (request bodies, headers, tool arguments, sample
+    rows): always when DEBUG is enabled, otherwise for LOG_PAYLOAD_SAMPLE_RATE of calls.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        return True
+    return logger.isEnabledFor(logging.INFO) and random.random() < _payload_sample_rate
+
+
+def logging_stats():
+    """Records dropped because the log queue was full"""
+    return {
+        "queued": _queue_handler.queue.qsize() if _queue_handler else 0,
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+    }
@@ -0,0 +1,220 @@
+import contextvars
+import heapq
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from .db import get_pool
+from .index_advisor import explain_query_plan
+from .jsonl_log import JsonLinesLog
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Upper bounds of the LLM token count histogram buckets
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+# Slowest queries kept in memory for /api/slow_queries
+DEFAULT_SLOW_QUERY_TOP_N = 20
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_request_started = contextvars.ContextVar("request_started", default=None)
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+_request_tokens = contextvars.ContextVar("request_tokens", default=None)
+
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram with one series per combination of label values"""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+
+    def observe(self, value, *label_values):
+        """Record one observation for the series identified by label_values"""
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        """Lines of the Prometheus text exposition format (buckets are cumulative)"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+            series = [(labels, list(values)) for labels, values in series]
+        for label_values, values in series:
+            labels = ",".join(f'{name}="{_escape_label(value)}"' for name, value in zip(self.label_names, label_values))
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {values[-2]}')
+            lines.append(f"{self.name}_count{{{labels}}} {values[-2]}")
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-1]:.6f}")
+        return lines
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_SECONDS = Histogram(
+    "imdb_stage_duration_seconds",
+    "Time spent in each stage of answering a request",
+    ("stage",),
+)
+REQUEST_SECONDS = Histogram(
+    "imdb_http_request_duration_seconds",
+    "Time from receiving a request to returning its response",
+    ("endpoint", "method", "status"),
+)
+LLM_TOKENS = Histogram(
+    "imdb_llm_tokens",
+    "Tokens per LLM call by call and kind (prompt, cached_prompt, completion)",
+    ("call", "kind"),
+    buckets=TOKEN_BUCKETS,
+)
+
+
+def new_request_id():
+    """Short id used to correlate the log lines and spans of one request"""
+    return str(uuid.uuid4())[:8]
+
+
+def start_request(request_id=None):
+    """Begin tracking a request in the current context and return its request id"""
+    request_id = request_id or new_request_id()
+    _request_id.set(request_id)
+    _request_started.set(time.perf_counter())
+    _request_spans.set([])
+    _request_tokens.set([])
+    return request_id
+
+
+def get_request_id():
+    """Request id of the request being handled in the current context, or None"""
+    return _request_id.get()
+
+
+def finish_request(endpoint, method, status_code):
+    """Record the request's total latency and log how it was spent, stage by stage"""
+    started = _request_started.get()
+    if started is None:
+        return None
+    elapsed = time.perf_counter() - started
+    REQUEST_SECONDS.observe(elapsed, endpoint or "unknown", method, str(status_code))
+    spans = _request_spans.get() or []
+    if spans:
+        stages = " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in spans)
+        logger.info(f"[{get_request_id()}] {endpoint} {status_code} in {elapsed * 1000:.1f}ms: {stages}")
+    calls = _request_tokens.get() or []
+    if calls:
+        tokens = " ".join(f"{call}={prompt}+{completion}" + (f" (cached {cached})" if cached else "")
+                          for call, prompt, completion, cached in calls)
+        logger.info(f"[{get_request_id()}] {endpoint} LLM tokens (prompt+completion): {tokens}")
+    _request_started.set(None)
+    return elapsed
+
+
+@contextmanager
+def span(stage):
+    """
+    Time a stage of the current request. The duration is added to the stage histogram
+    and to the request's spans, which are logged with its request id when it finishes.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def record_tokens(call, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Count the tokens of one LLM call in the token histogram and the current request's log line"""
+    LLM_TOKENS.observe(prompt_tokens, call, "prompt")
+    LLM_TOKENS.observe(completion_tokens, call, "completion")
+    if cached_tokens:
+        LLM_TOKENS.observe(cached_tokens, call, "cached_prompt")
+    calls = _request_tokens.get()
+    if calls is not None:
+        calls.append((call, prompt_tokens, completion_tokens, cached_tokens))
+
+
+def render_metrics():
+    """All histograms of this process in the Prometheus text format"""
+    lines = []
+    for histogram in (STAGE_SECONDS, REQUEST_SECONDS, LLM_TOKENS):
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+_slow_lock = threading.Lock()
+_slowest = []  # min-heap of (elapsed, sequence, entry)
+_slow_sequence = 0
+
+
+slow_query_log = JsonLinesLog('SLOW_QUERY_LOG', 'logs/slow_queries.jsonl', 'SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024)
+
+
+def record_slow_query(sql_query, elapsed, pool=None, params=None, plan=None):
+    """
+    Capture a query that took at least SLOW_QUERY_THRESHOLD_MS together with its plan
+    (`plan` when the caller already has it, else EXPLAINed here), keeping the slowest ones
+    in memory and queueing it for SLOW_QUERY_LOG. Never raises.
+    """
+    threshold = get_setting('SLOW_QUERY_THRESHOLD_MS', 1000)
+    if threshold is None or elapsed * 1000 < threshold:
+        return None
+    global _slow_sequence
+    try:
+        if plan is None:
+            with (pool or get_pool()).connection() as conn:
+                plan = explain_query_plan(conn, sql_query, params or ())
+
+        entry = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "request_id": get_request_id(),
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "sql_query": sql_query,
+            "params": params or {},
+            "plan": [detail for _, _, detail in plan],
+        }
+        logger.warning(f"[{entry['request_id']}] Slow query ({entry['elapsed_ms']} ms): {sql_query[:200]}")
+
+        top_n = get_setting('SLOW_QUERY_TOP_N', DEFAULT_SLOW_QUERY_TOP_N)
+        with _slow_lock:
+            _slow_sequence += 1
+            item = (elapsed, _slow_sequence, entry)
+            if len(_slowest) < top_n:
+                heapq.heappush(_slowest, item)
+            elif top_n and elapsed > _slowest[0][0]:
+                heapq.heapreplace(_slowest, item)
+        slow_query_log.append(entry)
+        return entry
+    except Exception as e:
+        logger.warning(f"Could not record slow query: {str(e)}")
+        return None
+
+
+def slowest_queries():
+    """Slowest queries captured by this process, slowest first"""
+    with _slow_lock:
+        return [entry for _, _, entry in sorted(_slowest, reverse=True)]
@@ -0,0 +1,219 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Words that do not change which SQL a question maps to
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "in", "on", "with", "by", "from", "to", "and", "me", "show",
+    "list", "find", "give", "get", "all", "some", "please", "what", "which", "are", "is", "were",
+    "was", "that", "who", "whose", "do", "does", "can", "you", "i", "want", "see",
+}
+
+
+# Negations, comparatives and superlatives: a question with one of these never shares SQL
+# with one without it, however similar the rest ("directed by" vs "not directed by")
+MODIFIERS = {
+    "not", "no", "non", "without", "except", "excluding", "never", "neither", "nor", "only",
+    "before", "after", "since", "until", "between", "under", "over", "above", "below", "than",
+    "less", "more", "fewer", "least", "most", "lower", "higher", "lowest", "highest", "greater",
+    "smaller", "older", "newer", "oldest", "newest", "earlier", "later", "earliest", "latest",
+    "shorter", "longer", "shortest", "longest", "worse", "better", "worst", "best", "top", "bottom",
+    "first", "last", "fewest",
+}
+
+
+def normalize_query(user_query):
+    """Exact-tier key: lowercase, punctuation stripped, whitespace collapsed"""
+    return " ".join(re.findall(r"[a-z0-9']+", user_query.lower()))
+
+
+def content_tokens(user_query):
+    """Order-independent content words with stopwords dropped and plurals folded"""
+    tokens = set()
+    for word in normalize_query(user_query).split():
+        if word in STOPWORDS:
+            continue
+        if word.endswith("n't"):
+            word = "not"
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.add(word)
+    return tokens
+
+
+def anchor_tokens(tokens):
+    """Tokens two questions must share exactly to share SQL: MODIFIERS and any token with a digit ("80s", "2nd")"""
+    return {token for token in tokens if token in MODIFIERS or any(c.isdigit() for c in token)}
+
+
+def shingles(tokens, size=3):
+    """Character shingles over the sorted content words"""
+    text = " ".join(sorted(tokens))
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class SQLGenerationCache:
+    """
+    Two-tier cache mapping natural language questions to SQL that has already executed
+    successfully, so repeated questions skip the LLM round trip.
+
+    The exact tier is an LRU keyed on the normalized question. The optional similarity
+    tier finds near-duplicates (word order, plurals, filler words) through an inverted
+    index of character shingles and accepts a candidate only if its Jaccard similarity
+    reaches the threshold and it mentions exactly the same numbers, negations and
+    comparatives, so "movies from the 80s" never answers "movies from the 90s" and "not directed
+    by" never answers "directed by". Entries expire after `ttl` seconds and the least
+    recently used entry is evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, max_entries=1000, ttl=86400, similarity_enabled=True, similarity_threshold=0.9):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_enabled = similarity_enabled
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = OrderedDict()  # normalized query -> entry dict
+        self._shingle_index = {}       # shingle -> set of normalized queries
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._exact_hits = 0
+        self._similar_hits = 0
+        self._misses = 0
+        self._generation_time = 0.0
+        self._generations = 0
+
+    def lookup(self, user_query):
+        """Return cached (sql, params) for the question (or a near-duplicate of it), or None"""
+        key = normalize_query(user_query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires"] > now:
+                self._entries.move_to_end(key)
+                self._exact_hits += 1
+                return entry["sql"], entry["params"]
+            if entry:
+                self._remove(key)
+
+            if self.similarity_enabled:
+                match = self._find_similar(user_query, now)
+                if match:
+                    self._entries.move_to_end(match)
+                    self._similar_hits += 1
+                    logger.info(f"NL cache near-duplicate hit: '{user_query}' ~ '{match}'")
+                    return self._entries[match]["sql"], self._entries[match]["params"]
+
+            self._misses += 1
+            return None
+
+    def store(self, user_query, sql_query, params=None):
+        """Remember SQL (and its bind parameters) generated for the question that executed successfully"""
+        key = normalize_query(user_query)
+        if not key:
+            return
+        tokens = content_tokens(user_query)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "sql": sql_query,
+                "params": dict(params or {}),
+                "expires": time.time() + self.ttl,
+                "shingles": shingles(tokens),
+                "anchors": anchor_tokens(tokens),
+            }
+            for shingle in self._entries[key]["shingles"]:
+                self._shingle_index.setdefault(shingle, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, user_query):
+        """Drop the entry for a question, e.g. when its cached SQL stopped validating"""
+        with self._lock:
+            self._remove(normalize_query(user_query))
+
+    def record_generation_time(self, seconds):
+        """Track LLM generation latency to estimate the time saved by hits"""
+        with self._lock:
+            self._generation_time += seconds
+            self._generations += 1
+
+    def stats(self):
+        """Hit rate and estimated latency saved"""
+        with self._lock:
+            hits = self._exact_hits + self._similar_hits
+            lookups = hits + self._misses
+            avg_generation = self._generation_time / self._generations if self._generations else 0.0
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self._exact_hits,
+                "similar_hits": self._similar_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "avg_generation_s": round(avg_generation, 3),
+                "estimated_time_saved_s": round(hits * avg_generation, 3),
+            }
+
+    def _find_similar(self, user_query, now):
+        tokens = content_tokens(user_query)
+        query_shingles = shingles(tokens)
+        if not query_shingles:
+            return None
+        anchors = anchor_tokens(tokens)
+
+        overlaps = {}
+        for shingle in query_shingles:
+            for key in self._shingle_index.get(shingle, ()):
+                overlaps[key] = overlaps.get(key, 0) + 1
+
+        best_key, best_score = None, 0.0
+        for key, overlap in overlaps.items():
+            entry = self._entries[key]
+            if entry["expires"] <= now or entry["anchors"] != anchors:
+                continue
+            score = overlap / (len(query_shingles) + len(entry["shingles"]) - overlap)
+            if score >= self.similarity_threshold and score > best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if not entry:
+            return
+        for shingle in entry["shingles"]:
+            keys = self._shingle_index.get(shingle)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._shingle_index[shingle]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_sql_cache():
+    """Return the process-wide NL-to-SQL cache, or None if NL_CACHE_ENABLED is off"""
+    global _cache
+    if not get_setting('NL_CACHE_ENABLED', True):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SQLGenerationCache(
+                    max_entries=get_setting('NL_CACHE_SIZE', 1000),
+                    ttl=get_setting('NL_CACHE_TTL', 86400),
+                    similarity_enabled=get_setting('NL_CACHE_SIMILARITY_ENABLED', True),
+                    similarity_threshold=get_setting('NL_CACHE_SIMILARITY_THRESHOLD', 0.9),
+                )
+    return _cache
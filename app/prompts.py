@@ -0,0 +1,602 @@
+import json
+import logging
+import math
+import re
+from collections import defaultdict
+
+from .intent_router import GENRE_ALIASES
+from .metrics import span
+from .nl_cache import content_tokens
+from .settings import get_setting
+from .sql_rewrite import AGGREGATE_TABLES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_EXAMPLES = 3
+
+# Examples scoring below this fraction of the best match are left out
+RELEVANCE_RATIO = 0.5
+
+FTS_TABLES = {"people_fts", "titles_fts", "akas_fts"}
+GENRE_TABLES = {"genres", "title_genres"}
+
+# Instructions every SQL generation request shares. They come first and never change, so
+# providers that cache prompt prefixes (OpenAI and Azure OpenAI do so automatically) can
+# reuse them; the per-question schema, hints and examples follow.
+SQL_SYSTEM_PREFIX = """
+    You are an expert SQL query generator for IMDb database analysis. Your task is to convert natural language queries into precise SQLite queries.
+
+    CRITICAL: This is SQLite - do NOT use functions like PERCENTILE_CONT, PERCENTILE_DISC, or other advanced statistical functions that don't exist in SQLite.
+
+    AVOIDING DUPLICATES:
+    - ALWAYS use SELECT DISTINCT when joining tables, especially with crew/people tables
+    - When multiple crew members are involved, use proper subqueries or GROUP BY with aggregation
+    - Be extra careful with queries involving actors, directors, or multiple people relationships
+
+    IMPORTANT RULES:
+    1. ALWAYS use SELECT DISTINCT to prevent duplicate results from JOINs
+    2. ALWAYS include ratings and votes when available
+    3. Use proper JOINs for relationships
+    4. OPTIMIZE for existing indices: Put most selective filters first in WHERE clause
+    5. For name searches: Try exact match first (uses ix_people_name index), then LIKE as fallback
+    6. For crew queries: Filter by category early (uses ix_crew_category index)
+    7. For title queries: Filter by type early (uses ix_titles_type index)
+    8. Include ORDER BY for better results (ratings DESC, premiered DESC, votes DESC)
+    9. Handle plural/singular variations (movie/movies, actor/actors)
+    10. Consider alternative titles in akas table for international searches
+    11. Use ONLY SQLite-compatible functions and syntax
+    12. BIND PARAMETERS: Never write a value taken from the question (names, titles, search patterns, genres, years, ratings, vote counts) into the SQL. Use a :name placeholder and put the value in "params" - quotes need no escaping there (e.g., "Conan O'Brien")
+
+    PERFORMANCE OPTIMIZATION GUIDELINES:
+    - Start queries with the most selective table (usually people for name searches)
+    - Use exact name matches when possible (leverages ix_people_name index)
+    - Filter by crew.category early (leverages ix_crew_category index)
+    - Filter by titles.type early (leverages ix_titles_type index)
+    - Put year filters before genre filters (years are more selective)
+    - Use INNER JOIN instead of LEFT JOIN when you need the related data
+    - Avoid LIKE '%pattern%' when exact matches are possible
+
+    GENRE MAPPING: Use these exact genre names from IMDb:
+    Action, Adventure, Animation, Biography, Comedy, Crime, Documentary, Drama, Family, Fantasy, Film-Noir, History, Horror, Music, Musical, Mystery, Romance, Sci-Fi, Sport, Thriller, War, Western
+
+    PERSON CATEGORY MAPPING:
+    - actor, actress → use 'actor' or both
+    - director → 'director'
+    - writer → 'writer'
+    - producer → 'producer'
+    - composer → 'composer'
+
+    OUTPUT FORMAT: Return ONLY a JSON object without markdown formatting or explanations:
+    {"sql": "<the SQL query with :name placeholders>", "params": {"<name>": <string or number>}}
+"""
+
+# One schema line per table, in the order they are described to the model
+SCHEMA_TABLES = {
+    "people": "- people: person_id (VARCHAR), name (VARCHAR), born (INTEGER), died (INTEGER)",
+    "titles": "- titles: title_id (VARCHAR), type (VARCHAR), primary_title (VARCHAR), original_title (VARCHAR), is_adult (INTEGER), premiered (INTEGER), ended (INTEGER), runtime_minutes (INTEGER), genres (VARCHAR)",
+    "akas": "- akas: title_id (VARCHAR), title (VARCHAR), region (VARCHAR), language (VARCHAR), types (VARCHAR), attributes (VARCHAR), is_original_title (INTEGER)",
+    "crew": "- crew: title_id (VARCHAR), person_id (VARCHAR), category (VARCHAR), job (VARCHAR), characters (VARCHAR)",
+    "episodes": "- episodes: episode_title_id (VARCHAR), show_title_id (VARCHAR), season_number (INTEGER), episode_number (INTEGER)",
+    "ratings": "- ratings: title_id (VARCHAR), rating (REAL), votes (INTEGER)",
+    "genres": "- genres: genre_id (INTEGER), genre (VARCHAR) -- one row per IMDb genre name",
+    "title_genres": "- title_genres: genre_id (INTEGER), title_id (VARCHAR) -- one row per title and genre, indexed by genre and by title",
+    "person_year_counts": "- person_year_counts: person_id (VARCHAR), category (VARCHAR), type (VARCHAR), year (INTEGER), title_count (INTEGER) -- crew credits per person, category, title type and release year",
+    "person_career_stats": "- person_career_stats: person_id (VARCHAR), category (VARCHAR), title_count (INTEGER), first_year (INTEGER), last_year (INTEGER), rated_titles (INTEGER), avg_rating (REAL), total_votes (INTEGER) -- movie/tvMovie filmography per person and category",
+    "decade_type_stats": "- decade_type_stats: decade (INTEGER), type (VARCHAR), title_count (INTEGER), rated_titles (INTEGER), avg_rating (REAL), avg_votes (REAL), total_votes (INTEGER)",
+    "genre_stats": "- genre_stats: genre (VARCHAR), type (VARCHAR), decade (INTEGER), title_count (INTEGER), rated_titles (INTEGER), avg_rating (REAL), total_votes (INTEGER)",
+}
+
+# Tables every question is described with
+CORE_TABLES = {"titles", "ratings"}
+
+# Question words that bring tables into the schema section (folded like questions are)
+TABLE_KEYWORDS = {
+    "people": "person people actor actress director directed writer written producer composer star starring "
+              "cast crew played acted filmography career together collaboration worked",
+    "akas": "aka alternative alternate international foreign translated region language country french german "
+            "spanish italian japanese korean indian known",
+    "episodes": "episode season series shows tv sitcom",
+    "genres": "genre",
+    "person_year_counts": "chart graph plot timeline yearly",
+    "person_career_stats": "prolific career filmography average avg",
+    "decade_type_stats": "decade average avg trend count number many",
+    "genre_stats": "genre average avg distribution popular trend",
+}
+TABLE_KEYWORDS = {table: content_tokens(words) for table, words in TABLE_KEYWORDS.items()}
+TABLE_KEYWORDS["crew"] = TABLE_KEYWORDS["people"]
+TABLE_KEYWORDS["title_genres"] = TABLE_KEYWORDS["genres"]
+
+SEARCH_INDEX_HINT = """
+    FULL-TEXT SEARCH INDEXES (FTS5 trigram, matched by rowid):
+    - people_fts(name) indexes people, titles_fts(primary_title, original_title) indexes titles, akas_fts(title) indexes akas
+    - For partial or fuzzy name/title lookups use MATCH instead of LIKE '%...%' (a full table scan):
+      p.rowid IN (SELECT rowid FROM people_fts WHERE people_fts MATCH :name_match) with params {"name_match": "name : \\"Hanks\\""}
+    - MATCH terms are case-insensitive substrings and need at least 3 characters; pass the whole MATCH expression as a parameter
+"""
+
+GENRE_INDEX_HINT = """
+    GENRE FILTERS: titles.genres is a comma-joined string, so t.genres LIKE '%Genre%' scans every title.
+    Filter genres through the title_genres bridge table instead:
+      t.title_id IN (SELECT tg.title_id FROM title_genres tg JOIN genres g ON g.genre_id = tg.genre_id WHERE g.genre = :genre)
+"""
+
+AGGREGATE_INDEX_HINT = """
+    PRECOMPUTED SUMMARY TABLES: counts, averages and careers over crew/titles are already aggregated.
+    Answer these analyses from the summary tables instead of grouping the crew or titles tables:
+    - Credits per year for a person -> person_year_counts (SUM(title_count) across categories/types)
+    - Filmography size, active years, average rating for a person -> person_career_stats
+    - Titles or ratings per decade and type -> decade_type_stats
+    - Titles or ratings per genre -> genre_stats (genre names as in GENRE MAPPING)
+"""
+
+# Few-shot examples. "keywords" adds words a question may use for the same shape, "requires"
+# names tables the example depends on and "superseded_by" tables whose presence makes a
+# better example apply instead.
+SQL_EXAMPLES = [
+    {
+        "question": "Movies with Jim Carrey rated above 7",
+        "keywords": "person actor actress starring rating rated above over",
+        "tables": {"people", "crew", "titles", "ratings"},
+        "sql": """SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes
+         FROM people p
+         JOIN crew c ON p.person_id = c.person_id
+         JOIN titles t ON c.title_id = t.title_id
+         JOIN ratings r ON t.title_id = r.title_id
+         WHERE p.name = :name
+         AND c.category IN ('actor', 'actress')
+         AND t.type IN ('movie', 'tvMovie')
+         AND r.rating > :min_rating
+         ORDER BY r.rating DESC, r.votes DESC;""",
+        "params": {"name": "Jim Carrey", "min_rating": 7.0},
+    },
+    {
+        "question": "Find actor by partial name (when exact name unknown)",
+        "keywords": "person actor actress name like similar spelled first last called",
+        "tables": {"people", "crew", "titles", "ratings"},
+        "sql": """SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes
+         FROM people p
+         JOIN crew c ON p.person_id = c.person_id
+         JOIN titles t ON c.title_id = t.title_id
+         LEFT JOIN ratings r ON t.title_id = r.title_id
+         WHERE (p.name = :name OR p.name LIKE :name_prefix OR p.name LIKE :name_suffix)
+         AND c.category IN ('actor', 'actress')
+         AND t.type IN ('movie', 'tvMovie')
+         ORDER BY r.rating DESC, r.votes DESC;""",
+        "params": {"name": "Tom Hanks", "name_prefix": "Tom Hanks%", "name_suffix": "%Tom Hanks"},
+    },
+    {
+        "question": "Movies where Leonardo DiCaprio and Kate Winslet worked together",
+        "keywords": "person actor actress together both and co star starring collaboration",
+        "tables": {"people", "crew", "titles", "ratings"},
+        "sql": """SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes
+         FROM people p1
+         JOIN crew c1 ON p1.person_id = c1.person_id
+         JOIN titles t ON c1.title_id = t.title_id
+         JOIN crew c2 ON t.title_id = c2.title_id
+         JOIN people p2 ON c2.person_id = p2.person_id
+         JOIN ratings r ON t.title_id = r.title_id
+         WHERE p1.name = :name1
+         AND p2.name = :name2
+         AND c1.category IN ('actor', 'actress')
+         AND c2.category IN ('actor', 'actress')
+         AND t.type IN ('movie', 'tvMovie')
+         ORDER BY r.rating DESC, r.votes DESC;""",
+        "params": {"name1": "Leonardo DiCaprio", "name2": "Kate Winslet"},
+    },
+    {
+        "question": "Highest rated sci-fi movies from 2010s",
+        "keywords": "genre year best top rated decade between",
+        "tables": {"titles", "ratings"},
+        "superseded_by": GENRE_TABLES,
+        "sql": """SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes
+         FROM titles t
+         JOIN ratings r ON t.title_id = r.title_id
+         WHERE t.type IN ('movie', 'tvMovie')
+         AND t.premiered BETWEEN :start_year AND :end_year
+         AND t.genres LIKE :genre
+         AND r.votes >= 1000
+         ORDER BY r.rating DESC, r.votes DESC;""",
+        "params": {"start_year": 2010, "end_year": 2019, "genre": "%Sci-Fi%"},
+    },
+    {
+        "question": "Highest rated sci-fi movies from 2010s",
+        "keywords": "genre year best top rated decade between",
+        "tables": {"titles", "ratings", "genres", "title_genres"},
+        "requires": GENRE_TABLES,
+        "sql": """SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes
+         FROM titles t
+         JOIN ratings r ON t.title_id = r.title_id
+         WHERE t.type IN ('movie', 'tvMovie')
+         AND t.premiered BETWEEN :start_year AND :end_year
+         AND t.title_id IN (SELECT tg.title_id FROM title_genres tg JOIN genres g ON g.genre_id = tg.genre_id WHERE g.genre = :genre)
+         AND r.votes >= 1000
+         ORDER BY r.rating DESC, r.votes DESC;""",
+        "params": {"start_year": 2010, "end_year": 2019, "genre": "Sci-Fi"},
+    },
+    {
+        "question": "Movies with Conan O'Brien",
+        "keywords": "person apostrophe quote name",
+        "tables": {"people", "crew", "titles", "ratings"},
+        "sql": """SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes
+         FROM people p
+         JOIN crew c ON p.person_id = c.person_id
+         JOIN titles t ON c.title_id = t.title_id
+         LEFT JOIN ratings r ON t.title_id = r.title_id
+         WHERE p.name = :name
+         AND t.type IN ('movie', 'tvMovie')
+         ORDER BY r.rating DESC, r.votes DESC;""",
+        "params": {"name": "Conan O'Brien"},
+    },
+    {
+        "question": "Directors who made both horror and comedy movies",
+        "keywords": "director genre both and count group having people who",
+        "tables": {"people", "crew", "titles", "ratings"},
+        "superseded_by": GENRE_TABLES,
+        "sql": """SELECT DISTINCT p.name, p.person_id,
+         COUNT(CASE WHEN t.genres LIKE :genre1 THEN 1 END) as horror_count,
+         COUNT(CASE WHEN t.genres LIKE :genre2 THEN 1 END) as comedy_count,
+         AVG(r.rating) as avg_rating
+         FROM people p
+         JOIN crew c ON p.person_id = c.person_id
+         JOIN titles t ON c.title_id = t.title_id
+         LEFT JOIN ratings r ON t.title_id = r.title_id
+         WHERE c.category = 'director'
+         AND t.type IN ('movie', 'tvMovie')
+         AND (t.genres LIKE :genre1 OR t.genres LIKE :genre2)
+         GROUP BY p.person_id, p.name
+         HAVING horror_count > 0 AND comedy_count > 0
+         ORDER BY avg_rating DESC;""",
+        "params": {"genre1": "%Horror%", "genre2": "%Comedy%"},
+    },
+    {
+        "question": "Directors who made both horror and comedy movies",
+        "keywords": "director genre both and count group having people who",
+        "tables": {"people", "crew", "titles", "ratings", "genres", "title_genres"},
+        "requires": GENRE_TABLES,
+        "sql": """SELECT p.name, p.person_id,
+         COUNT(DISTINCT CASE WHEN g.genre = :genre1 THEN t.title_id END) as horror_count,
+         COUNT(DISTINCT CASE WHEN g.genre = :genre2 THEN t.title_id END) as comedy_count,
+         AVG(r.rating) as avg_rating
+         FROM genres g
+         JOIN title_genres tg ON tg.genre_id = g.genre_id
+         JOIN titles t ON t.title_id = tg.title_id
+         JOIN crew c ON c.title_id = t.title_id
+         JOIN people p ON p.person_id = c.person_id
+         LEFT JOIN ratings r ON t.title_id = r.title_id
+         WHERE g.genre IN (:genre1, :genre2)
+         AND c.category = 'director'
+         AND t.type IN ('movie', 'tvMovie')
+         GROUP BY p.person_id, p.name
+         HAVING horror_count > 0 AND comedy_count > 0
+         ORDER BY avg_rating DESC;""",
+        "params": {"genre1": "Horror", "genre2": "Comedy"},
+    },
+    {
+        "question": "Movies with an actor whose name contains Hanks",
+        "keywords": "person actor actress name contains containing partial like similar spelled search",
+        "tables": {"people", "crew", "titles", "ratings"},
+        "requires": {"people_fts"},
+        "sql": """SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes
+         FROM people p
+         JOIN crew c ON p.person_id = c.person_id
+         JOIN titles t ON c.title_id = t.title_id
+         LEFT JOIN ratings r ON t.title_id = r.title_id
+         WHERE p.rowid IN (SELECT rowid FROM people_fts WHERE people_fts MATCH :name_match)
+         AND c.category IN ('actor', 'actress')
+         AND t.type IN ('movie', 'tvMovie')
+         ORDER BY r.rating DESC, r.votes DESC;""",
+        "params": {"name_match": "name : \"Hanks\""},
+    },
+    {
+        "question": "Titles with Godfather in the name",
+        "keywords": "title called named word contains containing partial like search",
+        "tables": {"titles", "ratings"},
+        "requires": {"titles_fts"},
+        "sql": """SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes
+         FROM titles t
+         LEFT JOIN ratings r ON t.title_id = r.title_id
+         WHERE t.rowid IN (SELECT rowid FROM titles_fts WHERE titles_fts MATCH :title_match)
+         ORDER BY r.votes DESC;""",
+        "params": {"title_match": "primary_title : \"Godfather\""},
+    },
+    {
+        "question": "Most prolific movie directors",
+        "keywords": "director person most prolific count number many career filmography",
+        "tables": {"people", "person_career_stats"},
+        "requires": {"person_career_stats"},
+        "sql": """SELECT p.name, s.title_count, s.first_year, s.last_year, s.avg_rating
+         FROM person_career_stats s
+         JOIN people p ON p.person_id = s.person_id
+         WHERE s.category = 'director'
+         ORDER BY s.title_count DESC
+         LIMIT 50;""",
+        "params": {},
+    },
+    {
+        "question": "Average movie rating by decade",
+        "keywords": "average avg rating decade trend per over time",
+        "tables": {"decade_type_stats"},
+        "requires": {"decade_type_stats"},
+        "sql": """SELECT decade, title_count, rated_titles, avg_rating, avg_votes
+         FROM decade_type_stats
+         WHERE type = 'movie'
+         ORDER BY decade;""",
+        "params": {},
+    },
+    {
+        "question": "Which genres have the best rated movies since 2000",
+        "keywords": "genre average avg rating best since decade year distribution",
+        "tables": {"genre_stats"},
+        "requires": {"genre_stats"},
+        "sql": """SELECT genre, SUM(title_count) as title_count, SUM(avg_rating * rated_titles) / SUM(rated_titles) as avg_rating
+         FROM genre_stats
+         WHERE type = :type AND decade >= :start_decade
+         GROUP BY genre
+         HAVING SUM(rated_titles) > 0
+         ORDER BY avg_rating DESC;""",
+        "params": {"type": "movie", "start_decade": 2000},
+    },
+]
+
+_NAME_PATTERN = re.compile(r"\b[A-Z][\w'.-]+(?:\s+[A-Z][\w'.-]+)+")
+_YEAR_PATTERN = re.compile(r"\b(?:1[89]|20)\d\ds?\b|'\d0s\b|\b\d0s\b")
+
+
+def question_tokens(question):
+    """
+    Content words of a question, with names replaced by 'person' (a name says nothing about
+    the query's shape) and 'genre' and 'year' added when it mentions one
+    """
+    unnamed = _NAME_PATTERN.sub(" ", question)
+    tokens = content_tokens(unnamed)
+    if unnamed != question:
+        tokens.add("person")
+    lowered = question.lower()
+    if any(re.search(rf"\b{re.escape(alias)}\b", lowered) for alias in GENRE_ALIASES):
+        tokens.add("genre")
+    if _YEAR_PATTERN.search(lowered):
+        tokens.add("year")
+    return tokens
+
+
+def render_example(example):
+    """An example as the prompt shows it: question, SQL with placeholders and its params"""
+    return (f'    Query: "{example["question"]}"\n'
+            f'    SQL: {example["sql"]}\n'
+            f'    Params: {json.dumps(example["params"])}\n')
+
+
+class ExampleIndex:
+    """
+    Picks the few-shot examples closest to a question. Each example is indexed under the
+    words of its question and keywords; a question scores every example sharing a word
+    with it by the summed inverse document frequency of the shared words, so distinctive
+    words ("together", "decade") count for more than common ones ("movie").
+    """
+
+    def __init__(self, examples):
+        self.examples = examples
+        self._postings = defaultdict(set)  # word -> indexes of examples using it
+        for i, example in enumerate(examples):
+            for token in question_tokens(example["question"]) | content_tokens(example.get("keywords", "")):
+                self._postings[token].add(i)
+        count = len(examples)
+        self._idf = {token: math.log(1 + count / len(ids)) for token, ids in self._postings.items()}
+
+    def select(self, question, limit, table_names):
+        """Up to limit examples for the question, best first, among those this database supports"""
+        eligible = [i for i, example in enumerate(self.examples) if example_applies(example, table_names)]
+        scores = defaultdict(float)
+        for token in question_tokens(question):
+            for i in self._postings.get(token, ()):
+                scores[i] += self._idf[token]
+        ranked = sorted((i for i in eligible if scores[i] > 0), key=lambda i: (-scores[i], i))
+        if ranked:
+            # Examples sharing only common words with the question add tokens but no guidance
+            best = scores[ranked[0]]
+            ranked = [i for i in ranked if scores[i] >= best * RELEVANCE_RATIO]
+        elif eligible:
+            # Nothing in common: the first example still shows the output format
+            ranked = eligible[:1]
+        return [self.examples[i] for i in ranked[:limit]]
+
+
+def example_applies(example, table_names):
+    """Whether the database has the example's tables and no better variant supersedes it"""
+    if not example.get("requires", set()) <= table_names:
+        return False
+    superseded_by = example.get("superseded_by")
+    return not (superseded_by and superseded_by <= table_names)
+
+
+_example_index = ExampleIndex(SQL_EXAMPLES)
+
+
+def select_tables(question, examples, table_names):
+    """Schema tables for a question: the core tables, those its words point to and those its examples use"""
+    tokens = question_tokens(question)
+    tables = set(CORE_TABLES)
+    for table, keywords in TABLE_KEYWORDS.items():
+        if tokens & keywords:
+            tables.add(table)
+    for example in examples:
+        tables |= example["tables"]
+    # Optional tables are only described if this database has them
+    optional = GENRE_TABLES | AGGREGATE_TABLES
+    return [table for table in SCHEMA_TABLES if table in tables and (table not in optional or table in table_names)]
+
+
+def build_sql_prompt(user_query, table_names):
+    """
+    System message for SQL generation. The fixed instructions come first; after them only
+    the schema tables, index hints and examples relevant to the question, unless
+    PROMPT_DYNAMIC_ENABLED is off, in which case everything this database supports is included.
+    """
+    with span("prompt_build"):
+        table_names = set(table_names)
+        if get_setting('PROMPT_DYNAMIC_ENABLED', True):
+            limit = get_setting('PROMPT_MAX_EXAMPLES', DEFAULT_MAX_EXAMPLES)
+            examples = _example_index.select(user_query, limit, table_names)
+            tables = select_tables(user_query, examples, table_names)
+        else:
+            examples = [example for example in SQL_EXAMPLES if example_applies(example, table_names)]
+            tables = [table for table in SCHEMA_TABLES
+                      if table not in GENRE_TABLES | AGGREGATE_TABLES or table in table_names]
+
+        hints = ""
+        if FTS_TABLES <= table_names:
+            hints += SEARCH_INDEX_HINT
+        if GENRE_TABLES <= set(tables):
+            hints += GENRE_INDEX_HINT
+        if set(tables) & AGGREGATE_TABLES:
+            hints += AGGREGATE_INDEX_HINT
+
+        prompt = (SQL_SYSTEM_PREFIX
+                  + "\n    DATABASE SCHEMA:\n"
+                  + "".join(f"    {SCHEMA_TABLES[table]}\n" for table in tables)
+                  + hints
+                  + "\n    INDEX-OPTIMIZED EXAMPLES:\n\n"
+                  + "\n".join(render_example(example) for example in examples))
+    logger.debug(f"SQL prompt: {len(prompt)} chars, tables {tables}, {len(examples)} example(s)")
+    return prompt
+
+
+CHAT_CORE_PROMPT = """You are a knowledgeable and enthusiastic IMDb movie expert assistant. You're passionate about cinema and love helping people discover great films and shows. You have access to a comprehensive IMDb database and can create visualizations.
+
+## PERSONALITY & TONE:
+- Be conversational, friendly, and genuinely excited about movies/TV
+- Ask follow-up questions to better understand what they're looking for
+- Share interesting insights and trivia when relevant
+- Use natural language, contractions, and casual expressions
+- Be curious and engaging, not just informational
+- React emotionally to findings ("That's fascinating!", "Wow, what a career!", "Interesting pattern!")
+
+## CONVERSATIONAL PATTERNS:
+Instead of just: "Here are the results"
+Try: "Oh, this is interesting! I found [number] movies/shows that match what you're looking for. Let me show you what I discovered..."
+
+Instead of: "The search returned 50 results"
+Try: "Great question! I found quite a few options for you - 50 movies that fit your criteria. Here are some highlights..."
+
+## RESPONSE STRUCTURE:
+1. **Acknowledge & React**: Show you understood and are excited to help
+2. **Provide Context**: Give a brief overview of what you found
+3. **Highlight Key Findings**: Point out the most interesting/relevant results
+4. **Offer Insights**: Share patterns, surprises, or notable observations
+5. **Suggest Next Steps**: Ask if they want to explore further or dive deeper
+
+## DATA STORYTELLING:
+- Don't just present tables - tell the story the data reveals
+- Highlight trends, patterns, and notable outliers
+- Compare and contrast findings
+- Explain why certain results might be significant
+- Connect findings to broader cinema knowledge
+
+**Conversational Techniques:**
+- Use contractions (I'm, you're, let's, that's)
+- Include emotional reactions (Amazing!, Wow!, Interesting!)
+- Ask rhetorical questions (Isn't that fascinating?)
+- Use casual transitions (By the way, Speaking of which, Oh!)
+- Reference previous conversations when relevant
+- Acknowledge user preferences and adapt accordingly
+
+Remember: You're not just a search engine - you're a movie-loving friend sharing discoveries!
+"""
+
+CHAT_TOOLS_PROMPT = """
+## AVAILABLE FUNCTIONS:
+- search_imdb_database: Search for movies, people, analyze data
+- generate_chart: Create bar, line, pie, histogram, stacked bar or multi-series line charts
+
+## CHART REQUESTS:
+When users want visualizations:
+1. Call search_imdb_database with chart_request=True, and chart_type (histogram for distributions such as ratings, stacked_bar or multi_line to split by genre or role) and bucket="decade" for long careers when useful
+2. Call generate_chart to create the visualization
+3. Explain what the chart reveals about trends or patterns
+"""
+
+# Answer styles: an example response and a strategy per kind of question
+CHAT_EXAMPLES = {
+    "movie": """For movie searches:
+"Ah, you're looking for sci-fi movies! I love exploring this genre. Let me dive into the database... *searches*
+
+Wow! I found 247 sci-fi films that match your criteria. What's really fascinating is the variety here - from mind-bending classics like '2001: A Space Odyssey' to modern blockbusters like 'Dune'. I'm seeing some incredible ratings too!
+
+Here are the standout picks..." [then show data]
+""",
+    "person": """For person searches:
+"Tom Hanks! Now there's an absolute legend of cinema. Let me pull up his filmography... *searches*
+
+This is amazing - the man has been in 67 films spanning over 4 decades! What strikes me most is his incredible range, from comedy gold like 'Big' to dramatic masterpieces like 'Forrest Gump'. His average rating is consistently high too.
+
+Want to see his career timeline? I can create a chart showing how his output has evolved over the years!"
+""",
+}
+
+CHAT_STRATEGIES = {
+    "movie": "- **Movie Searches**: Express excitement about the genre/actor, mention interesting trivia when relevant, highlight standout films or surprising discoveries, ask follow-up questions about preferences\n",
+    "person": "- **Person/Actor Searches**: Share enthusiasm about their career, point out interesting career patterns or achievements, mention notable collaborations or career highlights, suggest related searches or comparisons\n",
+    "chart": "- **Chart/Analysis Requests**: Get excited about the data visualization, explain what trends or patterns are revealed, share insights about what the data tells us, suggest additional angles to explore\n",
+    "top": "- **Top Lists/Rankings**: Express surprise at interesting rankings, point out unexpected entries, share context about why certain films rank highly, invite discussion about the results\n",
+}
+
+# search_imdb_database query types -> answer style
+QUERY_TYPE_STYLES = {
+    "movie_search": "movie",
+    "person_search": "person",
+    "collaboration": "person",
+    "chart_data": "chart",
+    "analysis": "chart",
+}
+
+_TOP_LIST_PATTERN = re.compile(r"\b(?:top|best|highest|lowest|worst|greatest|rank\w*)\b", re.IGNORECASE)
+
+
+def answer_styles(user_query, query_types):
+    """Answer styles for a turn, from the query types the model searched with and the question's wording"""
+    styles = []
+    for query_type in query_types:
+        style = QUERY_TYPE_STYLES.get(query_type)
+        if style and style not in styles:
+            styles.append(style)
+    if _TOP_LIST_PATTERN.search(user_query or ""):
+        styles.append("top")
+    return styles or ["movie"]
+
+
+def full_chat_prompt():
+    """The chat system message with every section, as used when PROMPT_DYNAMIC_ENABLED is off"""
+    return (CHAT_CORE_PROMPT + CHAT_TOOLS_PROMPT
+            + "\n## EXAMPLES OF GREAT RESPONSES:\n\n" + "\n".join(CHAT_EXAMPLES.values())
+            + "\n## DYNAMIC RESPONSE STRATEGIES:\n\n**For Different Query Types:**\n\n"
+            + "\n".join(CHAT_STRATEGIES.values()))
+
+
+def build_chat_prompt():
+    """
+    System message for the tool-selection call: the shared core plus the tool instructions.
+    It is the same for every question, so the whole message is a cacheable prefix.
+    """
+    with span("prompt_build"):
+        if not get_setting('PROMPT_DYNAMIC_ENABLED', True):
+            return full_chat_prompt()
+        return CHAT_CORE_PROMPT + CHAT_TOOLS_PROMPT
+
+
+def build_chat_answer_prompt(user_query, query_types=()):
+    """
+    System message for the call that writes the answer from tool results: the shared core
+    plus the response example and strategy for the kinds of search that were run. Tool
+    instructions are left out because no tools are offered on this call.
+    """
+    with span("prompt_build"):
+        if not get_setting('PROMPT_DYNAMIC_ENABLED', True):
+            return full_chat_prompt()
+        styles = answer_styles(user_query, query_types)
+        examples = [CHAT_EXAMPLES[style] for style in styles if style in CHAT_EXAMPLES]
+        prompt = CHAT_CORE_PROMPT
+        if examples:
+            prompt += "\n## EXAMPLES OF GREAT RESPONSES:\n\n" + "\n".join(examples)
+        prompt += ("\n## DYNAMIC RESPONSE STRATEGIES:\n\n**For Different Query Types:**\n\n"
+                   + "\n".join(CHAT_STRATEGIES[style] for style in styles))
+        return prompt
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from .db import get_database_path
+from .settings import get_setting, resolve_project_path
+
+logger = logging.getLogger(__name__)
+
+# Layout of cached pages: [rows, column_names, next_offset, next_after]
+PAYLOAD_FORMAT = 2
+
+# String literals and quoted identifiers are kept verbatim when canonicalizing SQL
+_QUOTED_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+
+
+def _canonical_code(code):
+    code = " ".join(code.split())
+    return re.sub(r"\s*([(),=<>])\s*", r"\1", code)
+
+
+def canonicalize_sql(sql_query):
+    """Cache key form of a query: whitespace outside literals collapsed, trailing ';' dropped"""
+    parts = []
+    last = 0
+    for match in _QUOTED_PATTERN.finditer(sql_query):
+        parts.append(_canonical_code(sql_query[last:match.start()]))
+        parts.append(match.group(0))
+        last = match.end()
+    parts.append(_canonical_code(sql_query[last:]))
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def read_database_version(db_path):
+    """
+    Cheap fingerprint of the database file: mtime, size, the header's file change
+    counter and user_version. Changes whenever the database is rebuilt or written.
+    """
+    stat = os.stat(db_path)
+    with open(db_path, "rb") as f:
+        header = f.read(100)
+    change_counter = struct.unpack(">I", header[24:28])[0] if len(header) >= 28 else 0
+    user_version = struct.unpack(">I", header[60:64])[0] if len(header) >= 64 else 0
+    return f"{stat.st_mtime_ns}:{stat.st_size}:{change_counter}:{user_version}"
+
+
+class ResultCache:
+    """
+    Result pages of read-only queries keyed on canonicalized SQL, its bind parameters
+    and the page bounds.
+
+    The in-memory tier is an LRU bounded by the serialized size of its entries. When a
+    spill path is configured every entry is also written to an SQLite file (bounded
+    by its own byte budget), so results survive restarts and memory evictions. Entries
+    are tagged with the database version and everything is invalidated as soon as the
+    database file's mtime, change counter or user_version changes.
+    """
+
+    def __init__(self, db_path, max_bytes=64 * 1024 * 1024, max_entry_bytes=4 * 1024 * 1024,
+                 spill_path=None, spill_max_bytes=512 * 1024 * 1024, version_check_interval=1.0):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.spill_path = spill_path
+        self.spill_max_bytes = spill_max_bytes
+        self.version_check_interval = version_check_interval
+        self.pid = os.getpid()
+
+        self._entries = OrderedDict()  # key -> JSON-encoded page
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version = read_database_version(db_path)
+        self._version_checked = time.monotonic()
+
+        # Metrics
+        self._hits = 0
+        self._spill_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+        self._spill = None
+        if spill_path:
+            self._open_spill()
+
+    def get(self, sql_query, offset, limit, params=None):
+        """Return (rows, column_names, next_offset, next_after) for a cached page, or None"""
+        key = self._key(sql_query, offset, limit, params)
+        with self._lock:
+            self._check_version()
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return json.loads(payload)
+
+            payload = self._spill_get(key)
+            if payload is not None:
+                self._spill_hits += 1
+                self._remember(key, payload)
+                return json.loads(payload)
+
+            self._misses += 1
+            return None
+
+    def put(self, sql_query, offset, limit, rows, column_names, next_offset, params=None, next_after=None):
+        """
+        Cache a result page with where the next one starts (its offset and keyset
+        continuation); pages larger than max_entry_bytes or not JSON-serializable are skipped
+        """
+        try:
+            payload = json.dumps([[tuple(row) for row in rows], list(column_names), next_offset, next_after],
+                                 separators=(",", ":")).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            # e.g. BLOB columns; the page is still returned, just not cached
+            logger.debug(f"Not caching result page: {str(e)}")
+            return
+        if len(payload) > self.max_entry_bytes:
+            return
+        key = self._key(sql_query, offset, limit, params)
+        with self._lock:
+            self._check_version()
+            self._remember(key, payload)
+            self._spill_put(key, payload)
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._spill:
+                self._spill.execute("DELETE FROM results")
+                self._spill.commit()
+
+    def stats(self):
+        """Hit rate, memory use and eviction counters"""
+        with self._lock:
+            hits = self._hits + self._spill_hits
+            lookups = hits + self._misses
+            stats = {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "spill_hits": self._spill_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "database_version": self._version,
+            }
+            if self._spill:
+                count, size = self._spill.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+                stats["spill_entries"] = count
+                stats["spill_bytes"] = size
+            return stats
+
+    def _key(self, sql_query, offset, limit, params=None):
+        canonical = canonicalize_sql(sql_query)
+        if params:
+            canonical += "\x00" + json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+        # Versioned, so spilled pages in an older payload layout are never read back
+        return hashlib.sha256(f"{PAYLOAD_FORMAT}\x00{canonical}\x00{offset}\x00{limit}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, payload):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = payload
+        self._bytes += len(payload)
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._evictions += 1
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._version_checked < self.version_check_interval:
+            return
+        self._version_checked = now
+        try:
+            version = read_database_version(self.db_path)
+        except OSError as e:
+            logger.warning(f"Could not read database version: {str(e)}")
+            return
+        if version != self._version:
+            logger.info(f"Database changed ({self._version} -> {version}), invalidating result cache")
+            self._version = version
+            self._entries.clear()
+            self._bytes = 0
+            self._invalidations += 1
+            self._spill_purge_stale()
+
+    def _open_spill(self):
+        os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+        self._spill = sqlite3.connect(self.spill_path, check_same_thread=False)
+        self._spill.execute("PRAGMA journal_mode = WAL")
+        self._spill.execute("PRAGMA synchronous = NORMAL")
+        self._spill.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._spill.execute("CREATE INDEX IF NOT EXISTS ix_results_last_used ON results (last_used)")
+        self._spill_purge_stale()
+        logger.info(f"Result cache spill tier at {self.spill_path}")
+
+    def _spill_get(self, key):
+        if not self._spill:
+            return None
+        row = self._spill.execute(
+            "SELECT payload FROM results WHERE key = ? AND version = ?", (key, self._version)
+        ).fetchone()
+        if row is None:
+            return None
+        self._spill.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._spill.commit()
+        return row[0]
+
+    def _spill_put(self, key, payload):
+        if not self._spill:
+            return
+        try:
+            self._spill.execute(
+                "INSERT OR REPLACE INTO results (key, version, payload, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, self._version, payload, len(payload), time.time())
+            )
+            total = self._spill.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.spill_max_bytes:
+                # Drop the least recently used entries until the tier is back to 90% of its budget
+                excess = total - int(self.spill_max_bytes * 0.9)
+                stale_keys = []
+                for stale_key, size in self._spill.execute("SELECT key, size FROM results ORDER BY last_used"):
+                    if excess <= 0:
+                        break
+                    stale_keys.append((stale_key,))
+                    excess -= size
+                self._spill.executemany("DELETE FROM results WHERE key = ?", stale_keys)
+            self._spill.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache spill write failed: {str(e)}")
+
+    def _spill_purge_stale(self):
+        if not self._spill:
+            return
+        deleted = self._spill.execute("DELETE FROM results WHERE version != ?", (self._version,)).rowcount
+        self._spill.commit()
+        if deleted:
+            logger.info(f"Purged {deleted} stale entries from the result cache spill tier")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Return the process-wide result cache, or None if RESULT_CACHE_ENABLED is off"""
+    global _cache
+    if not get_setting('RESULT_CACHE_ENABLED', True):
+        return None
+    # A forked process builds its own cache rather than sharing the parent's spill connection
+    if _cache is None or _cache.pid != os.getpid():
+        with _cache_lock:
+            if _cache is None or _cache.pid != os.getpid():
+                spill_path = get_setting('RESULT_CACHE_SPILL_PATH')
+                _cache = ResultCache(
+                    get_database_path(),
+                    max_bytes=get_setting('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+                    max_entry_bytes=get_setting('RESULT_CACHE_MAX_ENTRY_BYTES', 4 * 1024 * 1024),
+                    spill_path=resolve_project_path(spill_path) if spill_path else None,
+                    spill_max_bytes=get_setting('RESULT_CACHE_SPILL_MAX_BYTES', 512 * 1024 * 1024),
+                )
+    return _cache
@@ -0,0 +1,38 @@
+import os
+import sys
+import types
+
+# config.py lives in the project root, next to run.py
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+try:
+    import config
+except ImportError:
+    config = None
+
+
+def get_setting(name, default=None):
+    """Return a setting from config.py, or the default if it is not defined there"""
+    return getattr(config, name, default)
+
+
+def resolve_project_path(path):
+    """Resolve a path from config.py relative to the project root"""
+    if os.path.isabs(path):
+        return path
+    return os.path.join(PROJECT_ROOT, path)
+
+
+def override_settings(**values):
+    """
+    Override settings for this process (benchmarks and tools). Call before the app opens
+    its connection pool or LLM client, which read their settings once. Without a
+    config.py the overrides become the whole configuration.
+    """
+    global config
+    if config is None:
+        config = sys.modules["config"] = types.ModuleType("config")
+    for name, value in values.items():
+        setattr(config, name, value)
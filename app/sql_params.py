@@ -0,0 +1,82 @@
+import json
+import re
+
+from .db import InvalidQueryError
+
+# A string literal or quoted identifier (skipped whole) or a :name bind parameter
+_PARAMETER_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|(?<![:\w]):(?P<name>[A-Za-z_]\w*)")
+
+_CODE_FENCE_PATTERN = re.compile(r"^```(?:sql|json)?\s*|\s*```$", re.IGNORECASE)
+
+# Values a bind parameter may hold
+PARAMETER_TYPES = (str, int, float, type(None))
+
+
+def parameter_names(sql_query):
+    """Names of the :name bind parameters a statement uses (outside string literals)"""
+    return {match.group("name") for match in _PARAMETER_PATTERN.finditer(sql_query) if match.group("name")}
+
+
+def sql_literal(value):
+    """SQLite literal for a parameter value"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def render_sql(sql_query, params):
+    """The statement with its parameters inlined as literals, for display and copying"""
+    if not params:
+        return sql_query
+
+    def replace(match):
+        name = match.group("name")
+        if name and name in params:
+            return sql_literal(params[name])
+        return match.group(0)
+
+    return _PARAMETER_PATTERN.sub(replace, sql_query)
+
+
+def check_params(sql_query, params):
+    """
+    Validate a parameter map against a statement and return only the parameters it uses.
+    Raises InvalidQueryError for a missing value or an unsupported value type.
+    """
+    if params is None:
+        params = {}
+    if not isinstance(params, dict):
+        raise InvalidQueryError("Parameters must be an object mapping names to values")
+    params = dict(params)
+    names = parameter_names(sql_query)
+    missing = sorted(names - set(params))
+    if missing:
+        raise InvalidQueryError(f"No value given for parameter(s): {', '.join(':' + name for name in missing)}")
+    for name in names:
+        value = params[name]
+        if isinstance(value, bool):
+            params[name] = value = int(value)
+        if not isinstance(value, PARAMETER_TYPES):
+            raise InvalidQueryError(f"Parameter :{name} must be a string, number or null")
+    return {name: params[name] for name in names}
+
+
+def parse_generated_sql(content):
+    """
+    (sql, params, parameterized) from a model's answer: a JSON object with "sql" and "params",
+    with or without a code fence. Plain SQL (from older prompts or models that ignore the
+    format) comes back with no parameters and parameterized False.
+    """
+    content = _CODE_FENCE_PATTERN.sub("", content.strip()).strip()
+    if content.startswith("{"):
+        try:
+            answer = json.loads(content)
+        except ValueError as e:
+            raise InvalidQueryError(f"Model answer is not valid JSON: {str(e)}") from e
+        sql_query = str(answer.get("sql") or "").strip()
+        if not sql_query:
+            raise InvalidQueryError("Model answer has no SQL")
+        return sql_query, check_params(sql_query, answer.get("params") or {}), True
+    return content, {}, False
@@ -0,0 +1,274 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Columns covered by the FTS5 trigram indexes built with `python -m app.build fts`
+FTS_COLUMNS = {
+    ("people", "name"): "people_fts",
+    ("titles", "primary_title"): "titles_fts",
+    ("titles", "original_title"): "titles_fts",
+    ("akas", "title"): "akas_fts",
+}
+
+# Bridge tables built with `python -m app.build genres`
+GENRE_TABLES = {"genres", "title_genres"}
+
+# Summary tables built with `python -m app.build aggregates`
+AGGREGATE_TABLES = {"person_year_counts", "person_career_stats", "decade_type_stats", "genre_stats"}
+
+# Trigram indexes cannot answer substrings shorter than this
+MIN_FTS_TERM_LENGTH = 3
+
+_SQL_KEYWORDS = {
+    "on", "using", "where", "join", "inner", "left", "right", "full", "outer", "cross", "natural",
+    "group", "order", "limit", "having", "union", "except", "intersect", "window", "as", "select", "from",
+}
+
+_KEYWORD_ALTERNATION = "|".join(sorted(_SQL_KEYWORDS))
+
+# `table [AS] alias` where the alias is not a keyword (and the name is not a function or qualifier)
+_TABLE_ENTRY = rf"(\w+)(?:\s+(?:AS\s+)?(?!(?:{_KEYWORD_ALTERNATION})\b)(\w+))?(?!\s*[.(])"
+
+# `FROM|JOIN table [AS] alias`
+_TABLE_REFERENCE_PATTERN = re.compile(rf"\b(?P<lead>FROM|JOIN)\s+{_TABLE_ENTRY}", re.IGNORECASE)
+# `, table [AS] alias`, only looked for inside the FROM list (commas elsewhere separate columns)
+_FROM_LIST_ENTRY_PATTERN = re.compile(rf",\s*{_TABLE_ENTRY}", re.IGNORECASE)
+# Keywords that start the next clause (AS only introduces an alias)
+_CLAUSE_ALTERNATION = "|".join(sorted(_SQL_KEYWORDS - {"as"}))
+_FROM_LIST_END = re.compile(rf"\b(?:{_CLAUSE_ALTERNATION})\b|[();]", re.IGNORECASE)
+
+# A string literal (consumed whole so nothing inside it is rewritten) or a
+# `[qualifier.]column LIKE 'pattern'` (or `LIKE :param`) predicate without an ESCAPE clause
+_LIKE_PATTERN = re.compile(
+    r"(?P<literal>'(?:[^']|'')*')"
+    r"|(?<![\w.])(?:(?P<qualifier>\w+)\.)?(?P<column>\w+)\s+LIKE\s+"
+    r"(?:'(?P<pattern>(?:[^']|'')*)'|:(?P<param>[A-Za-z_]\w*))(?!\s*ESCAPE\b)",
+    re.IGNORECASE,
+)
+
+# A predicate is a plain condition term (where NULL and false both filter the row out) when
+# it follows WHERE/ON/HAVING/AND/OR and is followed by AND/OR or the end of the condition
+_CONDITION_BEFORE = re.compile(r"\b(?:WHERE|ON|HAVING|AND|OR)\s*(?:\(\s*)*$", re.IGNORECASE)
+_CONDITION_AFTER = re.compile(
+    r"(?:\s*\))*\s*(?:\b(?:AND|OR|GROUP|ORDER|LIMIT|HAVING|WINDOW|UNION|EXCEPT|INTERSECT)\b|;|$)", re.IGNORECASE)
+# NOT outside string literals (IS NOT only compares)
+_NEGATION_PATTERN = re.compile(r"'(?:[^']|'')*'|\bIS\s+NOT\b|(?P<negation>\bNOT\b)", re.IGNORECASE)
+
+
+_LITERAL = r"'(?:[^']|'')*'"
+_VALUE = rf"(?:{_LITERAL}|:[A-Za-z_]\w*)"
+_VALUE_FILTER = rf"IN \((?:{_LITERAL}|[^')])*\)|= {_VALUE}"
+
+# Credits per year for one person (the career chart query), answerable from person_year_counts.
+# Written with single spaces, each of which matches any run of whitespace.
+_PERSON_YEAR_COUNTS_PATTERN = re.compile((
+    r"SELECT (?P<t>\w+)\.premiered AS (?P<year>\w+), COUNT\(\*\) AS (?P<count>\w+) "
+    r"FROM people (?P<p>\w+) JOIN crew (?P<c>\w+) ON (?P=p)\.person_id = (?P=c)\.person_id "
+    r"JOIN titles (?P=t) ON (?P=c)\.title_id = (?P=t)\.title_id "
+    rf"WHERE (?P=p)\.name = (?P<name>{_VALUE}) "
+    rf"AND (?P=c)\.category (?P<category>{_VALUE_FILTER}) "
+    rf"AND (?P=t)\.type (?P<type>{_VALUE_FILTER}) "
+    r"AND (?P=t)\.premiered IS NOT NULL GROUP BY (?P=t)\.premiered ORDER BY (?P=t)\.premiered"
+).replace(" ", r"\s+") + r"\s*;?", re.IGNORECASE)
+
+
+def table_references(sql_query):
+    """Map every alias (and bare table name) in FROM/JOIN clauses to its table"""
+    references = {}
+
+    def add(table, alias):
+        table = table.lower()
+        references.setdefault(table, table)
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            references[alias.lower()] = table
+
+    for match in _TABLE_REFERENCE_PATTERN.finditer(sql_query):
+        add(match.group(2), match.group(3))
+        if match.group("lead").upper() == "FROM":
+            # `FROM a x, b y`: the rest of the comma-separated list up to the next clause
+            end = _FROM_LIST_END.search(sql_query, match.end())
+            for entry in _FROM_LIST_ENTRY_PATTERN.finditer(sql_query, match.end(), end.start() if end else len(sql_query)):
+                add(entry.group(1), entry.group(2))
+    return references
+
+
+def longest_literal_run(like_pattern):
+    """Longest stretch of a LIKE pattern without % or _ wildcards"""
+    return max(re.split(r"[%_]", like_pattern), key=len)
+
+
+def fts_phrase_query(column, term):
+    """FTS5 query for `term` as a phrase in one column"""
+    return f'{column} : "' + term.replace('"', '""') + '"'
+
+
+def fts_match_literal(column, term):
+    """SQL string literal holding an FTS5 query for `term` as a phrase in one column"""
+    return "'" + fts_phrase_query(column, term).replace("'", "''") + "'"
+
+
+def _rewrite_like_predicates(sql_query, columns, rewrite, params=None, condition_only=False):
+    """
+    Call rewrite(table, qualifier, column, like_pattern, predicate, bind) for every LIKE
+    predicate on one of `columns` ((table, column) pairs) outside string literals,
+    replacing the predicate with the result unless it is None. A pattern given as a bind
+    parameter is read from `params`; bind(value, suffix) returns the SQL for a value the
+    replacement needs: a literal, or for parameterized predicates a new parameter added
+    to `params`, so the rewritten statement stays a template. With `condition_only`, for
+    replacements that are false where the predicate is NULL, only plain condition terms of
+    statements without NOT are rewritten. Returns the new SQL and the rewrite count.
+    """
+    references = table_references(sql_query)
+    rewrites = 0
+    if condition_only and any(m.group("negation") for m in _NEGATION_PATTERN.finditer(sql_query)):
+        return sql_query, rewrites
+
+    def replace(match):
+        nonlocal rewrites
+        if match.group("literal"):
+            return match.group(0)
+        if condition_only and not (_CONDITION_BEFORE.search(sql_query, 0, match.start())
+                                   and _CONDITION_AFTER.match(sql_query, match.end())):
+            return match.group(0)
+
+        param = match.group("param")
+        if param:
+            like_pattern = (params or {}).get(param)
+            if not isinstance(like_pattern, str):
+                return match.group(0)
+
+            def bind(value, suffix):
+                name = f"{param}_{suffix}"
+                params[name] = value
+                return f":{name}"
+        else:
+            like_pattern = match.group("pattern").replace("''", "'")
+
+            def bind(value, suffix):
+                return "'" + value.replace("'", "''") + "'"
+
+        qualifier = match.group("qualifier")
+        column = match.group("column").lower()
+        if qualifier:
+            table = references.get(qualifier.lower())
+        else:
+            # Unqualified columns are only rewritten when a single referenced table has them
+            candidates = {t for t in set(references.values()) if (t, column) in columns}
+            table = candidates.pop() if len(candidates) == 1 else None
+            qualifier = next((a for a, t in references.items() if t == table and a != table), table)
+        if (table, column) not in columns:
+            return match.group(0)
+
+        replacement = rewrite(table, qualifier, column, like_pattern, match.group(0), bind)
+        if replacement is None:
+            return match.group(0)
+        rewrites += 1
+        return replacement
+
+    return _LIKE_PATTERN.sub(replace, sql_query), rewrites
+
+
+def rewrite_fts_lookups(sql_query, table_names, params=None):
+    """
+    Narrow `LIKE` predicates on indexed name/title columns through the FTS5 trigram
+    tables. The original predicate is kept and ANDed with a rowid lookup, so results are
+    unchanged while the database walks the trigram index instead of scanning the table:
+
+        p.name LIKE '%Tom Hanks'
+        -> (p.rowid IN (SELECT rowid FROM people_fts WHERE people_fts MATCH 'name : "Tom Hanks"')
+            AND p.name LIKE '%Tom Hanks')
+
+    The lookup is false where the column is NULL (and the LIKE is NULL), so, as for genre
+    filters, only filter terms that are not negated are rewritten.
+    """
+    columns = {key: fts_table for key, fts_table in FTS_COLUMNS.items() if fts_table in table_names}
+    if not columns:
+        return sql_query
+
+    def rewrite(table, qualifier, column, like_pattern, predicate, bind):
+        term = longest_literal_run(like_pattern)
+        if len(term) < MIN_FTS_TERM_LENGTH:
+            return None
+        fts_table = columns[(table, column)]
+        lookup = (f"{qualifier}.rowid IN (SELECT rowid FROM {fts_table} "
+                  f"WHERE {fts_table} MATCH {bind(fts_phrase_query(column, term), 'fts')})")
+        return f"({lookup} AND {predicate})"
+
+    rewritten, rewrites = _rewrite_like_predicates(sql_query, columns, rewrite, params, condition_only=True)
+    if rewrites:
+        logger.info(f"Rewrote {rewrites} LIKE predicate(s) to FTS lookups")
+    return rewritten
+
+
+def rewrite_genre_filters(sql_query, table_names, params=None):
+    """
+    Answer `genres LIKE '%Genre%'` substring tests on titles from the title_genres bridge
+    table built with `python -m app.build genres`. The pattern is matched against the
+    (few dozen) genre names instead of every title, so '%Music%' still covers Musical:
+
+        t.genres LIKE '%Sci-Fi%'
+        -> t.title_id IN (SELECT title_id FROM title_genres WHERE genre_id IN
+                          (SELECT genre_id FROM genres WHERE genre LIKE '%Sci-Fi%'))
+
+    The lookup is false for titles without genres where the LIKE is NULL, so only filter
+    terms are rewritten, where both drop the row (not negated ones or computed values).
+    """
+    if not GENRE_TABLES <= table_names:
+        return sql_query
+
+    def rewrite(table, qualifier, column, like_pattern, predicate, bind):
+        # Only '%term%' is exact: other shapes depend on the genre's position in the list
+        term = like_pattern[1:-1]
+        if len(like_pattern) < 3 or not like_pattern.startswith("%") or not like_pattern.endswith("%") \
+                or any(ch in term for ch in "%_,"):
+            return None
+        genre_pattern = bind(f"%{term}%", "genre")
+        return (f"{qualifier}.title_id IN (SELECT title_id FROM title_genres WHERE genre_id IN "
+                f"(SELECT genre_id FROM genres WHERE genre LIKE {genre_pattern}))")
+
+    rewritten, rewrites = _rewrite_like_predicates(sql_query, {("titles", "genres")}, rewrite, params,
+                                                   condition_only=True)
+    if rewrites:
+        logger.info(f"Rewrote {rewrites} genre LIKE filter(s) to title_genres lookups")
+    return rewritten
+
+
+def rewrite_aggregate_queries(sql_query, table_names):
+    """
+    Answer whole queries whose shape matches a materialized summary table from that table
+    instead of aggregating over the crew table. Currently recognizes per-person credits
+    by year (the career chart query), which person_year_counts answers with identical rows.
+    """
+    if "person_year_counts" not in table_names:
+        return sql_query
+    match = _PERSON_YEAR_COUNTS_PATTERN.fullmatch(sql_query.strip())
+    if not match:
+        return sql_query
+
+    logger.info("Answering person/year credit counts from person_year_counts")
+    return (
+        f"SELECT pyc.year AS {match['year']}, SUM(pyc.title_count) AS {match['count']} "
+        f"FROM people {match['p']} JOIN person_year_counts pyc ON {match['p']}.person_id = pyc.person_id "
+        f"WHERE {match['p']}.name = {match['name']} "
+        f"AND pyc.category {match['category']} AND pyc.type {match['type']} "
+        f"GROUP BY pyc.year ORDER BY pyc.year"
+    )
+
+
+def rewrite_statement(sql_query, params, table_names):
+    """
+    Apply every optimization rewrite whose supporting tables exist in the database to a
+    statement with :name bind parameters. Returns the new SQL and parameter map (the
+    rewrites may bind values of their own, such as FTS queries derived from a pattern).
+    """
+    params = dict(params or {})
+    sql_query = rewrite_aggregate_queries(sql_query, table_names)
+    sql_query = rewrite_fts_lookups(sql_query, table_names, params)
+    sql_query = rewrite_genre_filters(sql_query, table_names, params)
+    return sql_query, params
+
+
+def rewrite_sql(sql_query, table_names):
+    """Apply every optimization rewrite whose supporting tables exist in the database"""
+    return rewrite_statement(sql_query, None, table_names)[0]
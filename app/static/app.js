@@ -668,56 +668,61 @@ function sendChatMessage() {
     // console.log('Sending AJAX request to /api/chat');
     // console.log('Request payload:', { query: message });
     
-    $.ajax({
-        url: '/api/chat',
-        method: 'POST',
-        contentType: 'application/json',
-        data: JSON.stringify({
-            query: message
-        }),
-        beforeSend: function(xhr) {
-            // console.log('AJAX request starting...');
-            // console.log('Request headers:', xhr.getAllResponseHeaders());
-        },
-        success: function(response) {
-            // console.log('✅ AJAX request successful');
-            // console.log('Response:', response);
-            hideTypingIndicator();
-            
-            if (response.success) {
-                // console.log('Response indicates success');
-                // Format and add AI response to chat
-                const formattedResponse = formatAIResponse(response.ai_response);
-                addMessageToChat('ai', formattedResponse);
-                
-                // Handle search results if present
-                if (response.search_results && response.search_results.success && response.search_results.results.length > 0) {
-                    // console.log('Displaying search results:', response.search_results.results.length, 'items');
-                    displaySearchResults(response.search_results);
-                }
-                
-                // Handle chart data if present
-                if (response.chart_data && response.chart_data.success) {
-                    // console.log('Displaying chart data');
-                    displayChart(response.chart_data);
-                }
-            } else {
-                console.error('❌ Chat API Response indicates failure:', response.error); // Keep error log
-                addMessageToChat('ai', 'Sorry, I encountered an error processing your request: ' + (response.error || 'Unknown error'));
-            }
-        },
-        error: function(xhr, status, error) {
-            console.error('❌ Chat AJAX request failed. Status:', status, 'Error:', error, 'Response:', xhr.responseText); // Keep error log
-            
+    // Stream the turn over Server-Sent Events: progress while tools run, then answer tokens
+    let searchResults = null;
+    let chartData = null;
+    let $answer = null;
+    let answerText = '';
+    
+    // Create the AI message on the first token, with results and chart beneath the text
+    function startAnswer() {
+        if ($answer) {
+            return;
+        }
+        hideTypingIndicator();
+        addMessageToChat('ai', '');
+        $answer = $('.message.ai-message').last().find('.message-content > div').first();
+        if (searchResults && searchResults.success && searchResults.results.length > 0) {
+            displaySearchResults(searchResults);
+        }
+        if (chartData && chartData.success) {
+            displayChart(chartData);
+        }
+    }
+    
+    postEventStream('/api/chat/stream', { query: message }, function(event, data) {
+        if (event === 'tool_call') {
+            updateTypingStatus(data.function === 'generate_chart' ? 'Building your chart...' : 'Searching the IMDb database...');
+        } else if (event === 'sql') {
+            updateTypingStatus('Running the generated SQL...');
+        } else if (event === 'rows') {
+            searchResults = data;
+            updateTypingStatus(data.success ? `Found ${data.row_count} results, writing it up...` : 'Writing it up...');
+        } else if (event === 'chart') {
+            chartData = data;
+        } else if (event === 'token') {
+            startAnswer();
+            answerText += data.content;
+            $answer.text(answerText);
+            scrollChatToBottom();
+        } else if (event === 'done') {
+            startAnswer();
+            // Swap the plain streamed text for the formatted final answer
+            $answer.html(formatAIResponse(data.ai_response));
+            scrollChatToBottom();
+        } else if (event === 'error') {
+            console.error('❌ Chat API Response indicates failure:', data.error || data.message); // Keep error log
             hideTypingIndicator();
-            addMessageToChat('ai', 'Sorry, I\'m having trouble connecting right now. Please try again.');
-        },
-        complete: function() {
-            // console.log('AJAX request completed, re-enabling send button');
-            // Re-enable send button
-            $('#sendChatBtn').prop('disabled', false);
-            chatInput.focus();
+            addMessageToChat('ai', 'Sorry, I encountered an error processing your request: ' + escapeHtml(data.error || data.message || 'Unknown error'));
         }
+    }).catch(function(error) {
+        console.error('❌ Chat request failed:', error); // Keep error log
+        hideTypingIndicator();
+        addMessageToChat('ai', 'Sorry, I\'m having trouble connecting right now. Please try again.');
+    }).finally(function() {
+        // Re-enable send button
+        $('#sendChatBtn').prop('disabled', false);
+        chatInput.focus();
     });
     
     // console.log('=== sendChatMessage() setup completed ===');
@@ -785,6 +790,17 @@ function showTypingIndicator() {
     scrollChatToBottom();
 }
 
+function updateTypingStatus(text) {
+    const indicator = $('#typingIndicator .message-content');
+    let status = indicator.find('.typing-status');
+    if (!status.length) {
+        status = $('<small class="typing-status text-muted d-block mt-1"></small>');
+        indicator.append(status);
+    }
+    status.text(text);
+    scrollChatToBottom();
+}
+
 function hideTypingIndicator() {
     $('#typingIndicator').remove();
 }
@@ -795,131 +811,183 @@ function scrollChatToBottom() {
 }
 
 function displaySearchResults(searchResults) {
-    const results = searchResults.results;
+    const results = searchResults.results || [];
     const rowCount = searchResults.row_count;
+    const columns = (searchResults.column_names && searchResults.column_names.length)
+        ? searchResults.column_names
+        : Object.keys(results[0] || {});
     
-    if (!results || results.length === 0) {
+    if (!rowCount || results.length === 0 || columns.length === 0) {
         return;
     }
 
     // Determine the type of results for smarter presentation
-    const firstResult = results[0];
-    const hasMovieData = 'title' in firstResult || 'primary_title' in firstResult;
-    const hasPersonData = 'person_name' in firstResult || 'name' in firstResult;
-    const hasRatings = 'average_rating' in firstResult || 'rating' in firstResult;
-    const hasYears = 'premiered' in firstResult || 'year' in firstResult || 'start_year' in firstResult;
+    const hasMovieData = columns.includes('title') || columns.includes('primary_title');
+    const useCards = hasMovieData && rowCount <= 6;
+    // Limit to the first few rows for chat display
+    const shown = results.slice(0, useCards ? 6 : 10);
     
     // Create contextual results display
-    let resultsHtml = `
+    const $container = $(`
         <div class="search-results-container mt-3">
             <div class="results-header mb-3">
                 <h6 class="mb-2">
                     <i class="fas fa-list-ul me-2 text-primary"></i>
-                    <span class="results-count badge bg-primary me-2">${rowCount}</span>
+                    <span class="results-count badge bg-primary me-2">${rowCount}${searchResults.has_more ? '+' : ''}</span>
                     ${rowCount === 1 ? 'Result' : 'Results'} Found
                 </h6>
             </div>
-    `;
-
-    // For movie/show results, show as cards for better visual appeal
-    if (hasMovieData && results.length <= 6) {
-        resultsHtml += '<div class="row g-3">';
-        
-        results.slice(0, 6).forEach((result, index) => {
-            const title = result.title || result.primary_title || result.original_title || 'Unknown Title';
-            const year = result.premiered || result.start_year || result.year || '';
-            const rating = result.average_rating || result.rating || result.imdb_rating || '';
-            const genres = result.genres || '';
-            const type = result.title_type || 'Movie';
-            
-            resultsHtml += `
-                <div class="col-md-6 col-lg-4">
-                    <div class="card h-100 shadow-sm hover-card">
-                        <div class="card-body p-3">
-                            <h6 class="card-title text-primary mb-2" title="${escapeHtml(title)}">
-                                ${escapeHtml(title.length > 40 ? title.substring(0, 40) + '...' : title)}
-                            </h6>
-                            <div class="movie-details">
-                                ${year ? `<small class="text-muted d-block"><i class="fas fa-calendar me-1"></i>${escapeHtml(year)}</small>` : ''}
-                                ${rating ? `<small class="text-warning d-block"><i class="fas fa-star me-1"></i>${escapeHtml(rating)}</small>` : ''}
-                                ${genres ? `<small class="text-info d-block"><i class="fas fa-tags me-1"></i>${escapeHtml(genres.length > 30 ? genres.substring(0, 30) + '...' : genres)}</small>` : ''}
-                                ${type ? `<span class="badge bg-secondary mt-1">${escapeHtml(type)}</span>` : ''}
-                            </div>
-                        </div>
-                    </div>
-                </div>
-            `;
-        });
-        
-        resultsHtml += '</div>';
-        
-        if (results.length > 6) {
-            resultsHtml += `
-                <div class="text-center mt-3">
-                    <small class="text-muted">
-                        <i class="fas fa-info-circle me-1"></i>
-                        Showing first 6 of ${rowCount} results
-                    </small>
-                </div>
-            `;
-        }
-    } 
-    // For large datasets or person data, use compact table
-    else {
-        resultsHtml += `
-            <div class="table-responsive">
-                <table class="table table-sm table-hover">
-                    <thead class="table-dark">
-                        <tr>
-        `;
-        
-        // Add headers
-        const columns = Object.keys(results[0]);
+        </div>
+    `);
+    
+    if (useCards) {
+        // For movie/show results, show as cards for better visual appeal
+        const $rows = $('<div class="row g-3"></div>');
+        shown.forEach(row => $rows.append(renderResultCard(row)));
+        $container.append($rows);
+    } else {
+        // For large datasets or person data, use compact table
+        let headerHtml = '';
         columns.forEach(col => {
             const displayCol = col.replace(/_/g, ' ').replace(/\b\w/g, l => l.toUpperCase());
-            resultsHtml += `<th class="fw-semibold">${escapeHtml(displayCol)}</th>`;
-        });
-        resultsHtml += '</tr></thead><tbody>';
-        
-        // Add rows (limit to first 10 for chat display)
-        const displayResults = results.slice(0, 10);
-        displayResults.forEach((row, index) => {
-            resultsHtml += `<tr class="table-row-hover">`;
-            columns.forEach(col => {
-                let value = row[col];
-                if (value === null || value === undefined || value === '') {
-                    value = '—';
-                } else if (col.includes('rating') && !isNaN(value)) {
-                    value = `⭐ ${value}`;
-                } else if (col.includes('year') && !isNaN(value)) {
-                    value = `📅 ${value}`;
-                }
-                resultsHtml += `<td>${escapeHtml(String(value))}</td>`;
-            });
-            resultsHtml += '</tr>';
+            headerHtml += `<th class="fw-semibold">${escapeHtml(displayCol)}</th>`;
         });
-        
-        resultsHtml += '</tbody></table>';
-        
-        if (results.length > 10) {
-            resultsHtml += `
-                <div class="text-center mt-2">
-                    <small class="text-muted">
-                        <i class="fas fa-ellipsis-h me-1"></i>
-                        Showing first 10 of ${rowCount} results
-                    </small>
-                </div>
-            `;
-        }
-        
-        resultsHtml += '</div>';
+        const $table = $(`
+            <div class="table-responsive">
+                <table class="table table-sm table-hover">
+                    <thead class="table-dark"><tr>${headerHtml}</tr></thead>
+                    <tbody></tbody>
+                </table>
+            </div>
+        `);
+        const $rows = $table.find('tbody');
+        shown.forEach(row => $rows.append(renderResultRow(row, columns)));
+        $container.append($table);
     }
     
-    resultsHtml += '</div>';
+    if (rowCount > shown.length) {
+        $container.append(`
+            <div class="text-center mt-2">
+                <small class="text-muted">
+                    <i class="fas fa-ellipsis-h me-1"></i>
+                    Showing first ${shown.length} of ${rowCount} results
+                </small>
+            </div>
+        `);
+    }
     
     // Add to the last AI message
-    const lastAiMessage = $('.message.ai-message').last().find('.message-content');
-    lastAiMessage.append(resultsHtml);
+    $('.message.ai-message').last().find('.message-content').append($container);
+    scrollChatToBottom();
+}
+
+function renderResultCard(result) {
+    const title = result.title || result.primary_title || result.original_title || 'Unknown Title';
+    const year = result.premiered || result.start_year || result.year || '';
+    const rating = result.average_rating || result.rating || result.imdb_rating || '';
+    const genres = result.genres || '';
+    const type = result.title_type || 'Movie';
+    
+    return `
+        <div class="col-md-6 col-lg-4">
+            <div class="card h-100 shadow-sm hover-card">
+                <div class="card-body p-3">
+                    <h6 class="card-title text-primary mb-2" title="${escapeHtml(title)}">
+                        ${escapeHtml(title.length > 40 ? title.substring(0, 40) + '...' : title)}
+                    </h6>
+                    <div class="movie-details">
+                        ${year ? `<small class="text-muted d-block"><i class="fas fa-calendar me-1"></i>${escapeHtml(year)}</small>` : ''}
+                        ${rating ? `<small class="text-warning d-block"><i class="fas fa-star me-1"></i>${escapeHtml(rating)}</small>` : ''}
+                        ${genres ? `<small class="text-info d-block"><i class="fas fa-tags me-1"></i>${escapeHtml(genres.length > 30 ? genres.substring(0, 30) + '...' : genres)}</small>` : ''}
+                        ${type ? `<span class="badge bg-secondary mt-1">${escapeHtml(type)}</span>` : ''}
+                    </div>
+                </div>
+            </div>
+        </div>
+    `;
+}
+
+function renderResultRow(row, columns) {
+    let rowHtml = `<tr class="table-row-hover">`;
+    columns.forEach(col => {
+        let value = row[col];
+        if (value === null || value === undefined || value === '') {
+            value = '—';
+        } else if (col.includes('rating') && !isNaN(value)) {
+            value = `⭐ ${value}`;
+        } else if (col.includes('year') && !isNaN(value)) {
+            value = `📅 ${value}`;
+        }
+        rowHtml += `<td>${escapeHtml(String(value))}</td>`;
+    });
+    return rowHtml + '</tr>';
+}
+
+// POST a JSON payload and return the streamed response, or call onError with the
+// JSON error body if the server answered with a regular (non-streamed) response
+async function postStreaming(url, payload, accept, onError) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': accept
+        },
+        body: JSON.stringify(payload)
+    });
+    
+    if (!(response.headers.get('Content-Type') || '').includes(accept)) {
+        const body = await response.json();
+        onError({ status: response.status, ...body });
+        return null;
+    }
+    return response;
+}
+
+// Read a streamed response body and call onRecord for every separator-delimited record
+async function readStreamRecords(response, separator, onRecord) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        let end;
+        while ((end = buffer.indexOf(separator)) >= 0) {
+            const record = buffer.slice(0, end);
+            buffer = buffer.slice(end + separator.length);
+            if (record.trim()) {
+                onRecord(record);
+            }
+        }
+    }
+    if (buffer.trim()) {
+        onRecord(buffer);
+    }
+}
+
+// POST a JSON payload and call onEvent(event, data) for every Server-Sent Event as it arrives
+async function postEventStream(url, payload, onEvent) {
+    const response = await postStreaming(url, payload, 'text/event-stream', function(body) {
+        onEvent('error', body);
+    });
+    if (!response) {
+        return;
+    }
+    await readStreamRecords(response, '\n\n', function(record) {
+        let event = 'message';
+        let data = '';
+        record.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                data += line.slice(5).trim();
+            }
+        });
+        onEvent(event, data ? JSON.parse(data) : null);
+    });
 }
 
 function displayChart(chartData) {
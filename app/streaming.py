@@ -0,0 +1,85 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+SSE_MIMETYPE = 'text/event-stream'
+
+
+def get_stream_mode(request):
+    """
+    Return 'ndjson' or 'json' if the client opted into a streamed response, else None.
+    Clients opt in with an `Accept: application/x-ndjson` header, a `stream` query
+    argument or a `stream` field in the JSON body ('ndjson'/'true'/'1' or 'json').
+    """
+    flag = request.args.get('stream')
+    if flag is None:
+        data = request.get_json(silent=True) or {}
+        flag = data.get('stream')
+    flag = str(flag).lower() if flag is not None else ''
+
+    if flag == 'json':
+        return 'json'
+    if flag in ('ndjson', 'true', '1') or NDJSON_MIMETYPE in request.headers.get('Accept', ''):
+        return 'ndjson'
+    return None
+
+
+def _dumps(obj):
+    return json.dumps(obj, default=str, separators=(',', ':'))
+
+
+def ndjson_line(message):
+    """Serialize one NDJSON message"""
+    return _dumps(message) + '\n'
+
+
+def ndjson_query_rows(stream, next_page_token):
+    """
+    Yield a query result as NDJSON straight from the cursor: a `columns` message, one
+    `row` message per row and a closing `end` message with the row count and next page
+    token. `next_page_token(stream)` is called once the rows are exhausted.
+    """
+    column_names = stream.column_names
+    yield ndjson_line({"type": "columns", "column_names": column_names})
+    row_count = 0
+    try:
+        for row in stream:
+            row_count += 1
+            yield ndjson_line({"type": "row", "row": dict(zip(column_names, row))})
+    except Exception as e:
+        logger.error(f"Streaming query failed after {row_count} rows: {str(e)}")
+        yield ndjson_line({"type": "error", "message": str(e), "row_count": row_count})
+        return
+    yield ndjson_line({"type": "end", "row_count": row_count, "next_page_token": next_page_token(stream)})
+
+
+def json_query_rows(stream, next_page_token):
+    """
+    Yield a query result as one incrementally written JSON document with the same shape
+    as the buffered /api/execute response. Errors after the first row are reported in a
+    trailing `error` field since the status code has already been sent.
+    """
+    column_names = stream.column_names
+    yield '{"status":"success","column_names":' + _dumps(column_names) + ',"results":['
+    row_count = 0
+    error = None
+    try:
+        for row in stream:
+            yield (',' if row_count else '') + _dumps(dict(zip(column_names, row)))
+            row_count += 1
+    except Exception as e:
+        logger.error(f"Streaming query failed after {row_count} rows: {str(e)}")
+        error = str(e)
+    tail = {"row_count": row_count}
+    if error:
+        tail["error"] = error
+    else:
+        tail["next_page_token"] = next_page_token(stream)
+    yield '],' + _dumps(tail)[1:]
+
+
+def sse_event(event, data):
+    """Serialize one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {_dumps(data)}\n\n"
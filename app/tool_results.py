@@ -0,0 +1,143 @@
+import logging
+from collections import Counter
+
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_ROWS = 10
+DEFAULT_MAX_VALUE_CHARS = 200
+
+# Columns holding a release year; the first one present gets a histogram
+YEAR_COLUMNS = ("premiered", "year", "start_year", "first_year")
+# Columns that already count titles per row (pre-aggregated chart data)
+COUNT_COLUMNS = ("count", "title_count")
+# Comma-joined multi-value columns, counted per value
+MULTI_VALUE_COLUMNS = {"genres"}
+
+TOP_VALUES = 5
+
+
+def truncate_value(value, max_chars):
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + "..."
+    return value
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def column_stats(column, values):
+    """Range and mean of a numeric column, or the distinct and most common values of a text column"""
+    present = [value for value in values if value is not None and value != ""]
+    if not present:
+        return {"non_null": 0}
+    if all(is_number(value) for value in present):
+        return {
+            "non_null": len(present),
+            "min": min(present),
+            "max": max(present),
+            "mean": round(sum(present) / len(present), 2),
+        }
+    if column in MULTI_VALUE_COLUMNS:
+        counts = Counter(part.strip() for value in present for part in str(value).split(",") if part.strip())
+    else:
+        counts = Counter(str(value) for value in present)
+    stats = {"non_null": len(present), "distinct": len(counts)}
+    # Names and titles are mostly unique, so their most common values say nothing
+    if len(counts) <= len(present) // 2 or column in MULTI_VALUE_COLUMNS:
+        stats["top_values"] = dict(counts.most_common(TOP_VALUES))
+    return stats
+
+
+def year_histogram(rows, column_names):
+    """Rows (or their counts, for pre-aggregated data) per year, or per decade when the years span more than two decades"""
+    year_column = next((column for column in YEAR_COLUMNS if column in column_names), None)
+    if year_column is None:
+        return None
+    count_column = next((column for column in COUNT_COLUMNS if column in column_names), None)
+    per_year = Counter()
+    for row in rows:
+        try:
+            year = int(row.get(year_column))
+        except (TypeError, ValueError):
+            continue
+        weight = row.get(count_column) if count_column else 1
+        per_year[year] += weight if is_number(weight) else 1
+    if not per_year:
+        return None
+    if max(per_year) - min(per_year) <= 20:
+        return {"by": "year", "counts": {str(year): per_year[year] for year in sorted(per_year)}}
+    per_decade = Counter()
+    for year, count in per_year.items():
+        per_decade[f"{year // 10 * 10}s"] += count
+    return {"by": "decade", "counts": dict(sorted(per_decade.items()))}
+
+
+def summarize_search_result(result, top_rows, max_value_chars):
+    """Digest of a search_imdb_database result: counts, the first rows, column statistics and a year histogram"""
+    if not result.get("success"):
+        return result
+    rows = result.get("results") or []
+    column_names = result.get("column_names") or (list(rows[0]) if rows else [])
+    digest = {
+        "success": True,
+        "row_count": result.get("row_count", len(rows)),
+        "has_more": result.get("has_more", False),
+        "column_names": column_names,
+        "rows": [{column: truncate_value(value, max_value_chars) for column, value in row.items()}
+                 for row in rows[:top_rows]],
+    }
+    if len(rows) <= top_rows:
+        return digest
+    digest["note"] = (f"The user sees all {len(rows)} rows in a table; only the first {top_rows} "
+                      f"(in query order) are included here, with statistics over all of them.")
+    digest["column_stats"] = {
+        column: column_stats(column, [row.get(column) for row in rows])
+        for column in column_names if not column.endswith("_id")
+    }
+    histogram = year_histogram(rows, column_names)
+    if histogram:
+        digest["year_histogram"] = histogram
+    return digest
+
+
+def summarize_chart_result(result):
+    """Digest of a generate_chart result: the chart's shape, not its data points"""
+    if not result.get("success"):
+        return result
+    chart = result.get("chart_data") or {}
+    data = chart.get("data") or {}
+    labels = data.get("labels") or []
+    title = (((chart.get("options") or {}).get("plugins") or {}).get("title") or {}).get("text")
+    digest = {"success": True, "chart_type": chart.get("type"), "title": title, "points": len(labels)}
+    values = (data.get("datasets") or [{}])[0].get("data") or []
+    if labels and len(values) == len(labels) and all(is_number(value) for value in values):
+        peak = max(range(len(values)), key=values.__getitem__)
+        digest.update({"first_label": labels[0], "last_label": labels[-1],
+                       "peak_label": labels[peak], "peak_value": values[peak], "total": sum(values)})
+    return digest
+
+
+def summarize_tool_result(function_name, result):
+    """
+    The version of a tool result sent back to the model for its answer. The user gets the
+    full rows and chart directly, so the model only needs enough to talk about them; large
+    results otherwise make the answer call slow, costly and can overflow its context.
+    TOOL_RESULT_DIGEST_ENABLED = False sends results unchanged.
+    """
+    if not get_setting('TOOL_RESULT_DIGEST_ENABLED', True) or not isinstance(result, dict):
+        return result
+    try:
+        if function_name == "search_imdb_database":
+            return summarize_search_result(
+                result,
+                get_setting('TOOL_RESULT_TOP_ROWS', DEFAULT_TOP_ROWS),
+                get_setting('TOOL_RESULT_MAX_VALUE_CHARS', DEFAULT_MAX_VALUE_CHARS),
+            )
+        if function_name == "generate_chart":
+            return summarize_chart_result(result)
+    except Exception as e:
+        logger.warning(f"Could not summarize {function_name} result, sending it whole: {str(e)}")
+    return result
@@ -1,29 +1,40 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, Response
 import os
-import sqlite3
 import logging
 import json
 import time
 import re
-from openai import AzureOpenAI
 import sys
 from datetime import datetime
 import uuid
+import queue
+from contextlib import ExitStack
+from .db import (get_pool, QueryStream, InvalidQueryError, InvalidPageTokenError,
+                 QueryTimeoutError, encode_page_token, decode_page_token)
+from .settings import get_setting
+from .nl_cache import get_sql_cache
+from .result_cache import get_result_cache
+from .llm import get_llm_client, llm_stats, llm_usage_stats, record_usage, prompt_cache_options
+from .sql_rewrite import rewrite_statement
+from .prompts import build_sql_prompt, build_chat_prompt, build_chat_answer_prompt
+from .tool_results import summarize_tool_result
+from .charts import build_chart, chart_from_result, CHART_TYPES, ROW_CHART_TYPES
+from .sql_params import parse_generated_sql, check_params, render_sql
+from .index_advisor import record_query_plan
+from .cost_guard import guard_query
+from .intent_router import route_question, person_year_counts_query, fast_path_stats
+from .concurrency import submit_tool_call, db_slot, llm_slot, concurrency_stats
+from .logging_config import should_log_payload, logging_stats
+from .metrics import span, get_request_id, new_request_id, render_metrics, record_slow_query, slowest_queries
+from .streaming import (get_stream_mode, ndjson_query_rows, json_query_rows, sse_event,
+                        NDJSON_MIMETYPE, SSE_MIMETYPE)
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Configure comprehensive logging first
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+# Logging is configured once for the whole app in app/logging_config.py
 logger = logging.getLogger(__name__)
 
 try:
-    from config import AZURE_OPENAI_API_KEY, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_MODEL, DATABASE_PATH
+    from config import AZURE_OPENAI_MODEL
 except ImportError:
     logger.error("Configuration file not found. Please copy config.template.py to config.py and fill in your API keys.")
     raise ImportError(
@@ -36,65 +47,97 @@ except ImportError:
 # Initialize the Flask Blueprint
 main = Blueprint('main', __name__)
 
-DB_SCHEMA_PROMPT = """
-DATABASE SCHEMA:
-- people: person_id (VARCHAR), name (VARCHAR), born (INTEGER), died (INTEGER)
-- titles: title_id (VARCHAR), type (VARCHAR), primary_title (VARCHAR), original_title (VARCHAR), is_adult (INTEGER), premiered (INTEGER), ended (INTEGER), runtime_minutes (INTEGER), genres (VARCHAR)
-- akas: title_id (VARCHAR), title (VARCHAR), region (VARCHAR), language (VARCHAR), types (VARCHAR), attributes (VARCHAR), is_original_title (INTEGER)
-- crew: title_id (VARCHAR), person_id (VARCHAR), category (VARCHAR), job (VARCHAR), characters (VARCHAR)
-- episodes: episode_title_id (VARCHAR), show_title_id (VARCHAR), season_number (INTEGER), episode_number (INTEGER)
-- ratings: title_id (VARCHAR), rating (REAL), votes (INTEGER)
-"""
-
 def get_azure_client():
     """
-    Returns the Azure OpenAI client initialized with necessary credentials.
+    Returns the shared Azure OpenAI client. It is created once per process so every
+    call reuses the same keep-alive connection pool instead of a fresh TLS handshake.
     """
-    return AzureOpenAI(
-        api_key=AZURE_OPENAI_API_KEY,
-        api_version=AZURE_OPENAI_API_VERSION,
-        azure_endpoint=AZURE_OPENAI_ENDPOINT
-    )
+    return get_llm_client()
 
 def get_database_connection():
-    """Get a connection to the IMDb database"""
-    try:
-        # Database is in the db/ folder
-        db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db', 'imdb.db')
-        logger.info(f"Connecting to database at: {db_path}")
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row  # This allows dict-like access to rows
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {str(e)}")
-        raise
+    """Check out a pooled, read-only connection to the IMDb database (use as a context manager)"""
+    return get_pool().connection()
 
-def execute_sql_query(sql_query):
-    """Execute SQL query and return results with column names"""
+def get_result_limit(requested=None):
+    """Row budget for a result page: DEFAULT_RESULT_LIMIT unless requested, never above MAX_RESULT_LIMIT"""
+    max_limit = get_setting('MAX_RESULT_LIMIT', 1000)
+    if requested is None:
+        return min(get_setting('DEFAULT_RESULT_LIMIT', 50), max_limit)
+    return max(1, min(int(requested), max_limit))
+
+def stream_sql_query(sql_query, limit=None, page_token=None, params=None):
+    """
+    Validate and start executing SQL query with its :name bind parameters, returning a
+    QueryStream that yields one page of rows lazily. Raises InvalidQueryError if the query
+    does not parse, is not read-only, lacks a parameter value or is estimated to be too
+    expensive (QueryCostError), and InvalidPageTokenError if the page token was not
+    issued for this query.
+    """
+    params = check_params(sql_query, params)
+    offset, after = decode_page_token(sql_query, page_token, params) if page_token else (0, None)
+    page_limit = get_result_limit(limit)
+    logger.info(f"Executing SQL (offset {offset}): {sql_query[:200]}... {params if params else ''}")
     try:
-        conn = get_database_connection()
-        cursor = conn.cursor()
-        
-        logger.info(f"Executing SQL: {sql_query[:200]}...")
-        cursor.execute(sql_query)
-        
-        # Get column names
-        column_names = [description[0] for description in cursor.description] if cursor.description else []
-        
-        # Fetch results
-        results = cursor.fetchall()
-        
-        conn.close()
-        logger.info(f"Query executed successfully, returned {len(results)} rows")
-        
-        return results, column_names
-        
+        with span("sql_validation"):
+            # One extra row tells whether there is a next page
+            max_rows, plan = guard_query(sql_query, offset + page_limit + 1, params=params)
+            return QueryStream(sql_query, params, offset=offset, limit=page_limit, max_rows=max_rows,
+                               timeout=get_setting('QUERY_TIMEOUT', 30), plan=plan, after=after)
+    except InvalidQueryError as e:
+        logger.warning(f"SQL validation failed: {str(e)}")
+        raise
     except Exception as e:
         logger.error(f"SQL execution error: {str(e)}")
-        if 'conn' in locals():
-            conn.close()
         raise
 
+def get_next_page_token(stream):
+    """Page token for the rows after an exhausted QueryStream, or None if there are none"""
+    next_offset = stream.next_offset()
+    if next_offset is None:
+        return None
+    return encode_page_token(stream.sql_query, next_offset, stream.params, stream.next_after())
+
+def execute_sql_query(sql_query, limit=None, page_token=None, params=None):
+    """
+    Execute SQL query with its :name bind parameters and return one page of results,
+    the column names and the token for the next page (None when there are no more rows)
+    """
+    result_cache = get_result_cache()
+    if result_cache:
+        params = check_params(sql_query, params)
+        offset, _ = decode_page_token(sql_query, page_token, params) if page_token else (0, None)
+        cached = result_cache.get(sql_query, offset, get_result_limit(limit), params)
+        if cached is not None:
+            results, column_names, next_offset, next_after = cached
+            logger.info(f"Result cache hit, returned {len(results)} rows")
+            if next_offset is None:
+                return results, column_names, None
+            return results, column_names, encode_page_token(sql_query, next_offset, params, next_after)
+    
+    start_time = time.perf_counter()
+    with db_slot():
+        stream = stream_sql_query(sql_query, limit=limit, page_token=page_token, params=params)
+        try:
+            with span("db_execution"):
+                results = list(stream)
+        except Exception as e:
+            logger.error(f"SQL execution error: {str(e)}")
+            raise
+    elapsed = time.perf_counter() - start_time
+    
+    next_page_token = get_next_page_token(stream)
+    logger.info(f"Query executed successfully, returned {len(results)} rows{' (more available)' if next_page_token else ''}")
+    
+    # Feed the index advisor and slow-query log with the plan the cost guard already fetched
+    record_query_plan(sql_query, elapsed, params=stream.params, plan=stream.plan)
+    record_slow_query(sql_query, elapsed, params=stream.params, plan=stream.plan)
+    
+    if result_cache:
+        result_cache.put(sql_query, stream.offset, stream.limit, results, stream.column_names, stream.next_offset(),
+                         stream.params, next_after=stream.next_after())
+    
+    return results, stream.column_names, next_page_token
+
 def fix_single_quotes_in_sql(sql_query):
     """
     Post-process SQL to properly escape single quotes in string literals.
@@ -109,209 +152,76 @@ def fix_single_quotes_in_sql(sql_query):
             fixed_content = re.sub(r"(?<!')\'(?!\')", "''", like_content)
             return f"LIKE '{fixed_content}'"
         
-        # Apply the fix to LIKE patterns
-        sql_query = re.sub(r"LIKE\s+'([^']*(?:'[^']*)*)'", fix_like_pattern, sql_query, flags=re.IGNORECASE)
+        # Apply the fix to LIKE patterns; a pattern ends at the first quote followed by
+        # whitespace, a comma, a bracket or the end, so several LIKEs are fixed separately
+        sql_query = re.sub(r"LIKE\s+'(.*?)'(?=[\s,;)]|$)", fix_like_pattern, sql_query, flags=re.IGNORECASE | re.DOTALL)
         
-        logger.info(f"SQL quote fixing applied")
+        logger.debug(f"SQL quote fixing applied")
         return sql_query
     except Exception as e:
         logger.warning(f"Error in SQL quote fixing: {str(e)}, returning original query")
         return sql_query
 
-def validate_sql_query(sql_query):
-    """Basic validation of SQL query for security and syntax"""
-    try:
-        # Basic security checks
-        sql_lower = sql_query.lower().strip()
-        
-        # Check for dangerous SQL operations
-        dangerous_patterns = ['drop', 'delete', 'update', 'insert', 'alter', 'create', 'truncate']
-        for pattern in dangerous_patterns:
-            if pattern in sql_lower:
-                logger.warning(f"Potentially dangerous SQL operation detected: {pattern}")
-                return False
-        
-        # Must be a SELECT statement
-        if not sql_lower.startswith('select'):
-            logger.warning("SQL query must be a SELECT statement")
-            return False
-        
-        # Basic syntax validation - try to parse
-        try:
-            conn = get_database_connection()
-            cursor = conn.cursor()
-            cursor.execute(f"EXPLAIN QUERY PLAN {sql_query}")
-            conn.close()
-            return True
-        except Exception as e:
-            logger.warning(f"SQL syntax validation failed: {str(e)}")
-            return False
-            
-    except Exception as e:
-        logger.error(f"SQL validation error: {str(e)}")
-        return False
-
 def generate_response(user_query):
     """
-    Generate SQL query response using Azure OpenAI GPT-4.1 with enhanced prompt engineering
+    Generate SQL query response using Azure OpenAI GPT-4.1 with enhanced prompt engineering.
+    Returns (sql, params): the statement with :name placeholders and its bind parameters.
     """
     start_time = time.time()
     logger.info(f"Processing query: '{user_query}'")
     
+    # Previously validated SQL for the same (or a near-duplicate) question
+    sql_cache = get_sql_cache()
+    if sql_cache:
+        cached = sql_cache.lookup(user_query)
+        if cached:
+            logger.info(f"Using cached SQL in {time.time() - start_time:.3f}s: {cached[0][:100]}...")
+            return cached
+    
+    # Common question shapes are answered from tuned templates without an LLM round trip
+    route = route_question(user_query)
+    if route:
+        sql_query, params = rewrite_statement(route.sql_query, route.params, get_pool().table_names())
+        logger.info(f"Fast path {route.intent} (confidence {route.confidence:.2f}) in {time.time() - start_time:.3f}s: {sql_query[:100]}...")
+        return sql_query, params
+    
     client = get_azure_client()
     
-    # Enhanced system message with comprehensive examples and edge cases
-    system_message = f"""
-    You are an expert SQL query generator for IMDb database analysis. Your task is to convert natural language queries into precise SQLite queries.
-
-    {DB_SCHEMA_PROMPT}
-
-    CRITICAL: This is SQLite - do NOT use functions like PERCENTILE_CONT, PERCENTILE_DISC, or other advanced statistical functions that don't exist in SQLite.
-
-    AVOIDING DUPLICATES:
-    - ALWAYS use SELECT DISTINCT when joining tables, especially with crew/people tables
-    - When multiple crew members are involved, use proper subqueries or GROUP BY with aggregation
-    - Be extra careful with queries involving actors, directors, or multiple people relationships
-
-    IMPORTANT RULES:
-    1. ALWAYS use SELECT DISTINCT to prevent duplicate results from JOINs
-    2. ALWAYS include ratings and votes when available
-    3. Use proper JOINs for relationships
-    4. OPTIMIZE for existing indices: Put most selective filters first in WHERE clause
-    5. For name searches: Try exact match first (uses ix_people_name index), then LIKE as fallback
-    6. For crew queries: Filter by category early (uses ix_crew_category index)
-    7. For title queries: Filter by type early (uses ix_titles_type index)
-    8. Include ORDER BY for better results (ratings DESC, premiered DESC, votes DESC)
-    9. Handle plural/singular variations (movie/movies, actor/actors)
-    10. Consider alternative titles in akas table for international searches
-    11. Use ONLY SQLite-compatible functions and syntax
-    12. ESCAPE SINGLE QUOTES: Replace single quotes (') with double single quotes ('') in names (e.g., O'Brien becomes O''Brien)
-
-    INDEX-OPTIMIZED EXAMPLES:
-
-    Query: "Movies with Jim Carrey rated above 7"
-    SQL: SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes 
-         FROM people p 
-         JOIN crew c ON p.person_id = c.person_id 
-         JOIN titles t ON c.title_id = t.title_id 
-         JOIN ratings r ON t.title_id = r.title_id 
-         WHERE p.name = 'Jim Carrey'
-         AND c.category IN ('actor', 'actress')
-         AND t.type IN ('movie', 'tvMovie') 
-         AND r.rating > 7.0 
-         ORDER BY r.rating DESC, r.votes DESC;
-
-    Query: "Find actor by partial name (when exact name unknown)"
-    SQL: SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes 
-         FROM people p 
-         JOIN crew c ON p.person_id = c.person_id 
-         JOIN titles t ON c.title_id = t.title_id 
-         LEFT JOIN ratings r ON t.title_id = r.title_id 
-         WHERE (p.name = 'Tom Hanks' OR p.name LIKE 'Tom Hanks%' OR p.name LIKE '%Tom Hanks')
-         AND c.category IN ('actor', 'actress')
-         AND t.type IN ('movie', 'tvMovie') 
-         ORDER BY r.rating DESC, r.votes DESC;
-
-    Query: "Movies where Leonardo DiCaprio and Kate Winslet worked together"
-    SQL: SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes 
-         FROM people p1 
-         JOIN crew c1 ON p1.person_id = c1.person_id 
-         JOIN titles t ON c1.title_id = t.title_id 
-         JOIN crew c2 ON t.title_id = c2.title_id 
-         JOIN people p2 ON c2.person_id = p2.person_id 
-         JOIN ratings r ON t.title_id = r.title_id 
-         WHERE p1.name = 'Leonardo DiCaprio'
-         AND p2.name = 'Kate Winslet'
-         AND c1.category IN ('actor', 'actress')
-         AND c2.category IN ('actor', 'actress')
-         AND t.type IN ('movie', 'tvMovie') 
-         ORDER BY r.rating DESC, r.votes DESC;
-
-    Query: "Highest rated sci-fi movies from 2010s"
-    SQL: SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes 
-         FROM titles t 
-         JOIN ratings r ON t.title_id = r.title_id 
-         WHERE t.type IN ('movie', 'tvMovie') 
-         AND t.premiered BETWEEN 2010 AND 2019
-         AND t.genres LIKE '%Sci-Fi%' 
-         AND r.votes >= 1000 
-         ORDER BY r.rating DESC, r.votes DESC;
-
-    Query: "Movies with Conan O'Brien"
-    SQL: SELECT DISTINCT t.title_id, t.primary_title, t.premiered, t.genres, r.rating, r.votes 
-         FROM people p 
-         JOIN crew c ON p.person_id = c.person_id 
-         JOIN titles t ON c.title_id = t.title_id 
-         LEFT JOIN ratings r ON t.title_id = r.title_id 
-         WHERE p.name = 'Conan O''Brien'
-         AND t.type IN ('movie', 'tvMovie') 
-         ORDER BY r.rating DESC, r.votes DESC;
-
-    Query: "Directors who made both horror and comedy movies"
-    SQL: SELECT DISTINCT p.name, p.person_id,
-         COUNT(CASE WHEN t.genres LIKE '%Horror%' THEN 1 END) as horror_count,
-         COUNT(CASE WHEN t.genres LIKE '%Comedy%' THEN 1 END) as comedy_count,
-         AVG(r.rating) as avg_rating
-         FROM people p 
-         JOIN crew c ON p.person_id = c.person_id 
-         JOIN titles t ON c.title_id = t.title_id 
-         LEFT JOIN ratings r ON t.title_id = r.title_id 
-         WHERE c.category = 'director'
-         AND t.type IN ('movie', 'tvMovie') 
-         AND (t.genres LIKE '%Horror%' OR t.genres LIKE '%Comedy%') 
-         GROUP BY p.person_id, p.name 
-         HAVING horror_count > 0 AND comedy_count > 0 
-         ORDER BY avg_rating DESC;
-
-    PERFORMANCE OPTIMIZATION GUIDELINES:
-    - Start queries with the most selective table (usually people for name searches)
-    - Use exact name matches when possible (leverages ix_people_name index)
-    - Filter by crew.category early (leverages ix_crew_category index)
-    - Filter by titles.type early (leverages ix_titles_type index)
-    - Put year filters before genre filters (years are more selective)
-    - Use INNER JOIN instead of LEFT JOIN when you need the related data
-    - Avoid LIKE '%pattern%' when exact matches are possible
-
-    GENRE MAPPING: Use these exact genre names from IMDb:
-    Action, Adventure, Animation, Biography, Comedy, Crime, Documentary, Drama, Family, Fantasy, Film-Noir, History, Horror, Music, Musical, Mystery, Romance, Sci-Fi, Sport, Thriller, War, Western
-
-    PERSON CATEGORY MAPPING:
-    - actor, actress → use 'actor' or both
-    - director → 'director'
-    - writer → 'writer'
-    - producer → 'producer'
-    - composer → 'composer'
-
-    Return ONLY the SQL query without markdown formatting or explanations.
-    """
+    # Only the schema tables, index hints and examples relevant to this question
+    table_names = get_pool().table_names()
+    system_message = build_sql_prompt(user_query, table_names)
     
     try:
-        response = client.chat.completions.create(
-            model=AZURE_OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_query}
-            ],
-            temperature=0.3,  # Lower temperature for more consistent SQL
-            max_tokens=1200,
-            top_p=0.9
-        )
+        with span("llm_sql_generation"), llm_slot():
+            response = client.chat.completions.create(
+                model=AZURE_OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": system_message},
+                    {"role": "user", "content": user_query}
+                ],
+                temperature=0.3,  # Lower temperature for more consistent SQL
+                max_tokens=1200,
+                top_p=0.9,
+                response_format={"type": "json_object"},
+                **prompt_cache_options()
+            )
+        record_usage("sql_generation", response.usage)
         
-        sql_query = response.choices[0].message.content.strip()
+        sql_query, params, parameterized = parse_generated_sql(response.choices[0].message.content)
         
-        # Clean up the SQL query
-        sql_query = re.sub(r'^```sql\s*', '', sql_query, flags=re.IGNORECASE)
-        sql_query = re.sub(r'^```\s*', '', sql_query)
-        sql_query = re.sub(r'\s*```$', '', sql_query)
-        sql_query = sql_query.strip()
+        if not parameterized:
+            # Plain SQL with inline literals: escape any unescaped single quotes in LIKE patterns
+            sql_query = fix_single_quotes_in_sql(sql_query)
         
-        # Post-process to escape any unescaped single quotes in LIKE patterns
-        sql_query = fix_single_quotes_in_sql(sql_query)
+        # Route LIKE lookups through the search indexes that exist in this database
+        sql_query, params = rewrite_statement(sql_query, params, table_names)
         
         processing_time = time.time() - start_time
         logger.info(f"Generated SQL in {processing_time:.2f}s: {sql_query[:100]}...")
+        if sql_cache:
+            sql_cache.record_generation_time(processing_time)
         
-        return sql_query
+        return sql_query, params
         
     except Exception as e:
         logger.error(f"Error generating SQL: {str(e)}")
@@ -335,9 +245,6 @@ def get_suggested_queries():
 def get_title_info(title_id):
     """Get detailed information about a specific title"""
     try:
-        conn = get_database_connection()
-        cursor = conn.cursor()
-        
         query = """
         SELECT t.title_id, t.primary_title, t.original_title, t.premiered, t.ended, 
                t.runtime_minutes, t.genres, t.type, r.rating, r.votes
@@ -346,9 +253,8 @@ def get_title_info(title_id):
         WHERE t.title_id = ?
         """
         
-        cursor.execute(query, (title_id,))
-        result = cursor.fetchone()
-        conn.close()
+        with get_database_connection() as conn:
+            result = conn.execute(query, (title_id,)).fetchone()
         
         if result:
             return dict(result)
@@ -384,15 +290,17 @@ def generate_title_summary(title_name, title_info):
         Keep it concise but engaging (2-3 paragraphs maximum).
         """
         
-        response = client.chat.completions.create(
-            model=AZURE_OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a knowledgeable film and TV expert who provides engaging summaries."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=300
-        )
+        with llm_slot():
+            response = client.chat.completions.create(
+                model=AZURE_OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are a knowledgeable film and TV expert who provides engaging summaries."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=300
+            )
+        record_usage("title_summary", response.usage)
         
         return response.choices[0].message.content.strip()
         
@@ -425,6 +333,16 @@ def get_function_tools():
                             "type": "boolean",
                             "description": "Whether this is for generating a chart"
                         },
+                        "chart_type": {
+                            "type": "string",
+                            "enum": [chart_type for chart_type in CHART_TYPES if chart_type != "pie"],
+                            "description": "Chart to draw for a chart request (default bar). histogram shows the distribution of a value such as rating; stacked_bar and multi_line split the counts by category or genre"
+                        },
+                        "bucket": {
+                            "type": "string",
+                            "enum": ["year", "decade"],
+                            "description": "Count per year (default) or per decade for a chart request"
+                        },
                         "filters": {
                             "type": "object",
                             "properties": {
@@ -442,13 +360,13 @@ def get_function_tools():
             "type": "function", 
             "function": {
                 "name": "generate_chart",
-                "description": "Create a chart from data (bar chart, line chart, or pie chart)",
+                "description": "Create a chart from data (bar, line, pie, histogram, stacked bar or multi-series line chart)",
                 "parameters": {
                     "type": "object",
                     "properties": {
                         "chart_type": {
                             "type": "string",
-                            "enum": ["bar", "line", "pie"],
+                            "enum": list(CHART_TYPES),
                             "description": "Type of chart to create"
                         },
                         "data": {
@@ -461,7 +379,8 @@ def get_function_tools():
                                     "year": {"type": "number", "description": "Year value for time-based charts"},
                                     "count": {"type": "number", "description": "Count value"},
                                     "label": {"type": "string", "description": "Label for pie charts"},
-                                    "value": {"type": "number", "description": "Value for pie charts"}
+                                    "value": {"type": "number", "description": "Value for pie charts and histograms"},
+                                    "series": {"type": "string", "description": "Series name for stacked_bar and multi_line charts"}
                                 }
                             },
                             "description": "Array of data objects with x and y values"
@@ -477,6 +396,19 @@ def get_function_tools():
                         "y_label": {
                             "type": "string",
                             "description": "Y-axis label"
+                        },
+                        "bucket": {
+                            "type": "string",
+                            "enum": ["year", "decade"],
+                            "description": "Group year values per year (default) or per decade"
+                        },
+                        "series_key": {
+                            "type": "string",
+                            "description": "Data field holding the series name (default series)"
+                        },
+                        "bins": {
+                            "type": "integer",
+                            "description": "Number of histogram bins (default 10)"
                         }
                     },
                     "required": ["chart_type", "data", "title"]
@@ -485,69 +417,87 @@ def get_function_tools():
         }
     ]
 
-def search_imdb_database(query_type, search_terms, chart_request=False, filters=None):
-    """Function that can be called by AI to search the IMDb database"""
+def search_imdb_database(query_type, search_terms, chart_request=False, filters=None, chart_type=None,
+                         bucket=None, on_event=None):
+    """
+    Function that can be called by AI to search the IMDb database.
+    chart_type and bucket shape the chart drawn from a chart request's results.
+    on_event(event, payload), if given, is told about the generated SQL before it runs.
+    """
     try:
         logger.info(f"Function called: search_imdb_database({query_type}, {search_terms}, chart_request={chart_request})")
-        logger.info(f"Filters provided: {filters}")
+        logger.debug(f"Filters provided: {filters}")
         
         # Generate appropriate SQL based on the request
-        if chart_request or query_type == "chart_data":
+        if (chart_request or query_type == "chart_data") and chart_type not in ROW_CHART_TYPES:
             # Generate SQL for chart data - focus on person's career over time
             person_name = search_terms.strip()
             # Clean up various chart-related phrases
             person_name = re.sub(r'\b(chart|graph|plot|over time|by year|movies?|films?)\b', '', person_name, flags=re.IGNORECASE)
             person_name = person_name.strip()
-            logger.info(f"Extracted person name for chart: '{person_name}'")
+            logger.debug(f"Extracted person name for chart: '{person_name}'")
             
-            sql_query = f"""
-            SELECT t.premiered as year, COUNT(*) as count
-            FROM people p 
-            JOIN crew c ON p.person_id = c.person_id 
-            JOIN titles t ON c.title_id = t.title_id 
-            WHERE p.name = '{person_name.replace("'", "''")}'
-            AND c.category IN ('actor', 'actress')
-            AND t.type IN ('movie', 'tvMovie')
-            AND t.premiered IS NOT NULL
-            GROUP BY t.premiered
-            ORDER BY t.premiered
-            """
-            logger.info(f"Generated chart SQL query: {sql_query}")
+            sql_query, params = person_year_counts_query(person_name)
+            # Served from person_year_counts when the summary tables have been built
+            sql_query, params = rewrite_statement(sql_query, params, get_pool().table_names())
+            logger.debug(f"Generated chart SQL query: {sql_query} {params}")
         else:
             # Use existing SQL generation for regular queries
-            logger.info("Using regular SQL generation")
-            sql_query = generate_response(search_terms)
-        
-        # Validate the generated SQL query before execution
-        if not validate_sql_query(sql_query):
-            logger.error(f"Generated SQL query failed validation: {sql_query}")
+            logger.debug("Using regular SQL generation")
+            sql_query, params = generate_response(search_terms)
+        
+        if on_event:
+            on_event("sql", {"sql_query": sql_query, "params": params, "query_type": query_type})
+        
+        # Validate and execute the query in one pass
+        logger.debug("Executing SQL query...")
+        # Chart queries are aggregated per year, so they get the full row budget (rows past it
+        # are counted by the chart engine in SQL)
+        is_chart_query = chart_request or query_type == "chart_data"
+        limit = get_setting('MAX_RESULT_LIMIT', 1000) if is_chart_query else None
+        sql_cache = get_sql_cache()
+        try:
+            results, column_names, next_page_token = execute_sql_query(sql_query, limit=limit, params=params)
+        except (InvalidQueryError, QueryTimeoutError) as e:
+            logger.error(f"Generated SQL query failed validation: {sql_query} {params}")
+            if sql_cache and not is_chart_query:
+                sql_cache.discard(search_terms)
+            if isinstance(e, QueryTimeoutError):
+                error = f"Generated SQL query took too long: {str(e)}"
+            else:
+                error = f"Generated SQL query is invalid or disallowed: {str(e)}"
             return {
                 "success": False,
-                "error": "Generated SQL query is invalid or disallowed.",
+                "error": error,
                 "sql_query": sql_query,
+                "params": params,
                 "results": [],
                 "column_names": [],
                 "row_count": 0
             }
-
-        # Execute the query
-        logger.info("Executing SQL query...")
-        results, column_names = execute_sql_query(sql_query)
+        
+        # Only SQL that executed successfully is cached for the question
+        if sql_cache and not is_chart_query:
+            sql_cache.store(search_terms, sql_query, params)
         
         # Convert to dictionaries
-        results_dict = [dict(zip(column_names, row)) for row in results]
+        with span("row_conversion"):
+            results_dict = [dict(zip(column_names, row)) for row in results]
         logger.info(f"Query executed successfully. Results: {len(results_dict)} rows")
         
-        # Log first few results for debugging
-        if results_dict:
+        # Log a sample result now and then for debugging
+        if results_dict and should_log_payload(logger):
             logger.info(f"Sample result: {results_dict[0]}")
         
         return {
             "success": True,
             "results": results_dict,
             "sql_query": sql_query,
+            "params": params,
             "column_names": column_names,
-            "row_count": len(results_dict)
+            "row_count": len(results_dict),
+            "has_more": next_page_token is not None,
+            "next_page_token": next_page_token
         }
         
     except Exception as e:
@@ -561,12 +511,12 @@ def search_imdb_database(query_type, search_terms, chart_request=False, filters=
             "row_count": 0
         }
 
-def generate_chart_function(chart_type, data, title, x_label="", y_label=""):
+def generate_chart_function(chart_type, data, title, x_label="", y_label="", bucket="year", series_key=None, bins=None):
     """Function that can be called by AI to generate chart data"""
     try:
         logger.info(f"Function called: generate_chart({chart_type}, {title})")
-        logger.info(f"Data received: {len(data) if data else 0} items")
-        logger.info(f"Labels: x_label='{x_label}', y_label='{y_label}'")
+        logger.debug(f"Data received: {len(data) if data else 0} items")
+        logger.debug(f"Labels: x_label='{x_label}', y_label='{y_label}'")
         
         if not data:
             logger.warning("No data provided for chart generation")
@@ -575,90 +525,20 @@ def generate_chart_function(chart_type, data, title, x_label="", y_label=""):
                 "error": "No data provided for chart"
             }
         
-        # Log sample data for debugging
-        if data:
+        # Log sample data now and then for debugging
+        if data and should_log_payload(logger):
             logger.info(f"Sample data item: {data[0]}")
         
-        # Convert data to Chart.js format
-        if chart_type == "bar":
-            logger.info("Creating bar chart")
-            chart_data = {
-                "type": "bar",
-                "data": {
-                    "labels": [str(item.get('year', item.get('x', ''))) for item in data],
-                    "datasets": [{
-                        "label": y_label or "Count",
-                        "data": [item.get('count', item.get('y', 0)) for item in data],
-                        "backgroundColor": "rgba(54, 162, 235, 0.6)",
-                        "borderColor": "rgba(54, 162, 235, 1)",
-                        "borderWidth": 1
-                    }]
-                },
-                "options": {
-                    "responsive": True,
-                    "plugins": {
-                        "title": {
-                            "display": True,
-                            "text": title
-                        }
-                    },
-                    "scales": {
-                        "x": {
-                            "title": {
-                                "display": True,
-                                "text": x_label or "Year"
-                            }
-                        },
-                        "y": {
-                            "title": {
-                                "display": True,
-                                "text": y_label or "Count"
-                            }
-                        }
-                    }
-                }
-            }
-        elif chart_type == "pie":
-            logger.info("Creating pie chart")
-            chart_data = {
-                "type": "pie",
-                "data": {
-                    "labels": [str(item.get('label', item.get('x', ''))) for item in data],
-                    "datasets": [{
-                        "data": [item.get('value', item.get('y', 0)) for item in data],
-                        "backgroundColor": [
-                            "rgba(255, 99, 132, 0.6)",
-                            "rgba(54, 162, 235, 0.6)",
-                            "rgba(255, 205, 86, 0.6)",
-                            "rgba(75, 192, 192, 0.6)",
-                            "rgba(153, 102, 255, 0.6)"
-                        ]
-                    }]
-                },
-                "options": {
-                    "responsive": True,
-                    "plugins": {
-                        "title": {
-                            "display": True,
-                            "text": title
-                        }
-                    }
-                }
-            }
-        else:
-            logger.error(f"Unsupported chart type: {chart_type}")
-            return {
-                "success": False,
-                "error": f"Unsupported chart type: {chart_type}"
-            }
+        # Aggregated, binned and downsampled by the chart engine into a Chart.js config
+        with span("chart_aggregation"):
+            chart_result = build_chart(chart_type, data, title, x_label, y_label, bucket=bucket,
+                                       series_column=series_key, bins=bins)
+        if not chart_result.get("success"):
+            logger.error(f"Chart generation failed: {chart_result.get('error')}")
+            return chart_result
         
         logger.info("Chart data generated successfully")
-        
-        return {
-            "success": True,
-            "chart_data": chart_data,
-            "chart_id": str(uuid.uuid4())
-        }
+        return chart_result
         
     except Exception as e:
         logger.error(f"Error in generate_chart: {str(e)}", exc_info=True)
@@ -667,25 +547,140 @@ def generate_chart_function(chart_type, data, title, x_label="", y_label=""):
             "error": str(e)
         }
 
+def run_chart_query(sql_query, params):
+    """All rows (as dicts) of an aggregating statement the chart engine pushes down to SQLite"""
+    rows = []
+    page_token = None
+    while True:
+        results, column_names, page_token = execute_sql_query(sql_query, page_token=page_token, params=params)
+        rows.extend(dict(zip(column_names, row)) for row in results)
+        if page_token is None:
+            return rows
+
+def auto_generate_chart(function_args, function_result, request_id):
+    """
+    Build a chart from chart-request search results without another model round trip.
+    Returns (chart_result, function_call_entry); either may be None.
+    """
+    chart_data_results = function_result.get('results', [])
+    if not chart_data_results:
+        return None, None
+    
+    chart_type = function_args.get('chart_type') or "bar"
+    bucket = function_args.get('bucket') or "year"
+    search_terms = function_args.get('search_terms', 'Movies')
+    logger.info(f"[{request_id}] Auto-generating {chart_type} chart from {len(chart_data_results)} search results")
+    
+    first_result = chart_data_results[0]
+    pre_aggregated = 'year' in first_result and 'count' in first_result
+    if chart_type == "histogram":
+        chart_title = f"{search_terms}: Distribution"
+        y_label = "Number of Titles"
+    elif pre_aggregated:
+        # Pre-aggregated per year by the chart query
+        chart_title = f"{search_terms} Movies Over Time"
+        y_label = "Number of Movies"
+    else:
+        chart_title = f"{search_terms} by {'Decade' if bucket == 'decade' else 'Year'}"
+        y_label = "Number of Movies"
+    
+    with span("chart_aggregation"):
+        chart_result = chart_from_result(function_result, chart_type, chart_title, bucket=bucket,
+                                         run_query=run_chart_query, y_label=y_label)
+    if not chart_result.get('success'):
+        logger.warning(f"[{request_id}] No chart generated: {chart_result.get('error')}")
+        return None, None
+    
+    points = len(chart_result['chart_data']['data']['labels'])
+    logger.info(f"[{request_id}] Auto-chart generation completed with {points} data points")
+    if pre_aggregated:
+        return chart_result, None
+    
+    # Add this as a function call for tracking
+    return chart_result, {
+        "function": "generate_chart",
+        "arguments": {
+            "chart_type": chart_type,
+            "bucket": bucket,
+            "title": chart_title,
+            "y_label": y_label,
+            "points": points
+        },
+        "status": "completed",
+        "result": chart_result
+    }
+
+def execute_tool_call(function_name, function_args, request_id, on_event=None):
+    """
+    Execute one tool call requested by the model.
+    Returns (function_result, search_results, chart_data, extra_function_calls).
+    """
+    search_results = None
+    chart_data = None
+    extra_function_calls = []
+    
+    try:
+        if function_name == "search_imdb_database":
+            if should_log_payload(logger):
+                logger.info(f"[{request_id}] Executing search_imdb_database with: {function_args}")
+            function_result = search_imdb_database(**function_args, on_event=on_event)
+            search_results = function_result
+            logger.info(f"[{request_id}] Search completed. Success: {function_result.get('success')}, Results: {function_result.get('row_count', 0)}")
+            
+            # Auto-generate chart if this was a chart request and we have chart-ready data
+            if (function_args.get('chart_request') or function_args.get('query_type') == 'chart_data') and function_result.get('success'):
+                chart_data, chart_call = auto_generate_chart(function_args, function_result, request_id)
+                if chart_call:
+                    extra_function_calls.append(chart_call)
+            
+        elif function_name == "generate_chart":
+            if should_log_payload(logger):
+                logger.info(f"[{request_id}] Executing generate_chart with: {function_args}")
+            function_result = generate_chart_function(**function_args)
+            chart_data = function_result
+            logger.info(f"[{request_id}] Chart generation completed. Success: {function_result.get('success')}")
+        else:
+            logger.error(f"[{request_id}] Unknown function called: {function_name}")
+            function_result = {"error": f"Unknown function: {function_name}"}
+    except Exception as func_error:
+        logger.error(f"[{request_id}] Error executing function {function_name}: {str(func_error)}", exc_info=True)
+        function_result = {"error": str(func_error), "success": False}
+    
+    return function_result, search_results, chart_data, extra_function_calls
+
+def run_tool_calls(calls, request_id):
+    """
+    Execute independent tool calls ((function_name, function_args) pairs) concurrently on
+    the tool executor, so a turn takes as long as its slowest call rather than the sum.
+    Returns the execute_tool_call() results in call order.
+    """
+    if len(calls) == 1:
+        return [execute_tool_call(*calls[0], request_id)]
+    futures = [submit_tool_call(execute_tool_call, function_name, function_args, request_id)
+               for function_name, function_args in calls]
+    return [future.result() for future in futures]
+
 # New Chat API endpoint with function calling
 @main.route('/api/chat', methods=['POST'])
 def api_chat():
     """Main conversational endpoint with function calling support"""
-    request_id = str(uuid.uuid4())[:8]  # Short request ID for tracking
+    request_id = get_request_id() or new_request_id()  # Short request ID for tracking
     
     try:
         logger.info(f"[{request_id}] ===== CHAT API REQUEST STARTED =====")
-        logger.info(f"[{request_id}] Request method: {request.method}")
-        logger.info(f"[{request_id}] Request URL: {request.url}")
-        logger.info(f"[{request_id}] Request headers: {dict(request.headers)}")
-        logger.info(f"[{request_id}] Client IP: {request.remote_addr}")
+        logger.debug(f"[{request_id}] Request method: {request.method}")
+        logger.debug(f"[{request_id}] Request URL: {request.url}")
+        if should_log_payload(logger):
+            logger.info(f"[{request_id}] Request headers: {dict(request.headers)}")
+        logger.debug(f"[{request_id}] Client IP: {request.remote_addr}")
         
         data = request.get_json()
-        logger.info(f"[{request_id}] Request data: {data}")
+        if should_log_payload(logger):
+            logger.info(f"[{request_id}] Request data: {data}")
         
         user_query = data.get('query', '').strip() if data else ''
-        logger.info(f"[{request_id}] Extracted user query: '{user_query}'")
-        logger.info(f"[{request_id}] Query length: {len(user_query)}")
+        logger.debug(f"[{request_id}] Extracted user query: '{user_query}'")
+        logger.debug(f"[{request_id}] Query length: {len(user_query)}")
         
         if not user_query:
             logger.warning(f"[{request_id}] Empty query received")
@@ -699,97 +694,20 @@ def api_chat():
         
         # Initialize conversation
         conversation_id = str(uuid.uuid4())
-        logger.info(f"[{request_id}] Generated conversation ID: {conversation_id}")
+        logger.debug(f"[{request_id}] Generated conversation ID: {conversation_id}")
         
         # Create client and define tools
-        logger.info(f"[{request_id}] Creating Azure OpenAI client...")
+        logger.debug(f"[{request_id}] Creating Azure OpenAI client...")
         client = get_azure_client()
-        logger.info(f"[{request_id}] Azure OpenAI client created successfully")
+        logger.debug(f"[{request_id}] Azure OpenAI client created successfully")
         
         tools = get_function_tools()
-        logger.info(f"[{request_id}] Function tools defined: {len(tools)} tools")
-        for i, tool in enumerate(tools):
-            logger.info(f"[{request_id}] Tool {i+1}: {tool['function']['name']}")
+        logger.debug(f"[{request_id}] Function tools defined: {len(tools)} tools")
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, tool in enumerate(tools):
+                logger.debug(f"[{request_id}] Tool {i+1}: {tool['function']['name']}")
         
-        # System message for conversational AI with function calling
-        system_message = """You are a knowledgeable and enthusiastic IMDb movie expert assistant. You're passionate about cinema and love helping people discover great films and shows. You have access to a comprehensive IMDb database and can create visualizations.
-
-## PERSONALITY & TONE:
-- Be conversational, friendly, and genuinely excited about movies/TV
-- Ask follow-up questions to better understand what they're looking for
-- Share interesting insights and trivia when relevant
-- Use natural language, contractions, and casual expressions
-- Be curious and engaging, not just informational
-- React emotionally to findings ("That's fascinating!", "Wow, what a career!", "Interesting pattern!")
-
-## CONVERSATIONAL PATTERNS:
-Instead of just: "Here are the results"
-Try: "Oh, this is interesting! I found [number] movies/shows that match what you're looking for. Let me show you what I discovered..."
-
-Instead of: "The search returned 50 results"
-Try: "Great question! I found quite a few options for you - 50 movies that fit your criteria. Here are some highlights..."
-
-## RESPONSE STRUCTURE:
-1. **Acknowledge & React**: Show you understood and are excited to help
-2. **Provide Context**: Give a brief overview of what you found
-3. **Highlight Key Findings**: Point out the most interesting/relevant results
-4. **Offer Insights**: Share patterns, surprises, or notable observations
-5. **Suggest Next Steps**: Ask if they want to explore further or dive deeper
-
-## DATA STORYTELLING:
-- Don't just present tables - tell the story the data reveals
-- Highlight trends, patterns, and notable outliers
-- Compare and contrast findings
-- Explain why certain results might be significant
-- Connect findings to broader cinema knowledge
-
-## AVAILABLE FUNCTIONS:
-- search_imdb_database: Search for movies, people, analyze data
-- generate_chart: Create bar charts, line charts, or pie charts
-
-## CHART REQUESTS:
-When users want visualizations:
-1. Call search_imdb_database with chart_request=True
-2. Call generate_chart to create the visualization  
-3. Explain what the chart reveals about trends or patterns
-
-## EXAMPLES OF GREAT RESPONSES:
-
-For movie searches:
-"Ah, you're looking for sci-fi movies! I love exploring this genre. Let me dive into the database... *searches* 
-
-Wow! I found 247 sci-fi films that match your criteria. What's really fascinating is the variety here - from mind-bending classics like '2001: A Space Odyssey' to modern blockbusters like 'Dune'. I'm seeing some incredible ratings too!
-
-Here are the standout picks..." [then show data]
-
-For person searches:  
-"Tom Hanks! Now there's an absolute legend of cinema. Let me pull up his filmography... *searches*
-
-This is amazing - the man has been in 67 films spanning over 4 decades! What strikes me most is his incredible range, from comedy gold like 'Big' to dramatic masterpieces like 'Forrest Gump'. His average rating is consistently high too.
-
-Want to see his career timeline? I can create a chart showing how his output has evolved over the years!"
-
-## DYNAMIC RESPONSE STRATEGIES:
-
-**For Different Query Types:**
-
-- **Movie Searches**: Express excitement about the genre/actor, mention interesting trivia when relevant, highlight standout films or surprising discoveries, ask follow-up questions about preferences
-
-- **Person/Actor Searches**: Share enthusiasm about their career, point out interesting career patterns or achievements, mention notable collaborations or career highlights, suggest related searches or comparisons
-
-- **Chart/Analysis Requests**: Get excited about the data visualization, explain what trends or patterns are revealed, share insights about what the data tells us, suggest additional angles to explore
-
-- **Top Lists/Rankings**: Express surprise at interesting rankings, point out unexpected entries, share context about why certain films rank highly, invite discussion about the results
-
-**Conversational Techniques:**
-- Use contractions (I'm, you're, let's, that's)
-- Include emotional reactions (Amazing!, Wow!, Interesting!)
-- Ask rhetorical questions (Isn't that fascinating?)
-- Use casual transitions (By the way, Speaking of which, Oh!)
-- Reference previous conversations when relevant
-- Acknowledge user preferences and adapt accordingly
-
-Remember: You're not just a search engine - you're a movie-loving friend sharing discoveries!"""
+        system_message = build_chat_prompt()
 
         # First API call with function calling
         messages = [
@@ -797,26 +715,29 @@ Remember: You're not just a search engine - you're a movie-loving friend sharing
             {"role": "user", "content": user_query}
         ]
         
-        logger.info(f"[{request_id}] Sending request to Azure OpenAI with model: {AZURE_OPENAI_MODEL}")
-        logger.info(f"[{request_id}] Message count: {len(messages)}")
-        logger.info(f"[{request_id}] Tools count: {len(tools)}")
-        logger.info(f"[{request_id}] System message length: {len(system_message)} characters")
+        logger.debug(f"[{request_id}] Sending request to Azure OpenAI with model: {AZURE_OPENAI_MODEL}")
+        logger.debug(f"[{request_id}] Message count: {len(messages)}")
+        logger.debug(f"[{request_id}] Tools count: {len(tools)}")
+        logger.debug(f"[{request_id}] System message length: {len(system_message)} characters")
         
-        response = client.chat.completions.create(
-            model=AZURE_OPENAI_MODEL,
-            messages=messages,
-            tools=tools,
-            tool_choice="auto",
-            temperature=0.7,
-            max_tokens=1500
-        )
+        with span("llm_tool_selection"), llm_slot():
+            response = client.chat.completions.create(
+                model=AZURE_OPENAI_MODEL,
+                messages=messages,
+                tools=tools,
+                tool_choice="auto",
+                temperature=0.7,
+                max_tokens=1500,
+                **prompt_cache_options()
+            )
+        record_usage("tool_selection", response.usage)
         
-        logger.info(f"[{request_id}] ✅ Received response from Azure OpenAI")
+        logger.debug(f"[{request_id}] ✅ Received response from Azure OpenAI")
         
         response_message = response.choices[0].message
         ai_response = response_message.content or ""
         
-        logger.info(f"[{request_id}] AI response content length: {len(ai_response) if ai_response else 0}")
+        logger.debug(f"[{request_id}] AI response content length: {len(ai_response) if ai_response else 0}")
         logger.info(f"[{request_id}] Tool calls detected: {len(response_message.tool_calls) if response_message.tool_calls else 0}")
         
         # Track function calls and results
@@ -829,141 +750,71 @@ Remember: You're not just a search engine - you're a movie-loving friend sharing
             logger.info(f"[{request_id}] Processing {len(response_message.tool_calls)} tool calls")
             messages.append(response_message)
             
+            parsed_calls = []
             for i, tool_call in enumerate(response_message.tool_calls):
                 function_name = tool_call.function.name
-                logger.info(f"[{request_id}] Processing tool call {i+1}/{len(response_message.tool_calls)}: {function_name}")
+                logger.debug(f"[{request_id}] Processing tool call {i+1}/{len(response_message.tool_calls)}: {function_name}")
                 
                 try:
                     function_args = json.loads(tool_call.function.arguments)
-                    logger.info(f"[{request_id}] Tool call {i+1} arguments: {function_args}")
+                    if should_log_payload(logger):
+                        logger.info(f"[{request_id}] Tool call {i+1} arguments: {function_args}")
                 except json.JSONDecodeError as e:
                     logger.error(f"[{request_id}] Failed to parse function arguments: {tool_call.function.arguments}")
                     logger.error(f"[{request_id}] JSON decode error: {str(e)}")
                     continue
-                
-                function_calls.append({
+                parsed_calls.append((tool_call, function_name, function_args))
+            
+            # Execute the functions concurrently; results are handled in the model's order
+            tools_start = time.perf_counter()
+            outcomes = run_tool_calls([(name, args) for _, name, args in parsed_calls], request_id)
+            logger.info(f"[{request_id}] {len(parsed_calls)} tool call(s) completed in {time.perf_counter() - tools_start:.2f}s")
+            
+            for (tool_call, function_name, function_args), outcome in zip(parsed_calls, outcomes):
+                function_call = {
                     "function": function_name,
                     "arguments": function_args,
                     "status": "executing"
-                })
+                }
+                function_calls.append(function_call)
                 
-                # Execute the function
-                try:
-                    if function_name == "search_imdb_database":
-                        logger.info(f"[{request_id}] Executing search_imdb_database with: {function_args}")
-                        function_result = search_imdb_database(**function_args)
-                        search_results = function_result
-                        logger.info(f"[{request_id}] Search completed. Success: {function_result.get('success')}, Results: {function_result.get('row_count', 0)}")
-                        
-                        # Auto-generate chart if this was a chart request and we have chart-ready data
-                        if (function_args.get('chart_request') or function_args.get('query_type') == 'chart_data') and function_result.get('success'):
-                            chart_data_results = function_result.get('results', [])
-                            if chart_data_results and len(chart_data_results) > 0:
-                                logger.info(f"[{request_id}] Auto-generating chart from {len(chart_data_results)} search results")
-                                
-                                # Check if the data already has year/count columns (pre-aggregated)
-                                first_result = chart_data_results[0]
-                                if 'year' in first_result and 'count' in first_result:
-                                    # Data is already aggregated
-                                    chart_title = f"{function_args.get('search_terms')} Movies Over Time"
-                                    chart_result = generate_chart_function(
-                                        chart_type="bar",
-                                        data=chart_data_results,
-                                        title=chart_title,
-                                        x_label="Year",
-                                        y_label="Number of Movies"
-                                    )
-                                    chart_data = chart_result
-                                    logger.info(f"[{request_id}] Auto-chart generation completed (pre-aggregated). Success: {chart_result.get('success')}")
-                                
-                                # Check if we have raw movie data with years that we can aggregate
-                                elif 'premiered' in first_result or 'year' in first_result:
-                                    logger.info(f"[{request_id}] Found raw movie data with years, aggregating for chart")
-                                    
-                                    # Group by year and count
-                                    year_counts = {}
-                                    for result in chart_data_results:
-                                        year = result.get('premiered') or result.get('year')
-                                        if year and year != 'None' and year != '\\N':
-                                            try:
-                                                year = int(year)  # Ensure it's an integer
-                                                year_counts[year] = year_counts.get(year, 0) + 1
-                                            except (ValueError, TypeError):
-                                                continue
-                                    
-                                    if year_counts:
-                                        # Convert to chart data format
-                                        chart_data_list = [
-                                            {"x": str(year), "y": count, "year": year, "count": count}
-                                            for year, count in sorted(year_counts.items())
-                                        ]
-                                        
-                                        # Extract person/search terms for chart title
-                                        search_terms = function_args.get('search_terms', 'Movies')
-                                        chart_title = f"{search_terms} by Year"
-                                        
-                                        logger.info(f"[{request_id}] Creating chart with {len(chart_data_list)} data points")
-                                        chart_result = generate_chart_function(
-                                            chart_type="bar",
-                                            data=chart_data_list,
-                                            title=chart_title,
-                                            x_label="Year",
-                                            y_label="Number of Movies"
-                                        )
-                                        chart_data = chart_result
-                                        logger.info(f"[{request_id}] Auto-chart generation completed (aggregated). Success: {chart_result.get('success')}")
-                                        
-                                        # Add this as a function call for tracking
-                                        function_calls.append({
-                                            "function": "generate_chart",
-                                            "arguments": {
-                                                "chart_type": "bar",
-                                                "data": chart_data_list,
-                                                "title": chart_title,
-                                                "x_label": "Year", 
-                                                "y_label": "Number of Movies"
-                                            },
-                                            "status": "completed",
-                                            "result": chart_result
-                                        })
-                                    else:
-                                        logger.warning(f"[{request_id}] No valid year data found for chart generation")
-                        
-                    elif function_name == "generate_chart":
-                        logger.info(f"[{request_id}] Executing generate_chart with: {function_args}")
-                        function_result = generate_chart_function(**function_args)
-                        chart_data = function_result
-                        logger.info(f"[{request_id}] Chart generation completed. Success: {function_result.get('success')}")
-                    else:
-                        logger.error(f"[{request_id}] Unknown function called: {function_name}")
-                        function_result = {"error": f"Unknown function: {function_name}"}
-                except Exception as func_error:
-                    logger.error(f"[{request_id}] Error executing function {function_name}: {str(func_error)}", exc_info=True)
-                    function_result = {"error": str(func_error), "success": False}
+                function_result, tool_search_results, tool_chart_data, extra_function_calls = outcome
+                if tool_search_results is not None:
+                    search_results = tool_search_results
+                if tool_chart_data is not None:
+                    chart_data = tool_chart_data
                 
-                # Add function result to conversation
+                # Add a digest of the result to the conversation; the client gets the full rows
+                with span("result_digest"):
+                    tool_content = json.dumps(summarize_tool_result(function_name, function_result))
                 messages.append({
                     "tool_call_id": tool_call.id,
                     "role": "tool", 
                     "name": function_name,
-                    "content": json.dumps(function_result)
+                    "content": tool_content
                 })
                 
                 # Update function call status
-                function_calls[-1]["status"] = "completed"
-                function_calls[-1]["result"] = function_result
-        
-            # Get final response from AI
-            logger.info(f"[{request_id}] Getting final response from AI after function execution")
-            final_response = client.chat.completions.create(
-                model=AZURE_OPENAI_MODEL,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=800
-            )
+                function_call["status"] = "completed"
+                function_call["result"] = function_result
+                function_calls.extend(extra_function_calls)
+        
+            # Get final response from AI, styled for the kinds of search that were run
+            logger.debug(f"[{request_id}] Getting final response from AI after function execution")
+            messages[0] = {"role": "system", "content": build_chat_answer_prompt(
+                user_query, [args.get("query_type") for _, _, args in parsed_calls])}
+            with span("llm_answer"), llm_slot():
+                final_response = client.chat.completions.create(
+                    model=AZURE_OPENAI_MODEL,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=800,
+                    **prompt_cache_options()
+                )
+            record_usage("answer", final_response.usage)
             
             ai_response = final_response.choices[0].message.content
-            logger.info(f"[{request_id}] Final AI response length: {len(ai_response) if ai_response else 0}")
+            logger.debug(f"[{request_id}] Final AI response length: {len(ai_response) if ai_response else 0}")
         
         # Prepare response
         response_data = {
@@ -978,10 +829,11 @@ Remember: You're not just a search engine - you're a movie-loving friend sharing
         }
         
         logger.info(f"[{request_id}] ✅ Chat API response prepared successfully. Function calls: {len(function_calls)}")
-        logger.info(f"[{request_id}] Response data keys: {list(response_data.keys())}")
+        logger.debug(f"[{request_id}] Response data keys: {list(response_data.keys())}")
         logger.info(f"[{request_id}] ===== CHAT API REQUEST COMPLETED =====")
         
-        return jsonify(response_data)
+        with span("serialization"):
+            return jsonify(response_data)
         
     except Exception as e:
         logger.error(f"[{request_id}] ❌ Error in chat API: {str(e)}", exc_info=True)
@@ -996,6 +848,206 @@ Remember: You're not just a search engine - you're a movie-loving friend sharing
             "request_id": request_id
         }), 500
 
+def stream_chat_completion(client, call_kind, **kwargs):
+    """
+    Generator over a streamed chat completion that yields content tokens as they arrive
+    and returns (content, tool_calls) once the stream ends, with tool call fragments
+    reassembled into complete calls. Token usage is counted under `call_kind`.
+    """
+    content_parts = []
+    tool_calls = {}
+    usage = None
+    
+    # The slot is held until the stream has been read to the end
+    with llm_slot():
+        for chunk in client.chat.completions.create(stream=True, **prompt_cache_options(), **kwargs):
+            # Providers that report usage on streams send it on a final chunk
+            usage = getattr(chunk, "usage", None) or usage
+            # Azure sends a leading chunk with content filter results and no choices
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content_parts.append(delta.content)
+                yield delta.content
+            for tool_delta in delta.tool_calls or []:
+                call = tool_calls.setdefault(tool_delta.index, {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                })
+                if tool_delta.id:
+                    call["id"] = tool_delta.id
+                if tool_delta.function:
+                    call["function"]["name"] += tool_delta.function.name or ""
+                    call["function"]["arguments"] += tool_delta.function.arguments or ""
+    
+    content = "".join(content_parts)
+    record_usage(call_kind, usage, kwargs.get("messages", ()),
+                 content + "".join(tool_call["function"]["arguments"] for tool_call in tool_calls.values()))
+    return content, [tool_calls[index] for index in sorted(tool_calls)]
+
+def token_events(tokens):
+    """Relay tokens from stream_chat_completion as SSE token events, returning its result"""
+    while True:
+        try:
+            token = next(tokens)
+        except StopIteration as stop:
+            return stop.value
+        yield sse_event("token", {"content": token})
+
+def tool_call_events(calls, request_id):
+    """
+    Run tool calls ((function_name, function_args) pairs) concurrently on the tool executor
+    and relay the progress events they emit (e.g. the generated SQL) as SSE events while
+    they run, followed by rows and chart events as each call completes. Returns the
+    execute_tool_call() results in call order.
+    """
+    events = queue.Queue()
+    outcomes = [None] * len(calls)
+    
+    def run(index, function_name, function_args):
+        outcome = None
+        try:
+            outcome = execute_tool_call(
+                function_name, function_args, request_id,
+                on_event=lambda event, payload: events.put((event, payload)))
+        finally:
+            events.put((index, outcome))
+    
+    for index, (function_name, function_args) in enumerate(calls):
+        submit_tool_call(run, index, function_name, function_args)
+    
+    pending = len(calls)
+    while pending:
+        key, value = events.get()
+        if not isinstance(key, int):
+            yield sse_event(key, value)
+            continue
+        pending -= 1
+        if value is None:
+            raise RuntimeError(f"Tool call {calls[key][0]} did not complete")
+        outcomes[key] = value
+        _, search_results, chart_data, _ = value
+        if search_results is not None:
+            yield sse_event("rows", search_results)
+        if chart_data is not None:
+            yield sse_event("chart", chart_data)
+    return outcomes
+
+@main.route('/api/chat/stream', methods=['GET', 'POST'])
+def api_chat_stream():
+    """
+    Server-Sent Events variant of /api/chat. Emits progress events while the turn runs
+    (tool_call, sql, rows, chart), streams the answer as token events and finishes with
+    a done event. Accepts a JSON body or a `query` argument (for EventSource).
+    """
+    request_id = get_request_id() or new_request_id()
+    data = request.get_json(silent=True) or {}
+    user_query = (data.get('query') or request.args.get('query', '')).strip()
+    
+    if not user_query:
+        return jsonify({
+            "success": False,
+            "error": "Query cannot be empty",
+            "request_id": request_id
+        }), 400
+    
+    logger.info(f"[{request_id}] Streaming chat API called with query: {user_query}")
+    
+    def generate():
+        conversation_id = str(uuid.uuid4())
+        yield sse_event("start", {"conversation_id": conversation_id, "request_id": request_id})
+        
+        try:
+            client = get_azure_client()
+            messages = [
+                {"role": "system", "content": build_chat_prompt()},
+                {"role": "user", "content": user_query}
+            ]
+            
+            # A direct answer streams from the first call; tool call turns usually carry no content
+            with span("llm_tool_selection"):
+                content, tool_calls = yield from token_events(stream_chat_completion(
+                    client,
+                    "tool_selection",
+                    model=AZURE_OPENAI_MODEL,
+                    messages=messages,
+                    tools=get_function_tools(),
+                    tool_choice="auto",
+                    temperature=0.7,
+                    max_tokens=1500
+                ))
+            
+            if tool_calls:
+                messages.append({"role": "assistant", "content": content or None, "tool_calls": tool_calls})
+                
+                parsed_args = []
+                for tool_call in tool_calls:
+                    try:
+                        function_args = json.loads(tool_call["function"]["arguments"] or "{}")
+                    except json.JSONDecodeError:
+                        logger.error(f"[{request_id}] Failed to parse function arguments: {tool_call['function']['arguments']}")
+                        function_args = None
+                    else:
+                        yield sse_event("tool_call", {"function": tool_call["function"]["name"], "arguments": function_args})
+                    parsed_args.append(function_args)
+                
+                # Independent tool calls run concurrently; their results go back in the model's order
+                valid_calls = [(tool_call["function"]["name"], function_args)
+                               for tool_call, function_args in zip(tool_calls, parsed_args) if function_args is not None]
+                outcomes = iter((yield from tool_call_events(valid_calls, request_id)))
+                
+                for tool_call, function_args in zip(tool_calls, parsed_args):
+                    function_name = tool_call["function"]["name"]
+                    if function_args is None:
+                        function_result = {"error": "Invalid function arguments", "success": False}
+                    else:
+                        function_result = next(outcomes)[0]
+                    
+                    # The rows were already sent as rows events; the model gets a digest
+                    with span("result_digest"):
+                        tool_content = json.dumps(summarize_tool_result(function_name, function_result))
+                    messages.append({
+                        "tool_call_id": tool_call["id"],
+                        "role": "tool",
+                        "name": function_name,
+                        "content": tool_content
+                    })
+                
+                # Stream the final answer token by token, styled for the kinds of search that were run
+                messages[0] = {"role": "system", "content": build_chat_answer_prompt(
+                    user_query, [args.get("query_type") for args in parsed_args if args])}
+                with span("llm_answer"):
+                    content, _ = yield from token_events(stream_chat_completion(
+                        client,
+                        "answer",
+                        model=AZURE_OPENAI_MODEL,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=800
+                    ))
+            
+            yield sse_event("done", {
+                "success": True,
+                "ai_response": content,
+                "timestamp": datetime.now().isoformat()
+            })
+            logger.info(f"[{request_id}] Streaming chat completed, response length: {len(content)}")
+        
+        except Exception as e:
+            logger.error(f"[{request_id}] ❌ Error in streaming chat API: {str(e)}", exc_info=True)
+            yield sse_event("error", {
+                "success": False,
+                "error": str(e),
+                "ai_response": "I apologize, but I encountered an error processing your request."
+            })
+    
+    return Response(generate(), mimetype=SSE_MIMETYPE, headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Disable proxy buffering so events flush immediately
+    })
+
 @main.route('/', methods=['GET', 'POST'])
 def home():
     """Enhanced home route with comprehensive logging and error handling"""
@@ -1003,6 +1055,7 @@ def home():
     query = ''
     sql_query = ''
     error_message = None
+    truncated = False
     suggested_queries = get_suggested_queries()
 
     if request.method == 'POST':
@@ -1016,18 +1069,27 @@ def home():
             try:
                 # Generate SQL query
                 start_time = time.time()
-                sql_query = generate_response(user_query)
+                sql_query, params = generate_response(user_query)
                 
-                # Validate SQL query
-                if not validate_sql_query(sql_query):
-                    raise ValueError("Generated SQL query failed validation")
-                
-                # Execute query
-                results, column_names = execute_sql_query(sql_query)
+                # Validate and execute query (the results table gets the full row budget)
+                sql_cache = get_sql_cache()
+                try:
+                    results, column_names, next_page_token = execute_sql_query(
+                        sql_query, limit=get_setting('MAX_RESULT_LIMIT', 1000), params=params)
+                except (InvalidQueryError, QueryTimeoutError):
+                    if sql_cache:
+                        sql_cache.discard(user_query)
+                    raise
+                if sql_cache:
+                    sql_cache.store(user_query, sql_query, params)
+                # Shown with the parameter values inlined so it can be copied and run as is
+                sql_query = render_sql(sql_query, params)
+                truncated = next_page_token is not None
                 execution_time = time.time() - start_time
                 
                 if results:
-                    results = [dict(zip(column_names, row)) for row in results]
+                    with span("row_conversion"):
+                        results = [dict(zip(column_names, row)) for row in results]
                     logger.info(f"Query successful: {len(results)} results in {execution_time:.2f}s")
                 else:
                     logger.info("Query executed successfully but returned no results")
@@ -1043,6 +1105,7 @@ def home():
                          query=query,
                          sql_query=sql_query,
                          error_message=error_message,
+                         truncated=truncated,
                          suggested_queries=suggested_queries)
 
 @main.route('/chat')
@@ -1094,11 +1157,60 @@ def api_validate_query():
         'message': 'Query is valid'
     })
 
+@main.route('/api/pool_stats', methods=['GET'])
+def api_pool_stats():
+    """API endpoint exposing database connection pool metrics"""
+    return jsonify({
+        'status': 'success',
+        'pool': get_pool().stats(),
+        'concurrency': concurrency_stats(),
+        'logging': logging_stats()
+    })
+
+@main.route('/api/llm_stats', methods=['GET'])
+def api_llm_stats():
+    """API endpoint exposing LLM connection reuse, handshake, queueing, retry and token usage metrics"""
+    return jsonify({
+        'status': 'success',
+        'llm': llm_stats(),
+        'usage': llm_usage_stats()
+    })
+
+@main.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus endpoint with per-stage and per-endpoint latency histograms for this process"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@main.route('/api/slow_queries', methods=['GET'])
+def api_slow_queries():
+    """API endpoint listing the slowest queries this process has run, with their plans"""
+    return jsonify({
+        'status': 'success',
+        'slow_queries': slowest_queries()
+    })
+
+@main.route('/api/cache_stats', methods=['GET'])
+def api_cache_stats():
+    """API endpoint exposing NL-to-SQL cache, query-result cache and fast path statistics"""
+    sql_cache = get_sql_cache()
+    result_cache = get_result_cache()
+    return jsonify({
+        'status': 'success',
+        'sql_cache': sql_cache.stats() if sql_cache else None,
+        'result_cache': result_cache.stats() if result_cache else None,
+        'fast_path': fast_path_stats()
+    })
+
 @main.route('/api/execute', methods=['POST'])
 def api_execute_query():
-    """API endpoint to execute a SQL query directly (for admin use)"""
+    """
+    API endpoint to execute a SQL query directly (for admin use), with optional "params"
+    for its :name placeholders
+    """
     data = request.get_json()
     sql_query = data.get('query', '').strip()
+    params = data.get('params') or None
+    page_token = data.get('page_token') or None
     
     if not sql_query:
         return jsonify({
@@ -1107,24 +1219,68 @@ def api_execute_query():
         }), 400
     
     try:
-        # For safety, validate SQL query before execution
-        if not validate_sql_query(sql_query):
-            return jsonify({
-                'status': 'error',
-                'message': 'Invalid SQL query',
-                'query': sql_query
-            }), 400
-        
-        results, column_names = execute_sql_query(sql_query)
+        limit = get_result_limit(data.get('limit'))
+    except (TypeError, ValueError):
+        return jsonify({
+            'status': 'error',
+            'message': 'Limit must be an integer'
+        }), 400
+    
+    try:
+        stream_mode = get_stream_mode(request)
+        if stream_mode:
+            # Write rows straight from the cursor instead of buffering the page. The stream
+            # holds a database slot until the response is closed, like a buffered query does
+            # while it runs, so streamed responses count against DB_MAX_CONCURRENCY.
+            held = ExitStack()
+            held.enter_context(db_slot())
+            try:
+                stream = stream_sql_query(sql_query, limit=limit, page_token=page_token, params=params)
+            except Exception:
+                held.close()
+                raise
+            held.callback(stream.close)
+            if stream_mode == 'ndjson':
+                response = Response(ndjson_query_rows(stream, get_next_page_token), mimetype=NDJSON_MIMETYPE)
+            else:
+                response = Response(json_query_rows(stream, get_next_page_token), mimetype='application/json')
+            response.call_on_close(held.close)
+            return response
+        
+        # Validation (read-only authorizer) happens while the query is prepared
+        results, column_names, next_page_token = execute_sql_query(sql_query, limit=limit, page_token=page_token,
+                                                                   params=params)
         
         # Convert results to list of dictionaries
-        results = [dict(zip(column_names, row)) for row in results]
-        
-        return jsonify({
-            'status': 'success',
-            'results': results
-        }), 200
+        with span("row_conversion"):
+            results = [dict(zip(column_names, row)) for row in results]
+        
+        with span("serialization"):
+            response = jsonify({
+                'status': 'success',
+                'results': results,
+                'row_count': len(results),
+                'next_page_token': next_page_token
+            })
+        return response, 200
     
+    except InvalidPageTokenError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except InvalidQueryError as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Invalid SQL query: {str(e)}',
+            'query': sql_query
+        }), 400
+    except QueryTimeoutError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            'query': sql_query
+        }), 504
     except Exception as e:
         logger.error(f"Error executing SQL query: {str(e)}", exc_info=True)
         return jsonify({
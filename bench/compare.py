@@ -0,0 +1,88 @@
+"""
+Compare two bench.runner result files and fail on latency or throughput regressions:
+
+    python -m bench.compare base.json new.json --threshold 10
+
+Exits with status 1 if any endpoint's percentile latency rose, or its throughput fell,
+by more than --threshold percent, or if it had more errors than the baseline.
+"""
+import argparse
+import json
+import sys
+
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def change_percent(base, new):
+    if not base:
+        return None
+    return (new - base) / base * 100
+
+
+def compare_results(base, new, threshold=10.0, min_delta_ms=1.0):
+    """
+    Rows of (endpoint, metric, base, new, change %, regressed) for the endpoints both runs
+    measured. Latency changes under min_delta_ms are never regressions, so fast endpoints
+    do not fail on noise.
+    """
+    rows = []
+    for endpoint, base_summary in base["endpoints"].items():
+        new_summary = new["endpoints"].get(endpoint)
+        if new_summary is None:
+            continue
+        for key in LATENCY_KEYS:
+            before, after = base_summary.get(key), new_summary.get(key)
+            if before is None or after is None:
+                continue
+            change = change_percent(before, after)
+            regressed = change is not None and change > threshold and after - before >= min_delta_ms
+            rows.append((endpoint, key, before, after, change, regressed))
+        before, after = base_summary["throughput_rps"], new_summary["throughput_rps"]
+        change = change_percent(before, after)
+        rows.append((endpoint, "throughput_rps", before, after, change, change is not None and change < -threshold))
+        before, after = base_summary["errors"], new_summary["errors"]
+        rows.append((endpoint, "errors", before, after, change_percent(before, after), after > before))
+    return rows
+
+
+def describe_mismatch(base, new):
+    """Settings that differ between the runs and make the comparison unreliable"""
+    notes = []
+    for key in ("database", "concurrency", "llm_latency_ms", "cache", "target"):
+        if base["metadata"].get(key) != new["metadata"].get(key):
+            notes.append(f"{key} differs: {base['metadata'].get(key)} vs {new['metadata'].get(key)}")
+    return notes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs")
+    parser.add_argument("base", help="Baseline results JSON")
+    parser.add_argument("new", help="Results JSON to check")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore latency changes smaller than this")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    for note in describe_mismatch(base, new):
+        print(f"Warning: {note}")
+
+    rows = compare_results(base, new, args.threshold, args.min_delta_ms)
+    print(f"{'endpoint':<12}{'metric':<16}{'base':>10}{'new':>10}{'change':>10}")
+    for endpoint, metric, before, after, change, regressed in rows:
+        change_text = f"{change:+.1f}%" if change is not None else "n/a"
+        print(f"{endpoint:<12}{metric:<16}{before:>10}{after:>10}{change_text:>10}{'  REGRESSION' if regressed else ''}")
+
+    regressions = [row for row in rows if row[-1]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold}%")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import json
+import os
+import re
+import zlib
+
+# Questions with the SQL a model would generate for them, and the tool arguments chat
+# turns use when they are not a plain search
+DEFAULT_CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus.json")
+
+# What a model writes for "chart of <person>'s movies by year" on the search page
+CHART_SQL = (
+    "SELECT t.premiered as year, COUNT(*) as count FROM people p "
+    "JOIN crew c ON p.person_id = c.person_id JOIN titles t ON c.title_id = t.title_id "
+    "WHERE p.name = '{name}' AND c.category IN ('actor', 'actress') "
+    "AND t.type IN ('movie', 'tvMovie') AND t.premiered IS NOT NULL "
+    "GROUP BY t.premiered ORDER BY t.premiered"
+)
+
+
+# Values a model lifts into bind parameters: compared or LIKE string literals, and numbers
+# compared with or ranged over by BETWEEN
+_LITERAL_VALUE = re.compile(r"(?P<op>=|\bLIKE)\s*'(?P<text>(?:[^']|'')*)'", re.IGNORECASE)
+_BETWEEN_VALUES = re.compile(r"\bBETWEEN\s+(?P<low>\d+(?:\.\d+)?)\s+AND\s+(?P<high>\d+(?:\.\d+)?)", re.IGNORECASE)
+_COMPARED_NUMBER = re.compile(r"(?P<op>>=|<=|!=|=|>|<)\s*(?P<number>\d+(?:\.\d+)?)\b")
+
+
+def parameterize_sql(sql):
+    """(sql, params) with the literal values of canned SQL replaced by :p1, :p2, ... placeholders"""
+    params = {}
+
+    def bind(value):
+        name = f"p{len(params) + 1}"
+        params[name] = value
+        return f":{name}"
+
+    def number(text):
+        return float(text) if "." in text else int(text)
+
+    sql = _LITERAL_VALUE.sub(lambda m: f"{m.group('op')} {bind(m.group('text').replace(chr(39) * 2, chr(39)))}", sql)
+    sql = _BETWEEN_VALUES.sub(lambda m: f"BETWEEN {bind(number(m.group('low')))} AND {bind(number(m.group('high')))}", sql)
+    sql = _COMPARED_NUMBER.sub(lambda m: f"{m.group('op')} {bind(number(m.group('number')))}", sql)
+    return sql, params
+
+
+def load_corpus(path=None):
+    """Benchmark questions, each a dict with question, sql (None for charts) and optional chat arguments"""
+    with open(path or DEFAULT_CORPUS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def normalize_question(question):
+    return " ".join(question.lower().split())
+
+
+class CannedAnswers:
+    """Looks up the canned SQL and chat arguments for a question"""
+
+    def __init__(self, corpus):
+        self.entries = {normalize_question(entry["question"]): entry for entry in corpus}
+        self.queries = [entry["sql"] for entry in corpus if entry.get("sql")]
+
+    def sql_for(self, question):
+        """Canned SQL for a corpus question; other questions get a stable pick from the corpus"""
+        entry = self.entries.get(normalize_question(question))
+        if entry and entry.get("sql"):
+            return entry["sql"]
+        if entry and entry.get("chat", {}).get("chart_request"):
+            return CHART_SQL.format(name=entry["chat"]["search_terms"].replace("'", "''"))
+        return self.queries[zlib.crc32(normalize_question(question).encode()) % len(self.queries)]
+
+    def generated_answer_for(self, question):
+        """The SQL completion for a question: a JSON object with parameterized sql and its params"""
+        sql, params = parameterize_sql(self.sql_for(question))
+        return json.dumps({"sql": sql, "params": params})
+
+    def tool_arguments_for(self, question):
+        """search_imdb_database arguments a model would pick for a chat question"""
+        entry = self.entries.get(normalize_question(question))
+        if entry and entry.get("chat"):
+            return entry["chat"]
+        return {"query_type": "movie_search", "search_terms": question}
@@ -0,0 +1,223 @@
+"""
+Local stand-in for the OpenAI chat completions API, so benchmarks measure this app and
+not a model. It answers the app's three kinds of completion from the benchmark corpus:
+SQL generation gets the question's canned SQL (as parameterized JSON), chat turns get a search_imdb_database
+tool call and then a short answer, and title summaries get a fixed paragraph. Streaming
+(server-sent events) is supported, and every response can be delayed to model latency.
+
+    python -m bench.fake_openai --port 8001 --latency-ms 400 --jitter-ms 150
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .corpus import CannedAnswers, load_corpus
+
+ANSWER_TEXT = (
+    "Here is what I found in the IMDb database. The top results are listed below, "
+    "ordered by rating, with their release years and genres."
+)
+SUMMARY_TEXT = (
+    "A widely seen title with a strong audience rating. It is remembered for its cast, "
+    "its direction and the way it shaped later films in its genre."
+)
+
+
+def classify_completion(body):
+    """Which of the app's completions a request is: 'tool_selection', 'answer', 'sql' or 'summary'"""
+    messages = body.get("messages", [])
+    if messages and messages[-1].get("role") == "tool":
+        return "answer"
+    if body.get("tools"):
+        return "tool_selection"
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    if "SQL" in system:
+        return "sql"
+    return "summary"
+
+
+def last_user_message(body):
+    for message in reversed(body.get("messages", [])):
+        if message.get("role") == "user":
+            return message.get("content") or ""
+    return ""
+
+
+class FakeOpenAIServer:
+    """Threaded fake /v1/chat/completions endpoint; use as a context manager or start()/stop()"""
+
+    def __init__(self, host="127.0.0.1", port=0, corpus=None, latency_ms=0, jitter_ms=0, token_delay_ms=0):
+        self.answers = CannedAnswers(corpus if corpus is not None else load_corpus())
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.token_delay_ms = token_delay_ms
+        self.completions = 0
+        self._count_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def delay(self):
+        """Sleep for one simulated model round trip"""
+        latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def respond(self, body):
+        """(content, tool_calls) the model would return for a completion request"""
+        with self._count_lock:
+            self.completions += 1
+        kind = classify_completion(body)
+        question = last_user_message(body)
+        if kind == "tool_selection":
+            arguments = self.answers.tool_arguments_for(question)
+            return None, [{
+                "id": f"call_{self.completions}",
+                "type": "function",
+                "function": {"name": "search_imdb_database", "arguments": json.dumps(arguments)},
+            }]
+        if kind == "sql":
+            return self.answers.generated_answer_for(question), None
+        if kind == "answer":
+            return ANSWER_TEXT, None
+        return SUMMARY_TEXT, None
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                content, tool_calls = fake.respond(body)
+                fake.delay()
+                if body.get("stream"):
+                    self.send_stream(body, content, tool_calls)
+                else:
+                    self.send_completion(body, content, tool_calls)
+
+            def send_json(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_completion(self, body, content, tool_calls):
+                message = {"role": "assistant", "content": content}
+                if tool_calls:
+                    message["tool_calls"] = tool_calls
+                prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+                completion_tokens = len(json.dumps(message)) // 4
+                self.send_json(200, {
+                    "id": f"chatcmpl-fake-{fake.completions}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": "tool_calls" if tool_calls else "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+
+            def send_stream(self, body, content, tool_calls):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.close_connection = True
+                self.end_headers()
+
+                def send_chunk(delta, finish_reason=None):
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+
+                if tool_calls:
+                    for index, call in enumerate(tool_calls):
+                        arguments = call["function"]["arguments"]
+                        half = len(arguments) // 2
+                        send_chunk({"tool_calls": [{
+                            "index": index, "id": call["id"], "type": "function",
+                            "function": {"name": call["function"]["name"], "arguments": arguments[:half]},
+                        }]})
+                        send_chunk({"tool_calls": [{"index": index, "function": {"arguments": arguments[half:]}}]})
+                    send_chunk({}, "tool_calls")
+                else:
+                    send_chunk({"role": "assistant", "content": ""})
+                    for word in content.split(" "):
+                        send_chunk({"content": word + " "})
+                        if fake.token_delay_ms:
+                            time.sleep(fake.token_delay_ms / 1000)
+                    send_chunk({}, "stop")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve canned chat completions for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--corpus", help="Benchmark corpus JSON (default: bench/corpus.json)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay before each completion")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random +/- spread of the delay")
+    parser.add_argument("--token-delay-ms", type=float, default=0, help="Delay between streamed tokens")
+    args = parser.parse_args(argv)
+
+    server = FakeOpenAIServer(args.host, args.port, load_corpus(args.corpus), args.latency_ms, args.jitter_ms, args.token_delay_ms)
+    print(f"Fake OpenAI API at {server.base_url} (set OPENAI_BASE_URL to this)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Replay recorded questions against the search page (/) and /api/chat at a target rate, to
+try caching, pooling and index changes on real traffic shapes. Questions come from the
+app's log files (the "Received user query" and "Chat API called" lines, text or JSON
+format, including rotated files) and from JSON lines files with a query, question or
+title field:
+
+    python -m bench.replay --serve --db bench/imdb_1m.db --log app.log --profile 30s@5,60s@20
+    python -m bench.replay --serve --db bench/imdb_1m.db --log app.log --profile original --speedup 10
+
+The schedule is open-loop: requests are sent when the profile says so, whether or not
+earlier ones have finished (up to --concurrency in flight), and latency is measured from
+the scheduled send time, so a backlog shows up as latency instead of a lower rate. The
+report has latency and throughput per endpoint and the slowest generated SQL statements.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .corpus import load_corpus
+from .runner import (Client, InProcessApp, chat_request, database_metadata, format_table, git_commit,
+                     home_request, summarize)
+
+REPLAY_ENDPOINTS = {"home": home_request, "chat": chat_request}
+
+# Log messages that carry a user's question, and the endpoint that received it
+LOG_PATTERNS = (
+    ("home", re.compile(r"Received user query: '(?P<query>.*)' from IP: ")),
+    ("chat", re.compile(r"\] (?:Streaming )?[Cc]hat API called with query: (?P<query>.*)$")),
+)
+TEXT_TIMESTAMP = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3})")
+
+STAGE_PATTERN = re.compile(r"^(?P<seconds>\d+(?:\.\d+)?)s@(?P<qps>\d+(?:\.\d+)?)$")
+
+
+def parse_log_line(line):
+    """(timestamp, endpoint, query) for a log line recording a user's question, else None"""
+    line = line.rstrip("\n")
+    timestamp = None
+    if line.startswith("{"):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        message = entry.get("message", "")
+        if entry.get("timestamp"):
+            timestamp = datetime.fromisoformat(entry["timestamp"])
+    else:
+        message = line
+        match = TEXT_TIMESTAMP.match(line)
+        if match:
+            timestamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S,%f")
+    for endpoint, pattern in LOG_PATTERNS:
+        match = pattern.search(message)
+        if match and match.group("query").strip():
+            return timestamp, endpoint, match.group("query").strip()
+    return None
+
+
+def read_log(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return [parsed for parsed in map(parse_log_line, f) if parsed]
+
+
+def read_jsonl(path, endpoints):
+    """Questions from a JSON lines file, spread over endpoints unless a line names its own"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            query = record.get("query") or record.get("question") or record.get("title")
+            if not query:
+                continue
+            endpoint = record.get("endpoint") or endpoints[len(entries) % len(endpoints)]
+            entries.append((None, endpoint, query.strip()))
+    return entries
+
+
+def load_traffic(log_paths=(), jsonl_paths=(), endpoints=("chat", "home")):
+    """Recorded (timestamp, endpoint, query) tuples, logged ones in time order"""
+    logged = [entry for path in log_paths for entry in read_log(path)]
+    logged.sort(key=lambda entry: entry[0] or datetime.min)
+    recorded = [entry for path in jsonl_paths for entry in read_jsonl(path, endpoints)]
+    return [entry for entry in logged + recorded if entry[1] in endpoints]
+
+
+def parse_profile(profile):
+    """[(seconds, qps), ...] from a profile such as '30s@5,60s@20,30s@5'"""
+    stages = []
+    for stage in profile.split(","):
+        match = STAGE_PATTERN.match(stage.strip())
+        if not match:
+            raise ValueError(f"Bad profile stage {stage!r}, expected e.g. 30s@5")
+        stages.append((float(match.group("seconds")), float(match.group("qps"))))
+    return stages
+
+
+def schedule(traffic, profile, speedup=1.0):
+    """
+    [(offset seconds, endpoint, query), ...] to send. A staged profile sends requests at a
+    steady rate per stage, cycling through the traffic; 'original' keeps the recorded gaps
+    between logged requests, compressed by speedup.
+    """
+    if profile == "original":
+        timed = [entry for entry in traffic if entry[0] is not None]
+        if not timed:
+            raise ValueError("The original profile needs timestamped log entries")
+        start = timed[0][0]
+        return [((timestamp - start).total_seconds() / speedup, endpoint, query) for timestamp, endpoint, query in timed]
+
+    sends = []
+    stage_start = 0.0
+    for seconds, qps in parse_profile(profile):
+        count = int(seconds * qps)
+        for i in range(count):
+            _, endpoint, query = traffic[len(sends) % len(traffic)]
+            sends.append((stage_start + i / qps, endpoint, query))
+        stage_start += seconds
+    return sends
+
+
+def replay(base_url, sends, concurrency, timeout=120):
+    """Send the scheduled requests; returns per-endpoint summaries and the achieved rate"""
+    local = threading.local()
+    lock = threading.Lock()
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    late = [0]
+
+    def send(scheduled, endpoint, query):
+        if not hasattr(local, "client"):
+            local.client = Client(base_url, timeout)
+        try:
+            ok = REPLAY_ENDPOINTS[endpoint](local.client, query)
+        except Exception:
+            local.client.close()
+            ok = False
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            if ok:
+                latencies[endpoint].append(elapsed)
+            else:
+                errors[endpoint] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay") as executor:
+        for offset, endpoint, query in sends:
+            scheduled = started + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.1:
+                late[0] += 1
+            executor.submit(send, scheduled, endpoint, query)
+    wall_seconds = time.perf_counter() - started
+
+    endpoints = {
+        endpoint: summarize(latencies[endpoint], errors[endpoint], wall_seconds)
+        for endpoint in sorted(set(latencies) | set(errors))
+    }
+    completed = sum(len(values) for values in latencies.values())
+    return endpoints, {
+        "wall_seconds": round(wall_seconds, 2),
+        "sent": len(sends),
+        "completed": completed,
+        "achieved_qps": round(completed / wall_seconds, 2) if wall_seconds else 0.0,
+        "late_sends": late[0],
+    }
+
+
+def fetch_slowest_queries(base_url, top_n):
+    """The server's slowest queries (see SLOW_QUERY_THRESHOLD_MS), slowest first"""
+    client = Client(base_url, 30)
+    try:
+        status, body = client.request("GET", "/api/slow_queries")
+    finally:
+        client.close()
+    if status != 200:
+        return []
+    return json.loads(body).get("slow_queries", [])[:top_n]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded questions at a target rate")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running server (configured with OPENAI_BASE_URL)")
+    target.add_argument("--serve", action="store_true", help="Serve the app in-process with the fake LLM")
+    parser.add_argument("--db", help="Database for --serve (see bench.synthetic_db)")
+    parser.add_argument("--log", action="append", default=[], help="App log file to take questions from (repeatable)")
+    parser.add_argument("--jsonl", action="append", default=[], help="JSON lines file of questions (repeatable)")
+    parser.add_argument("--endpoints", default="chat,home", help="Endpoints to replay: chat, home or both")
+    parser.add_argument("--profile", default="60s@5",
+                        help="Rate stages such as '30s@5,60s@20', or 'original' for the logged timing")
+    parser.add_argument("--speedup", type=float, default=1.0, help="Compress the original timing by this factor")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight at most")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Fake LLM delay per completion (--serve)")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random +/- spread of the fake LLM delay")
+    parser.add_argument("--no-cache", action="store_true", help="Turn the question and result caches off (--serve)")
+    parser.add_argument("--slow-query-ms", type=float, default=50,
+                        help="Capture generated SQL at least this slow (--serve; --url uses the server's setting)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest SQL statements to report")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds before a request counts as failed")
+    parser.add_argument("--label", help="Name stored with the results (e.g. a branch)")
+    parser.add_argument("--out", help="Write the results as JSON to this file (comparable with bench.compare)")
+    args = parser.parse_args(argv)
+
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = set(endpoints) - set(REPLAY_ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    if not args.log and not args.jsonl:
+        parser.error("give at least one --log or --jsonl source")
+    if args.serve and not args.db:
+        parser.error("--serve needs --db")
+
+    traffic = load_traffic(args.log, args.jsonl, endpoints)
+    if not traffic:
+        parser.error("no questions found in the given sources")
+    try:
+        sends = schedule(traffic, args.profile, args.speedup)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Replaying {len(sends)} requests from {len(traffic)} recorded questions", flush=True)
+
+    fake_llm = app_server = None
+    if args.serve:
+        from .fake_openai import FakeOpenAIServer
+        fake_llm = FakeOpenAIServer(corpus=load_corpus(), latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+        app_server = InProcessApp(args.db, fake_llm.base_url, cache=not args.no_cache, settings={
+            "SLOW_QUERY_THRESHOLD_MS": args.slow_query_ms,
+            "SLOW_QUERY_TOP_N": args.top,
+            "SLOW_QUERY_LOG": None,
+        }).start()
+        base_url = app_server.base_url
+    else:
+        base_url = args.url.rstrip("/")
+
+    try:
+        summaries, totals = replay(base_url, sends, args.concurrency, args.timeout)
+        slowest = fetch_slowest_queries(base_url, args.top)
+    finally:
+        if app_server:
+            app_server.stop()
+        if fake_llm:
+            fake_llm.stop()
+
+    print(format_table(summaries))
+    print(f"{totals['completed']}/{totals['sent']} completed in {totals['wall_seconds']}s "
+          f"({totals['achieved_qps']} req/s, {totals['late_sends']} sent late)")
+    if slowest:
+        print("\nSlowest generated SQL:")
+        for entry in slowest:
+            print(f"{entry['elapsed_ms']:>10.1f} ms  {' '.join(entry['sql_query'].split())[:160]}")
+
+    results = {
+        "metadata": {
+            "label": args.label,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "target": "in-process" if args.serve else base_url,
+            "database": database_metadata(args.db),
+            "sources": args.log + args.jsonl,
+            "profile": args.profile,
+            "speedup": args.speedup,
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.latency_ms if args.serve else None,
+            "cache": not args.no_cache if args.serve else None,
+        },
+        "totals": totals,
+        "endpoints": summaries,
+        "slowest_queries": slowest,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
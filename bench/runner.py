@@ -0,0 +1,338 @@
+"""
+Latency and throughput benchmark for the search page (/), /api/chat, /api/execute and
+/api/title_info. Questions come from the benchmark corpus; every endpoint is driven by
+--concurrency client threads in turn and reported as p50/p95/p99 latency and requests
+per second, then written to a JSON file that bench.compare can diff against another run.
+
+With --serve the app is started in-process against --db (see bench.synthetic_db) and
+the fake OpenAI server (bench.fake_openai), so no API key or network is involved:
+
+    python -m bench.runner --serve --db bench/imdb_1m.db --latency-ms 300 --out base.json
+
+Otherwise point --url at a running server that was configured with OPENAI_BASE_URL.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+
+from .corpus import CannedAnswers, load_corpus
+
+ENDPOINTS = ("home", "chat", "execute", "title_info")
+
+# Titles looked up by the title_info benchmark, spread across the table
+TITLE_SAMPLE_SQL = "SELECT title_id FROM titles WHERE rowid % 97 = 0 LIMIT 200"
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, p):
+    """p-th percentile of already sorted values, interpolating between neighbours"""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(latencies, errors, wall_seconds):
+    """Latency percentiles (ms), error count and throughput of one endpoint's run"""
+    ordered = sorted(latencies)
+    summary = {
+        "requests": len(ordered) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / wall_seconds, 2) if wall_seconds else 0.0,
+    }
+    for p in PERCENTILES:
+        value = percentile(ordered, p)
+        summary[f"p{p}_ms"] = round(value * 1000, 2) if value is not None else None
+    summary["mean_ms"] = round(sum(ordered) / len(ordered) * 1000, 2) if ordered else None
+    summary["max_ms"] = round(ordered[-1] * 1000, 2) if ordered else None
+    return summary
+
+
+class Client:
+    """Keep-alive HTTP client for one benchmark thread"""
+
+    def __init__(self, base_url, timeout):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.prefix = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """(status, body bytes) of one request, reconnecting once if the connection dropped"""
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, self.prefix + path, body=body, headers=headers or {})
+                response = self.conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+
+    def post_json(self, path, payload):
+        status, body = self.request("POST", path, json.dumps(payload), {"Content-Type": "application/json"})
+        return status, json.loads(body) if body else None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def home_request(client, question):
+    body = urllib.parse.urlencode({"query": question})
+    status, page = client.request("POST", "/", body, {"Content-Type": "application/x-www-form-urlencoded"})
+    return status == 200 and b"Query Failed:" not in page
+
+
+def chat_request(client, question):
+    status, payload = client.post_json("/api/chat", {"query": question})
+    return status == 200 and bool(payload and payload.get("success"))
+
+
+def execute_request(client, sql_query):
+    status, payload = client.post_json("/api/execute", {"query": sql_query})
+    return status == 200 and bool(payload and payload.get("status") == "success")
+
+
+def title_info_request(client, title_id):
+    status, payload = client.post_json("/api/title_info", {"title_id": title_id})
+    return status == 200 and bool(payload and payload.get("status") == "success")
+
+
+def endpoint_workload(endpoint, corpus, client):
+    """(request function, inputs it cycles through) for an endpoint"""
+    questions = [entry["question"] for entry in corpus]
+    if endpoint == "home":
+        return home_request, questions
+    if endpoint == "chat":
+        return chat_request, questions
+    if endpoint == "execute":
+        answers = CannedAnswers(corpus)
+        return execute_request, [answers.sql_for(question) for question in questions]
+    if endpoint == "title_info":
+        status, payload = client.post_json("/api/execute", {"query": TITLE_SAMPLE_SQL, "limit": 200})
+        if status != 200 or payload.get("status") != "success" or not payload["results"]:
+            raise RuntimeError(f"Could not sample title ids: {payload}")
+        return title_info_request, [row["title_id"] for row in payload["results"]]
+    raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+def run_endpoint(base_url, func, inputs, requests, concurrency, warmup=0, timeout=120):
+    """Send requests (after warmup unmeasured ones) from concurrency threads; returns the summary"""
+    for i in range(warmup):
+        client = Client(base_url, timeout)
+        try:
+            func(client, inputs[i % len(inputs)])
+        finally:
+            client.close()
+
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+
+    def worker():
+        client = Client(base_url, timeout)
+        try:
+            while True:
+                with lock:
+                    i = next(counter)
+                if i >= requests:
+                    return
+                started = time.perf_counter()
+                try:
+                    ok = func(client, inputs[i % len(inputs)])
+                except Exception:
+                    client.close()
+                    ok = False
+                elapsed = time.perf_counter() - started
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        errors[0] += 1
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, name=f"bench-{n}") for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def database_metadata(path):
+    """Row counts of the benchmark database, so runs on different sizes are not compared by mistake"""
+    if not path:
+        return None
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        counts = {}
+        for table in ("titles", "people", "crew", "ratings"):
+            try:
+                counts[table] = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0]
+            except sqlite3.Error:
+                counts[table] = None
+        return {"path": os.path.abspath(path), "rows": counts}
+    finally:
+        conn.close()
+
+
+class InProcessApp:
+    """The Flask app served on a local port against the benchmark database and fake LLM"""
+
+    def __init__(self, db_path, llm_base_url, cache=False, settings=None):
+        from app.settings import get_setting, override_settings
+        overrides = {
+            "DATABASE_PATH": os.path.abspath(db_path),
+            "OPENAI_BASE_URL": llm_base_url,
+            "DB_WARMUP_ON_START": False,
+            "LOG_TO_CONSOLE": False,
+        }
+        if not cache:
+            overrides.update(NL_CACHE_ENABLED=False, RESULT_CACHE_ENABLED=False)
+        overrides.update(settings or {})
+        for name, default in (("AZURE_OPENAI_API_KEY", "bench"), ("AZURE_OPENAI_API_VERSION", "2025-01-01-preview"),
+                              ("AZURE_OPENAI_ENDPOINT", llm_base_url), ("AZURE_OPENAI_MODEL", "bench")):
+            if get_setting(name) is None:
+                overrides[name] = default
+        override_settings(**overrides)
+
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+        from werkzeug.serving import make_server
+        from app import create_app
+        self.server = make_server("127.0.0.1", 0, create_app(warmup=False), threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="bench-app", daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def format_table(endpoints):
+    header = f"{'endpoint':<12}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'max ms':>10}{'req/s':>9}"
+    lines = [header, "-" * len(header)]
+    for name, s in endpoints.items():
+        cells = [s[key] if s[key] is not None else float("nan") for key in ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "max_ms")]
+        lines.append(f"{name:<12}{s['requests']:>9}{s['errors']:>8}" + "".join(f"{c:>10.1f}" for c in cells) + f"{s['throughput_rps']:>9.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the search, chat, execute and title info endpoints")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running server (configured with OPENAI_BASE_URL)")
+    target.add_argument("--serve", action="store_true", help="Serve the app in-process with the fake LLM")
+    parser.add_argument("--db", help="Database for --serve (see bench.synthetic_db)")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"Comma separated subset of {', '.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per endpoint first")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Fake LLM delay per completion (--serve)")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random +/- spread of the fake LLM delay")
+    parser.add_argument("--cache", action="store_true", help="Keep the question and result caches on (--serve)")
+    parser.add_argument("--corpus", help="Benchmark corpus JSON (default: bench/corpus.json)")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds before a request counts as failed")
+    parser.add_argument("--label", help="Name stored with the results (e.g. a branch)")
+    parser.add_argument("--out", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    if args.serve and not args.db:
+        parser.error("--serve needs --db")
+
+    corpus = load_corpus(args.corpus)
+    fake_llm = app_server = None
+    if args.serve:
+        from .fake_openai import FakeOpenAIServer
+        fake_llm = FakeOpenAIServer(corpus=corpus, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+        app_server = InProcessApp(args.db, fake_llm.base_url, cache=args.cache).start()
+        base_url = app_server.base_url
+    else:
+        base_url = args.url.rstrip("/")
+
+    results = {
+        "metadata": {
+            "label": args.label,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "target": "in-process" if args.serve else base_url,
+            "database": database_metadata(args.db),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "llm_latency_ms": args.latency_ms if args.serve else None,
+            "llm_jitter_ms": args.jitter_ms if args.serve else None,
+            "cache": args.cache if args.serve else None,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "endpoints": {},
+    }
+    try:
+        setup_client = Client(base_url, args.timeout)
+        for endpoint in endpoints:
+            func, inputs = endpoint_workload(endpoint, corpus, setup_client)
+            print(f"Benchmarking {endpoint}: {args.requests} requests, {args.concurrency} threads...", flush=True)
+            results["endpoints"][endpoint] = run_endpoint(
+                base_url, func, inputs, args.requests, args.concurrency, args.warmup, args.timeout)
+        setup_client.close()
+    finally:
+        if app_server:
+            app_server.stop()
+        if fake_llm:
+            fake_llm.stop()
+
+    print(format_table(results["endpoints"]))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import argparse
+import bisect
+import itertools
+import logging
+import math
+import os
+import random
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+# Table sizes relative to crew rows, following the imported IMDb data
+# (29M crew, 9M people, 5M titles, 3M akas and episodes, 850k ratings)
+PEOPLE_PER_CREW_ROW = 0.31
+TITLES_PER_CREW_ROW = 0.17
+AKAS_PER_TITLE = 0.6
+RATED_SHARE = 0.17
+
+TITLE_TYPES = {
+    "tvEpisode": 0.55, "short": 0.12, "movie": 0.10, "video": 0.05, "tvSeries": 0.04, "tvMovie": 0.03,
+    "tvMiniSeries": 0.03, "tvSpecial": 0.03, "videoGame": 0.03, "tvShort": 0.02,
+}
+CATEGORIES = {
+    "actor": 0.28, "actress": 0.20, "self": 0.12, "writer": 0.11, "director": 0.08, "producer": 0.09,
+    "composer": 0.04, "cinematographer": 0.03, "editor": 0.03, "production_designer": 0.01, "archive_footage": 0.01,
+}
+GENRES = [
+    "Action", "Adult", "Adventure", "Animation", "Biography", "Comedy", "Crime", "Documentary", "Drama",
+    "Family", "Fantasy", "Film-Noir", "Game-Show", "History", "Horror", "Music", "Musical", "Mystery", "News",
+    "Reality-TV", "Romance", "Sci-Fi", "Short", "Sport", "Talk-Show", "Thriller", "War", "Western",
+]
+REGIONS = ["US", "GB", "FR", "DE", "ES", "IT", "JP", "IN", "BR", "CA"]
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth", "David",
+    "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Daniel", "Nancy",
+    "Matthew", "Lisa", "Anthony", "Betty", "Mark", "Margaret", "Paul", "Sandra", "Steven", "Ashley", "Andrew",
+    "Emily", "Kenneth", "Donna", "Joshua", "Michelle", "Kevin", "Carol", "Brian", "Amanda", "George", "Melissa",
+    "Akira", "Yuki", "Raj", "Priya", "Carlos", "Lucia", "Pierre", "Amelie", "Hans", "Greta", "Marco", "Giulia",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Taylor", "Moore", "Jackson", "Martin", "Lee",
+    "Thompson", "White", "Harris", "Clark", "Lewis", "Robinson", "Walker", "Young", "Allen", "King", "Wright",
+    "Scott", "Hill", "Green", "Adams", "Baker", "Nelson", "Carter", "Mitchell", "Roberts", "O'Connor", "O'Neil",
+    "Tanaka", "Sato", "Sharma", "Patel", "Silva", "Rossi", "Dubois", "Muller", "Kowalski", "Novak", "Jensen",
+]
+TITLE_WORDS = [
+    "Night", "Love", "Last", "Dark", "City", "Man", "Woman", "Life", "Time", "Home", "World", "Day", "Story",
+    "Dead", "Girl", "Boy", "Blood", "House", "Black", "Red", "Secret", "Lost", "Little", "Big", "Return", "King",
+    "Queen", "War", "Road", "River", "Summer", "Winter", "Star", "Dream", "Shadow", "Fire", "Ice", "Heart",
+    "Ghost", "Island", "Journey", "Legend", "Game", "Family", "Murder", "Empire", "Angel", "Devil", "Wild",
+]
+
+# People the benchmark corpus asks about, given full careers so its questions return rows
+FEATURED_PEOPLE = {
+    "Tom Hanks": "actor", "Christopher Nolan": "director", "Leonardo DiCaprio": "actor", "Kate Winslet": "actress",
+    "Jim Carrey": "actor", "Steven Spielberg": "director", "Meryl Streep": "actress", "Conan O'Brien": "self",
+    "Harrison Ford": "actor", "Al Pacino": "actor", "Robert De Niro": "actor", "Quentin Tarantino": "director",
+}
+FEATURED_CREDITS = 60
+# Pairs the corpus asks "worked together" questions about get the same filmography
+SHARED_CAREERS = {"Kate Winslet": "Leonardo DiCaprio", "Robert De Niro": "Al Pacino"}
+FEATURED_TITLES = ["The Godfather", "The Godfather Part II", "The Godfather Part III", "Titanic", "Inception"]
+
+# Indexes created by imdb-sqlite, which the prompts and the warm-up rely on
+INDEXES = {
+    "ix_people_name": "people (name)",
+    "ix_titles_type": "titles (type)",
+    "ix_titles_primary_title": "titles (primary_title)",
+    "ix_titles_original_title": "titles (original_title)",
+    "ix_akas_title_id": "akas (title_id)",
+    "ix_akas_title": "akas (title)",
+    "ix_crew_title_id": "crew (title_id)",
+    "ix_crew_person_id": "crew (person_id)",
+    "ix_crew_category": "crew (category)",
+    "ix_episodes_show_title_id": "episodes (show_title_id)",
+}
+
+SCHEMA = """
+CREATE TABLE people (person_id VARCHAR PRIMARY KEY, name VARCHAR, born INTEGER, died INTEGER);
+CREATE TABLE titles (title_id VARCHAR PRIMARY KEY, type VARCHAR, primary_title VARCHAR, original_title VARCHAR,
+                     is_adult INTEGER, premiered INTEGER, ended INTEGER, runtime_minutes INTEGER, genres VARCHAR);
+CREATE TABLE akas (title_id VARCHAR, title VARCHAR, region VARCHAR, language VARCHAR, types VARCHAR,
+                   attributes VARCHAR, is_original_title INTEGER);
+CREATE TABLE crew (title_id VARCHAR, person_id VARCHAR, category VARCHAR, job VARCHAR, characters VARCHAR);
+CREATE TABLE episodes (episode_title_id VARCHAR PRIMARY KEY, show_title_id VARCHAR, season_number INTEGER,
+                       episode_number INTEGER);
+CREATE TABLE ratings (title_id VARCHAR PRIMARY KEY, rating REAL, votes INTEGER);
+"""
+
+
+def person_id(index):
+    return f"nm{index + 1:07d}"
+
+
+def title_id(index):
+    return f"tt{index + 1:07d}"
+
+
+class SyntheticImdb:
+    """
+    Deterministic generator for an IMDb-shaped database scaled from a crew row count.
+    Every table is written from a generator straight into executemany, so memory stays
+    flat from 1M to 100M crew rows.
+    """
+
+    def __init__(self, crew_rows, seed=1):
+        self.crew_rows = crew_rows
+        self.seed = seed
+        self.people = max(len(FEATURED_PEOPLE) + 100, int(crew_rows * PEOPLE_PER_CREW_ROW))
+        self.titles = max(len(FEATURED_TITLES) + 100, int(crew_rows * TITLES_PER_CREW_ROW))
+        self._types = list(TITLE_TYPES)
+        self._type_bounds = list(itertools.accumulate(TITLE_TYPES.values()))
+        self._categories = list(CATEGORIES)
+        self._category_weights = list(CATEGORIES.values())
+
+    def _rng(self, table):
+        return random.Random(f"{self.seed}:{table}")
+
+    def title_type(self, index):
+        """Type of a title, derived from its index alone (a multiplicative hash) so every table agrees on it"""
+        if index < len(FEATURED_TITLES):
+            return "movie"
+        share = ((index + self.seed * 7919) * 2654435761 % 2 ** 32) / 2 ** 32 * self._type_bounds[-1]
+        return self._types[min(bisect.bisect_right(self._type_bounds, share), len(self._types) - 1)]
+
+    def people_rows(self):
+        rng = self._rng("people")
+        featured = list(FEATURED_PEOPLE)
+        for index in range(self.people):
+            name = featured[index] if index < len(featured) else f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            born = rng.randint(1880, 2010) if rng.random() < 0.4 else None
+            died = born + rng.randint(30, 95) if born and born < 1950 and rng.random() < 0.5 else None
+            yield person_id(index), name, born, died
+
+    def title_rows(self):
+        rng = self._rng("titles")
+        for index in range(self.titles):
+            title_type = self.title_type(index)
+            if index < len(FEATURED_TITLES):
+                primary = FEATURED_TITLES[index]
+            else:
+                primary = " ".join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(1, 4)))
+            original = primary if rng.random() < 0.85 else f"{primary} ({rng.choice(REGIONS)})"
+            premiered = rng.randint(1920, 2025) if rng.random() < 0.9 else None
+            ended = premiered + rng.randint(1, 10) if premiered and title_type == "tvSeries" and rng.random() < 0.5 else None
+            runtime = rng.randint(5, 30) if "short" in title_type.lower() else rng.randint(20, 200)
+            genres = ",".join(sorted(rng.sample(GENRES, rng.randint(1, 3))))
+            yield title_id(index), title_type, primary, original, int(rng.random() < 0.01), premiered, ended, runtime, genres
+
+    def aka_rows(self):
+        rng = self._rng("akas")
+        for _ in range(int(self.titles * AKAS_PER_TITLE)):
+            index = rng.randrange(self.titles)
+            region = rng.choice(REGIONS)
+            title = " ".join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(1, 4)))
+            yield title_id(index), title, region, None, None, None, 0
+
+    def crew_rows_iter(self):
+        """Crew rows spread over titles, with a heavy tail of prolific people"""
+        rng = self._rng("crew")
+        per_title = self.crew_rows / self.titles
+        featured = len(FEATURED_PEOPLE)
+        written = 0
+        index = 0
+        while written < self.crew_rows - featured * FEATURED_CREDITS:
+            for _ in range(max(1, int(rng.expovariate(1 / per_title)))):
+                person = featured + int((self.people - featured) * rng.random() ** 3)
+                category = rng.choices(self._categories, self._category_weights)[0]
+                yield title_id(index % self.titles), person_id(person), category, None, None
+                written += 1
+            index += 1
+
+        # Featured careers are movies
+        for position, (name, category) in enumerate(FEATURED_PEOPLE.items()):
+            career = random.Random(f"{self.seed}:career:{SHARED_CAREERS.get(name, name)}")
+            credited = 0
+            while credited < FEATURED_CREDITS:
+                index = career.randrange(self.titles)
+                if self.title_type(index) in ("movie", "tvMovie"):
+                    yield title_id(index), person_id(position), category, None, None
+                    credited += 1
+
+    def episode_rows(self):
+        rng = self._rng("episodes")
+        shows = [index for index in range(min(self.titles, 200000)) if self.title_type(index) == "tvSeries"] or [0]
+        for index in range(self.titles):
+            if self.title_type(index) == "tvEpisode":
+                yield title_id(index), title_id(rng.choice(shows)), rng.randint(1, 15), rng.randint(1, 24)
+
+    def rating_rows(self):
+        rng = self._rng("ratings")
+        for index in range(self.titles):
+            if index < len(FEATURED_TITLES) or rng.random() < RATED_SHARE:
+                rating = round(min(10.0, max(1.0, rng.gauss(6.6, 1.3))), 1)
+                votes = max(5, min(3000000, int(math.exp(rng.gauss(5.0, 2.0)))))
+                yield title_id(index), rating, votes
+
+
+def build(path, crew_rows, seed=1, analyze=False):
+    """Write a synthetic IMDb database to `path` (which must not exist)"""
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    generator = SyntheticImdb(crew_rows, seed)
+    conn = sqlite3.connect(path)
+    try:
+        # Bulk load settings: the file is discarded if generation fails anyway
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")
+        conn.executescript(SCHEMA)
+        steps = [
+            ("people", "INSERT INTO people VALUES (?, ?, ?, ?)", generator.people_rows),
+            ("titles", "INSERT INTO titles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", generator.title_rows),
+            ("akas", "INSERT INTO akas VALUES (?, ?, ?, ?, ?, ?, ?)", generator.aka_rows),
+            ("crew", "INSERT INTO crew VALUES (?, ?, ?, ?, ?)", generator.crew_rows_iter),
+            ("episodes", "INSERT INTO episodes VALUES (?, ?, ?, ?)", generator.episode_rows),
+            ("ratings", "INSERT INTO ratings VALUES (?, ?, ?)", generator.rating_rows),
+        ]
+        for table, insert_sql, rows in steps:
+            start = time.perf_counter()
+            conn.executemany(insert_sql, rows())
+            conn.commit()
+            count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            logger.info(f"Wrote {count:,} {table} rows in {time.perf_counter() - start:.1f}s")
+        for index_name, target in INDEXES.items():
+            start = time.perf_counter()
+            conn.execute(f"CREATE INDEX {index_name} ON {target}")
+            conn.commit()
+            logger.info(f"Created {index_name} in {time.perf_counter() - start:.1f}s")
+        if analyze:
+            conn.execute("ANALYZE")
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def parse_size(value):
+    """Row counts such as 1000000, 1M or 100m"""
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    suffix = value[-1:].lower()
+    if suffix in multipliers:
+        return int(float(value[:-1]) * multipliers[suffix])
+    return int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.synthetic_db",
+        description="Generate a synthetic IMDb database with the schema of app.prompts.SCHEMA_TABLES for benchmarks.",
+    )
+    parser.add_argument("--crew-rows", type=parse_size, default=1_000_000, help="crew rows, e.g. 1M to 100M (default 1M)")
+    parser.add_argument("--out", required=True, help="database file to create")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--analyze", action="store_true", help="run ANALYZE so the cost guard sees real statistics")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s : %(message)s')
+    start = time.perf_counter()
+    build(args.out, args.crew_rows, args.seed, args.analyze)
+    logger.info(f"Built {args.out} ({os.path.getsize(args.out) / 1e9:.2f} GB) in {time.perf_counter() - start:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
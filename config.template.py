@@ -6,9 +6,18 @@ AZURE_OPENAI_API_KEY = "your_azure_openai_api_key_here"
 AZURE_OPENAI_API_VERSION = "2025-01-01-preview"  # Or latest available version
 AZURE_OPENAI_ENDPOINT = "https://your-resource-name.openai.azure.com/"
 AZURE_OPENAI_MODEL = "gpt-4.1"  # Or your deployed model name
+OPENAI_BASE_URL = None  # Optional OpenAI-compatible server used instead of Azure (e.g. "http://127.0.0.1:8001/v1")
 
 # Database Configuration
 DATABASE_PATH = "db/imdb.db"
+DB_POOL_SIZE = 4  # Read-only connections kept open and reused across requests
+DB_POOL_TIMEOUT = 10  # Seconds to wait for a free connection before failing
+DB_IMMUTABLE = True  # Open with immutable=1 (restart the app after refreshing the database)
+DB_CACHE_SIZE_KB = 262144  # SQLite page cache per connection
+DB_MMAP_SIZE = 2147418112  # Memory-mapped I/O window in bytes, capped by SQLite at ~2GB by default (0 disables mmap)
+DB_WARMUP_ON_START = False  # Pre-touch the hot index pages in the background at startup
+DB_WARMUP_INDEXES = ["ix_people_name", "ix_crew_category", "ix_titles_type"]
+DB_STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per pooled connection (generated SQL uses bind parameters)
 
 # Application Settings
 DEBUG = False
@@ -16,14 +25,92 @@ SECRET_KEY = "your-secret-key-here-change-this-in-production"
 HOST = "0.0.0.0"
 PORT = 5000
 
-# Logging Configuration
-LOG_LEVEL = "INFO"
-LOG_FILE = "app.log"
+# Production Server (gunicorn -c gunicorn.conf.py wsgi:app)
+WEB_WORKERS = None  # Worker processes; None uses one per CPU core
+WEB_THREADS = 8  # Request threads per worker
+WEB_TIMEOUT = 120  # Seconds before an unresponsive worker is restarted
+WEB_GRACEFUL_TIMEOUT = 30  # Seconds in-flight requests get to finish on shutdown or reload
+WEB_KEEPALIVE = 5  # Seconds an idle client connection is kept open
+WEB_ACCESS_LOG = "-"  # Access log file, "-" for stdout or None to disable
+
+# Logging Configuration (records are queued and written by a background thread)
+LOG_LEVEL = "INFO"  # DEBUG also logs every request body, header set and tool argument
+LOG_FILE = "app.log"  # Rotating log file, relative to the project root (None for console only)
+LOG_MAX_BYTES = 52428800  # Rotate beyond this size (50MB); not used under gunicorn, where workers share LOG_FILE and an external rotator (logrotate) moves it
+LOG_BACKUP_COUNT = 5  # Rotated files kept
+LOG_FORMAT = "text"  # "text", or "json" for one JSON object per line with the request id
+LOG_TO_CONSOLE = True
+LOG_QUEUE_SIZE = 10000  # Records waiting to be written; further records are dropped instead of blocking requests
+LOG_PAYLOAD_SAMPLE_RATE = 0.01  # Share of verbose payload logs (bodies, headers, tool arguments, sample rows) kept at INFO
 
 # Performance Settings
 MAX_QUERY_LENGTH = 500
-DEFAULT_RESULT_LIMIT = 50
-QUERY_TIMEOUT = 30
+DEFAULT_RESULT_LIMIT = 50  # Rows per page for the API and chat (pass page_token for more)
+MAX_RESULT_LIMIT = 1000  # Hard row budget for any single result page
+QUERY_TIMEOUT = 30  # Seconds of SQLite execution a SQL statement may use before it is interrupted
+
+# Query Cost Guard (checks the plan of generated SQL before running it)
+COST_GUARD_ENABLED = True
+QUERY_COST_LIMIT = 100000000  # Estimated row visits above which a query is capped or rejected
+COST_GUARD_ACTION = "limit"  # "limit" caps streaming plans at the rows a page needs; "reject" always refuses
+
+# LLM Client (one client per process, shared keep-alive connection pool)
+LLM_MAX_CONNECTIONS = 20  # Upper bound on concurrent connections to the OpenAI endpoint
+LLM_MAX_KEEPALIVE_CONNECTIONS = 10  # Idle connections kept open for reuse
+LLM_KEEPALIVE_EXPIRY = 60  # Seconds an idle connection is kept before closing
+LLM_CONNECT_TIMEOUT = 5  # Seconds to establish a connection (capped at QUERY_TIMEOUT)
+LLM_TIMEOUT = QUERY_TIMEOUT  # Read/write timeout per request
+LLM_MAX_RETRIES = 3  # Retries for 429s and transient errors, with exponential backoff
+
+# Chat Tool Calls (independent tool calls in one turn run concurrently)
+TOOL_CALL_WORKERS = 8  # Threads shared by all requests for running tool calls
+DB_MAX_CONCURRENCY = DB_POOL_SIZE  # Queries run at once by tool calls; others wait for a slot
+LLM_MAX_CONCURRENCY = LLM_MAX_CONNECTIONS  # Completions in flight at once across the process
+
+# NL-to-SQL Cache (skips the LLM for questions that already produced working SQL)
+NL_CACHE_ENABLED = True
+NL_CACHE_SIZE = 1000  # Questions kept before least recently used ones are evicted
+NL_CACHE_TTL = 86400  # Seconds a cached question stays valid
+NL_CACHE_SIMILARITY_ENABLED = True  # Also match near-duplicate phrasings
+NL_CACHE_SIMILARITY_THRESHOLD = 0.9  # Shingle similarity (0-1) required for a near-duplicate hit
+
+# Fast Path (answers common question shapes from SQL templates without the LLM)
+FAST_PATH_ENABLED = True
+FAST_PATH_MIN_CONFIDENCE = 0.8  # Questions the router is less sure about (0-1) go to the LLM
+
+# Prompt Assembly (only the schema tables and examples relevant to each question are sent)
+PROMPT_DYNAMIC_ENABLED = True  # False sends every table, example and chat section on every call
+PROMPT_MAX_EXAMPLES = 3  # Few-shot SQL examples per question at most
+PROMPT_CACHE_KEY = None  # Sent as prompt_cache_key so requests sharing the fixed prompt prefix hit the same provider cache
+
+# Tool Results (the model answers from a digest; the client still gets every row)
+TOOL_RESULT_DIGEST_ENABLED = True  # False sends full result sets back to the model
+TOOL_RESULT_TOP_ROWS = 10  # Rows included verbatim; larger results add column statistics and a year histogram
+TOOL_RESULT_MAX_VALUE_CHARS = 200  # Longer text values are cut in the digest
+
+# Charts (aggregation runs in SQLite, or with numpy when installed; long series are downsampled)
+CHART_MAX_POINTS = 200  # Series longer than this are cut down with LTTB, keeping peaks and troughs
+
+# Index Advisor (records query plans; see `python -m app.index_advisor report`)
+INDEX_ADVISOR_ENABLED = True
+QUERY_PLAN_LOG = "logs/query_plans.jsonl"  # One JSON line per sampled query with its plan and flagged scans
+QUERY_PLAN_SAMPLE_RATE = 0.1  # Share of executed queries whose plan is logged
+QUERY_PLAN_LOG_MAX_BYTES = 52428800  # Rotated to .1 beyond this size (50MB); under gunicorn rotate externally
+INDEX_ADVISOR_LARGE_TABLES = ["crew", "titles", "akas", "people", "episodes", "ratings"]  # Full scans of these are flagged
+
+# Slow Query Log (latency histograms for every stage are served at /metrics)
+SLOW_QUERY_THRESHOLD_MS = 1000  # Queries at least this slow are logged with their plan (None disables)
+SLOW_QUERY_LOG = "logs/slow_queries.jsonl"  # One JSON line per slow query, tagged with its request id
+SLOW_QUERY_LOG_MAX_BYTES = 10485760  # Rotated to .1 beyond this size (10MB); under gunicorn rotate externally
+SLOW_QUERY_TOP_N = 20  # Slowest queries kept in memory for /api/slow_queries
+JSONL_LOG_QUEUE_SIZE = 1000  # Plan and slow-query log entries waiting for their writer thread; more are dropped
+
+# Query Result Cache (invalidated automatically when the database file changes)
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_MAX_BYTES = 67108864  # In-memory budget (64MB), least recently used pages evicted first
+RESULT_CACHE_MAX_ENTRY_BYTES = 4194304  # Larger result pages are not cached
+RESULT_CACHE_SPILL_PATH = None  # e.g. "cache/results.db" to keep results on disk across restarts
+RESULT_CACHE_SPILL_MAX_BYTES = 536870912  # On-disk budget (512MB)
 
 # Security Settings
 RATE_LIMIT_PER_MINUTE = 60
@@ -0,0 +1,52 @@
+# Gunicorn configuration for production serving: gunicorn -c gunicorn.conf.py wsgi:app
+# Values come from config.py (see the Production Server block in config.template.py).
+import multiprocessing
+
+from app.settings import get_setting
+
+bind = f"{get_setting('HOST', '0.0.0.0')}:{get_setting('PORT', 5000)}"
+
+# Separate worker processes so SQLite reads and JSON encoding scale across cores, with
+# threads in each worker so a slow LLM call only occupies one thread
+workers = get_setting('WEB_WORKERS') or multiprocessing.cpu_count()
+threads = get_setting('WEB_THREADS', 8)
+worker_class = "gthread"
+
+# Workers silent for longer than this are restarted; SIGTERM gives in-flight requests
+# graceful_timeout seconds to finish
+timeout = get_setting('WEB_TIMEOUT', 120)
+graceful_timeout = get_setting('WEB_GRACEFUL_TIMEOUT', 30)
+keepalive = get_setting('WEB_KEEPALIVE', 5)
+
+# Each worker imports the app itself after the fork, so no connection, socket or
+# thread is ever shared between processes
+preload_app = False
+
+accesslog = get_setting('WEB_ACCESS_LOG', '-')
+loglevel = get_setting('LOG_LEVEL', 'INFO').lower()
+
+
+def on_starting(server):
+    """Pull the hot indexes into the OS page cache once, before any worker is forked"""
+    if not get_setting('DB_WARMUP_ON_START', False):
+        return
+    from app.db import warm_up_indexes, close_pool
+    try:
+        timings = warm_up_indexes()
+        server.log.info(f"Warmed {len(timings)} indexes in {sum(timings.values()):.2f}s before forking")
+    except Exception as e:
+        server.log.error(f"Database warm-up failed: {str(e)}")
+    finally:
+        close_pool()
+
+
+def worker_exit(server, worker):
+    """Finish running tool calls and close pooled connections as a worker shuts down"""
+    from app.concurrency import shutdown_tool_executor
+    from app.db import close_pool
+    from app.llm import close_llm_client
+    from app.logging_config import stop_logging
+    shutdown_tool_executor(wait=True)
+    close_llm_client()
+    close_pool()
+    stop_logging()
@@ -0,0 +1,132 @@
+import random
+import sqlite3
+
+import pytest
+
+from app import charts
+from app.charts import (aggregate_time_series, chart_from_result, histogram_counts, histogram_from_bins,
+                        histogram_sql, lttb_indices, numeric_column, time_series_sql)
+
+random.seed(7)
+ROWS = [{"year": random.choice([1994, 1995, 2001, 2010, None, "\\N"]),
+         "rating": random.choice([None, round(random.uniform(1, 10), 1)]),
+         "num_votes": random.randint(0, 500),
+         "genres": random.choice(["Drama", "Comedy,Drama", "Action", None])}
+        for _ in range(300)]
+
+
+@pytest.fixture(params=["python", "numpy"])
+def engine(request, monkeypatch):
+    """Run a test with the plain Python binning and again with numpy (when installed)"""
+    if request.param == "numpy":
+        monkeypatch.setattr(charts, "np", pytest.importorskip("numpy"))
+    else:
+        monkeypatch.setattr(charts, "np", None)
+    return request.param
+
+
+def both_engines(monkeypatch, func):
+    numpy = pytest.importorskip("numpy")
+    monkeypatch.setattr(charts, "np", None)
+    python_result = func()
+    monkeypatch.setattr(charts, "np", numpy)
+    return python_result, func()
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"bucket": "decade"},
+    {"weight_column": "num_votes"},
+    {"series_column": "genres"},
+    {"bucket": "decade", "weight_column": "num_votes", "series_column": "genres"},
+])
+def test_time_series_engines_agree(monkeypatch, kwargs):
+    python_result, numpy_result = both_engines(monkeypatch, lambda: aggregate_time_series(ROWS, "year", **kwargs))
+    assert python_result == numpy_result
+    assert python_result[0] == ([1990, 2000, 2010] if kwargs.get("bucket") == "decade" else [1994, 1995, 2001, 2010])
+
+
+@pytest.mark.parametrize("rows", [[], [{"year": None}], [{"year": 2001}]])
+def test_time_series_edge_cases_agree(monkeypatch, rows):
+    python_result, numpy_result = both_engines(monkeypatch, lambda: aggregate_time_series(rows, "year"))
+    assert python_result == numpy_result
+
+
+@pytest.mark.parametrize("values", [[], [None], [4.0], [4.0, 4.0], [1.0, 2.5, 10.0, None, 7.0]])
+def test_histogram_engines_agree(monkeypatch, values):
+    rows = [{"rating": value} for value in values]
+    python_result, numpy_result = both_engines(monkeypatch, lambda: histogram_counts(numeric_column(rows, "rating"), 10))
+    assert python_result == numpy_result
+
+
+def test_histogram_counts_every_value(engine):
+    labels, counts = histogram_counts(numeric_column(ROWS, "rating"), 10)
+    assert len(labels) == len(counts) == 10
+    assert sum(counts) == sum(1 for row in ROWS if row["rating"] is not None)
+
+
+def test_histogram_sql_matches_in_memory_bins(engine):
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE ratings (rating REAL)")
+    conn.executemany("INSERT INTO ratings VALUES (?)", [(row["rating"],) for row in ROWS])
+    rows = [dict(row) for row in conn.execute(histogram_sql("SELECT rating FROM ratings;", "rating", 10))]
+    assert histogram_from_bins(rows, 10) == histogram_counts(numeric_column(ROWS, "rating"), 10)
+
+
+@pytest.mark.parametrize("n, threshold", [(0, 10), (1, 10), (2, 10), (9, 10), (10, 10), (50, 2)])
+def test_lttb_keeps_short_series(engine, n, threshold):
+    assert lttb_indices(list(range(n)), [float(i % 3) for i in range(n)], threshold) == list(range(n))
+
+
+def test_lttb_keeps_endpoints_and_peaks(engine):
+    xs = list(range(1000))
+    ys = [0.0] * 1000
+    ys[123], ys[777] = 50.0, -50.0
+    indices = lttb_indices(xs, ys, 20)
+    assert len(indices) == 20
+    assert indices[0] == 0 and indices[-1] == 999
+    assert indices == sorted(set(indices))
+    assert 123 in indices and 777 in indices
+
+
+def test_lttb_engines_agree(monkeypatch):
+    xs = list(range(500))
+    ys = [random.uniform(0, 100) for _ in xs]
+    python_result, numpy_result = both_engines(monkeypatch, lambda: lttb_indices(xs, ys, 40))
+    assert python_result == numpy_result
+
+
+def result(has_more):
+    return {"results": ROWS[:50], "column_names": list(ROWS[0]), "has_more": has_more,
+            "sql_query": "SELECT year, rating, num_votes, genres FROM titles", "params": {"x": 1}}
+
+
+def test_truncated_results_are_aggregated_in_sql(engine):
+    calls = []
+
+    def run_query(sql_query, params):
+        calls.append((sql_query, params))
+        return [{"x": 1990, "series": None, "total": 7}, {"x": 2000, "series": None, "total": 5}]
+
+    chart = chart_from_result(result(True), "bar", "Titles", bucket="decade", run_query=run_query)
+    assert calls == [(time_series_sql(result(True)["sql_query"], "year", "decade"), {"x": 1})]
+    assert chart["chart_data"]["data"]["labels"] == ["1990s", "2000s"]
+    assert chart["chart_data"]["data"]["datasets"][0]["data"] == [7, 5]
+
+
+def test_complete_results_are_binned_in_memory(engine):
+    def run_query(sql_query, params):
+        raise AssertionError("complete results need no SQL aggregation")
+
+    chart = chart_from_result(result(False), "bar", "Titles", run_query=run_query)
+    assert chart["success"]
+
+
+def test_failed_pushdown_falls_back_to_fetched_rows(engine):
+    def run_query(sql_query, params):
+        raise sqlite3.OperationalError("no such column")
+
+    pushed = chart_from_result(result(True), "histogram", "Ratings", run_query=run_query)
+    local = chart_from_result(result(False), "histogram", "Ratings")
+    assert pushed["chart_data"]["data"] == local["chart_data"]["data"]
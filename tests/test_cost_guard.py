@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+
+import pytest
+
+from app import cost_guard
+from app.cost_guard import QueryCostError, estimate_query_cost, guard_query
+
+STATS = {
+    "table_rows": {"people": 1_000_000, "titles": 2_000_000, "crew": 10_000_000},
+    "index_stats": {"ix_people_name": [1_000_000, 2], "ix_crew_person": [10_000_000, 5]},
+}
+
+CROSS_JOIN_SQL = "SELECT p.name, t.primary_title FROM people p, titles t"
+CROSS_JOIN_PLAN = [(2, 0, "SCAN p"), (3, 0, "SCAN t")]
+
+
+@pytest.fixture
+def canned_plan(monkeypatch):
+    """Make EXPLAIN QUERY PLAN return the given rows"""
+    def use(plan):
+        monkeypatch.setattr(cost_guard, "explain_query_plan", lambda conn, sql_query, params=(): plan)
+    return use
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    def use(**values):
+        monkeypatch.setattr(cost_guard, "get_setting", lambda name, default=None: values.get(name, default))
+    monkeypatch.setattr(cost_guard, "table_statistics", lambda conn, db_path: STATS)
+    use()
+    return use
+
+
+class CannedPool:
+    db_path = "canned.db"
+
+    @contextmanager
+    def connection(self):
+        yield None
+
+
+def test_index_lookup_uses_rows_per_key(canned_plan):
+    canned_plan([(3, 0, "SEARCH p USING INDEX ix_people_name (name=?)"),
+                 (5, 0, "SEARCH c USING INDEX ix_crew_person (person_id=?)")])
+    estimate = estimate_query_cost(
+        None, "SELECT c.title_id FROM people p JOIN crew c ON c.person_id = p.person_id WHERE p.name = 'X'", STATS)
+    assert estimate.cost == 2 + 2 * 5
+    assert estimate.rows == 10
+    assert not estimate.blocking
+
+
+def test_primary_key_lookups_cost_one_row(canned_plan):
+    canned_plan([(2, 0, "SEARCH t USING INTEGER PRIMARY KEY (rowid=?)")])
+    assert estimate_query_cost(None, "SELECT * FROM titles t WHERE t.rowid = 1", STATS).cost == 1
+    canned_plan([(2, 0, "SEARCH t USING INDEX sqlite_autoindex_titles_1 (title_id=?)")])
+    assert estimate_query_cost(None, "SELECT * FROM titles t WHERE t.title_id = 'tt1'", STATS).cost == 1
+
+
+def test_nested_full_scans_multiply(canned_plan):
+    canned_plan(CROSS_JOIN_PLAN)
+    estimate = estimate_query_cost(None, CROSS_JOIN_SQL, STATS)
+    assert estimate.cost == 1_000_000 + 1_000_000 * 2_000_000
+    assert "SCAN t" in estimate.explain(limit=1)
+
+
+def test_unindexed_filters_keep_a_quarter_each(canned_plan):
+    canned_plan([(2, 0, "SCAN t")])
+    estimate = estimate_query_cost(
+        None, "SELECT * FROM titles t WHERE t.premiered > 2000 AND t.type = 'movie'", STATS)
+    assert estimate.cost == 2_000_000
+    assert estimate.rows == 2_000_000 / 16
+
+
+def test_sorting_and_aggregation_block_streaming(canned_plan):
+    canned_plan([(2, 0, "SCAN t"), (9, 0, "USE TEMP B-TREE FOR ORDER BY")])
+    assert estimate_query_cost(None, "SELECT * FROM titles t ORDER BY t.premiered", STATS).blocking
+    canned_plan([(2, 0, "SCAN t")])
+    assert estimate_query_cost(None, "SELECT COUNT(*) FROM titles t", STATS).blocking
+
+
+def test_guard_allows_cheap_queries(canned_plan, settings):
+    canned_plan([(3, 0, "SEARCH p USING INDEX ix_people_name (name=?)")])
+    assert guard_query("SELECT * FROM people p WHERE p.name = 'X'", 51, pool=CannedPool()) == \
+        (None, [(3, 0, "SEARCH p USING INDEX ix_people_name (name=?)")])
+
+
+def test_guard_caps_expensive_streaming_queries(canned_plan, settings):
+    canned_plan(CROSS_JOIN_PLAN)
+    max_rows, plan = guard_query(CROSS_JOIN_SQL, 51, pool=CannedPool())
+    assert max_rows == 51
+    assert plan == CROSS_JOIN_PLAN
+
+
+def test_guard_rejects_expensive_blocking_queries(canned_plan, settings):
+    canned_plan(CROSS_JOIN_PLAN + [(9, 0, "USE TEMP B-TREE FOR ORDER BY")])
+    with pytest.raises(QueryCostError, match="SCAN t"):
+        guard_query(CROSS_JOIN_SQL + " ORDER BY t.premiered", 51, pool=CannedPool())
+
+
+def test_guard_reject_action_never_caps(canned_plan, settings):
+    settings(COST_GUARD_ACTION="reject")
+    canned_plan(CROSS_JOIN_PLAN)
+    with pytest.raises(QueryCostError):
+        guard_query(CROSS_JOIN_SQL, 51, pool=CannedPool())
+
+
+def test_guard_threshold_and_switch(canned_plan, settings):
+    canned_plan([(2, 0, "SCAN t")])
+    settings(QUERY_COST_LIMIT=1_000_000, COST_GUARD_ACTION="reject")
+    with pytest.raises(QueryCostError):
+        guard_query("SELECT * FROM titles t", 51, pool=CannedPool())
+    settings(QUERY_COST_LIMIT=2_000_000, COST_GUARD_ACTION="reject")
+    assert guard_query("SELECT * FROM titles t", 51, pool=CannedPool())[0] is None
+    settings(COST_GUARD_ENABLED=False)
+    assert guard_query(CROSS_JOIN_SQL, 51, pool=CannedPool()) == (None, None)
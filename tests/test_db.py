@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+from app.db import (ConnectionPool, QueryStream, QueryTimeoutError, decode_page_token, encode_page_token,
+                    order_by_keys)
+
+ENDLESS_QUERY = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT x FROM c"
+
+
+@pytest.fixture
+def pool(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE titles (title_id INTEGER PRIMARY KEY, year INTEGER, rating REAL)")
+    conn.executemany("INSERT INTO titles VALUES (?, ?, ?)",
+                     [(i, 1990 + i % 7, None if i % 5 == 0 else i % 4) for i in range(1, 101)])
+    conn.commit()
+    conn.close()
+    pool = ConnectionPool(db_path, size=1)
+    yield pool
+    pool.close()
+
+
+def read_pages(pool, sql_query, limit):
+    rows, page_token, keyset_pages = [], None, 0
+    while True:
+        offset, after = decode_page_token(sql_query, page_token) if page_token else (0, None)
+        keyset_pages += after is not None
+        stream = QueryStream(sql_query, (), offset=offset, limit=limit, pool=pool, after=after)
+        rows += [tuple(row) for row in stream]
+        if stream.next_offset() is None:
+            return rows, keyset_pages
+        page_token = encode_page_token(sql_query, stream.next_offset(), after=stream.next_after())
+
+
+def test_order_by_keys():
+    assert order_by_keys("SELECT t.title_id, t.year FROM titles t ORDER BY t.year DESC, t.title_id") == \
+        [("year", True), ("title_id", False)]
+    assert order_by_keys("SELECT title_id AS id FROM titles ORDER BY id LIMIT 10") == [("id", False)]
+    for sql_query in ("SELECT title_id FROM titles", "SELECT title_id FROM titles ORDER BY 1",
+                      "SELECT year + 1 AS y FROM titles ORDER BY year + 1",
+                      "SELECT t.year AS y FROM titles t ORDER BY t.year",
+                      "SELECT year FROM titles UNION SELECT 1 ORDER BY year"):
+        assert order_by_keys(sql_query) is None
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT title_id, year FROM titles ORDER BY title_id",
+    "SELECT title_id, year FROM titles ORDER BY year DESC, title_id",
+    "SELECT title_id, rating FROM titles ORDER BY rating DESC",
+    "SELECT title_id, rating FROM titles ORDER BY rating, title_id DESC",
+])
+def test_keyset_pages_match_full_result(pool, sql_query):
+    full = [tuple(row) for row in QueryStream(sql_query, (), pool=pool)]
+    for limit in (1, 7, 30):
+        rows, keyset_pages = read_pages(pool, sql_query, limit)
+        assert rows == full
+        # Pages ending between two keys continue in SQL; ties fall back to skipping rows
+        if limit == 1:
+            assert keyset_pages > 0
+
+
+def test_nested_stream_keeps_outer_time_budget(pool):
+    outer = iter(QueryStream(ENDLESS_QUERY, (), pool=pool, timeout=0.2))
+    next(outer)
+    assert [tuple(row) for row in QueryStream("SELECT 1", (), pool=pool, timeout=5)] == [(1,)]
+    with pytest.raises(QueryTimeoutError):
+        for _ in outer:
+            pass
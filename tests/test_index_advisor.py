@@ -0,0 +1,15 @@
+from app.index_advisor import recommend_index
+
+PEOPLE_COLUMNS = ["person_id", "name", "born", "died"]
+
+
+def test_recommend_index_with_literals():
+    sql_query = "SELECT p.person_id, p.name FROM people p WHERE p.born = 1950 AND p.died > 2000"
+    assert recommend_index(sql_query, "people", "p", PEOPLE_COLUMNS) == ["born", "died", "person_id", "name"]
+
+
+def test_recommend_index_with_bind_parameters():
+    sql_query = "SELECT p.person_id, p.name FROM people p WHERE p.born = :born AND p.died > :died"
+    assert recommend_index(sql_query, "people", "p", PEOPLE_COLUMNS) == ["born", "died", "person_id", "name"]
+    sql_query = "SELECT p.person_id, p.name FROM people p WHERE p.born = ? AND p.died > ?"
+    assert recommend_index(sql_query, "people", "p", PEOPLE_COLUMNS) == ["born", "died", "person_id", "name"]
@@ -0,0 +1,138 @@
+import sqlite3
+
+import pytest
+
+from app.db import ConnectionPool
+from app.intent_router import (ACTOR_MOVIES_SQL, BEST_MIN_VOTES, DIRECTOR_MOVIES_SQL, PERSON_TITLES_SQL,
+                               PERSON_YEAR_COUNTS_SQL, IntentRouter, parse_period, person_year_counts_query)
+
+PEOPLE = [(1, "Tom Hanks"), (2, "Steven Spielberg"), (3, "Alexander Hamilton"), (4, "Jane Nobody")]
+TITLES = [
+    (1, "Big", "movie", 1988, "Comedy,Drama"),
+    (2, "Cast Away", "movie", 2000, "Adventure,Drama"),
+    (3, "The Terminal", "movie", 2004, "Comedy,Drama"),
+    (4, "Jaws", "movie", 1975, "Adventure,Thriller"),
+    (5, "Alexander Hamilton", "tvMovie", 1931, "Biography"),
+    (6, "Forrest Gump", "tvSeries", 1994, "Drama"),
+]
+CREW = [(1, 1, "actor"), (2, 1, "actor"), (3, 1, "actor"), (6, 1, "actor"), (4, 2, "director"),
+        (3, 2, "director"), (1, 2, "producer"), (5, 3, "actor")]
+
+
+@pytest.fixture
+def router(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE people (person_id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE titles (title_id INTEGER PRIMARY KEY, primary_title TEXT, type TEXT, premiered INTEGER,
+                             genres TEXT);
+        CREATE TABLE crew (title_id INTEGER, person_id INTEGER, category TEXT);
+        CREATE TABLE ratings (title_id INTEGER PRIMARY KEY, rating REAL, votes INTEGER);
+    """)
+    conn.executemany("INSERT INTO people VALUES (?, ?)", PEOPLE)
+    conn.executemany("INSERT INTO titles VALUES (?, ?, ?, ?, ?)", TITLES)
+    conn.executemany("INSERT INTO crew VALUES (?, ?, ?)", CREW)
+    conn.commit()
+    conn.close()
+    pool = ConnectionPool(db_path, size=1)
+    yield IntentRouter(pool=pool)
+    pool.close()
+
+
+@pytest.mark.parametrize("question, intent, template, name", [
+    ("movies with Tom Hanks", "actor_movies", ACTOR_MOVIES_SQL, "Tom Hanks"),
+    ("Show me all the films starring Tom Hanks?", "actor_movies", ACTOR_MOVIES_SQL, "Tom Hanks"),
+    ("movies directed by Steven Spielberg", "director_movies", DIRECTOR_MOVIES_SQL, "Steven Spielberg"),
+    ("Steven Spielberg directed films", "director_movies", DIRECTOR_MOVIES_SQL, "Steven Spielberg"),
+    ("Tom Hanks movies", "actor_movies", ACTOR_MOVIES_SQL, "Tom Hanks"),
+    ("Steven Spielberg's movies", "director_movies", DIRECTOR_MOVIES_SQL, "Steven Spielberg"),
+    ("chart of Tom Hanks movies by year", "person_movies_by_year", PERSON_YEAR_COUNTS_SQL, "Tom Hanks"),
+    ("movies with tom hanks", "actor_movies", ACTOR_MOVIES_SQL, "Tom Hanks"),
+])
+def test_person_questions_route_to_templates(router, question, intent, template, name):
+    route = router.route(question)
+    assert route is not None
+    assert route.intent == intent
+    assert route.sql_query == template.strip()
+    assert route.params == {"name": name}
+
+
+def test_name_in_other_case_is_less_confident(router):
+    assert router.route("movies with Tom Hanks").confidence == 1.0
+    assert router.route("movies with tom hanks").confidence == 0.9
+    assert IntentRouter(min_confidence=0.95, pool=router.pool).route("movies with tom hanks") is None
+
+
+@pytest.mark.parametrize("question, params", [
+    ("best movies from 2020", {"start_year": 2020, "end_year": 2020, "min_votes": BEST_MIN_VOTES}),
+    ("top rated films of the 1990s", {"start_year": 1990, "end_year": 1999, "min_votes": BEST_MIN_VOTES}),
+    ("best sci fi movies of the 80s", {"start_year": 1980, "end_year": 1989, "min_votes": BEST_MIN_VOTES,
+                                       "genre_pattern": "%Sci-Fi%"}),
+])
+def test_best_movies_binds_the_period(router, question, params):
+    route = router.route(question)
+    assert route.intent == "best_movies"
+    assert route.params == params
+    assert ("t.genres LIKE :genre_pattern" in route.sql_query) == ("genre_pattern" in params)
+    assert "{genre_filter}" not in route.sql_query
+
+
+def test_bare_name(router):
+    route = router.route("Tom Hanks")
+    assert (route.intent, route.params, route.confidence) == ("person_titles", {"name": "Tom Hanks"}, 0.9)
+    assert route.sql_query == PERSON_TITLES_SQL.strip()
+    # A name that is also a title is ambiguous and left to the LLM
+    assert router.route("Alexander Hamilton") is None
+
+
+@pytest.mark.parametrize("question", [
+    # Shapes the rules do not cover
+    "which movies did Tom Hanks and Steven Spielberg make together",
+    "how many movies has Tom Hanks made",
+    "Tom Hanks movies after 2000",
+    "movies with Tom Hanks rated above 7",
+    "best movies",
+    "best movies from the future",
+    # Names the people index does not know
+    "movies with Keanu Reeves",
+    "Keanu Reeves movies by year",
+    # Descriptions rather than names
+    "best sci fi movies",
+    "popular comedy movies",
+    "Tom",
+    # Career chart of a director counts the wrong credits
+    "Steven Spielberg movies by year",
+    # A person with no acting or directing credits
+    "Jane Nobody movies",
+    "",
+    "?",
+])
+def test_near_misses_fall_through(router, question):
+    assert router.route(question) is None
+
+
+def test_stats_count_routes_and_fallbacks(router):
+    router.route("movies with Tom Hanks")
+    router.route("movies with Keanu Reeves")
+    assert router.stats() == {"routed": 1, "fallbacks": 1, "routed_rate": 0.5, "by_intent": {"actor_movies": 1}}
+
+
+def test_person_year_counts_query_binds_the_name(router):
+    sql_query, params = person_year_counts_query("Tom Hanks")
+    assert params == {"name": "Tom Hanks"}
+    assert ":name" in sql_query and "Tom Hanks" not in sql_query
+    with router.pool.connection() as conn:
+        rows = [tuple(row) for row in conn.execute(sql_query, params)]
+        # Only movie acting credits, one row per year
+        assert rows == [(1988, 1), (2000, 1), (2004, 1)]
+        # A quote in the name is bound, not spliced into the SQL
+        assert conn.execute(*person_year_counts_query("Tom' OR '1'='1")).fetchall() == []
+
+
+@pytest.mark.parametrize("period, years", [
+    ("2020", (2020, 2020)), ("1990s", (1990, 1999)), ("90s", (1990, 1999)), ("'20s", (2020, 2029)),
+    ("1890", (1890, 1890)),
+])
+def test_parse_period(period, years):
+    assert parse_period(period) == years
@@ -0,0 +1,47 @@
+from app.nl_cache import SQLGenerationCache
+
+NOLAN_QUESTION = ("List all the comedy movies directed by Christopher Nolan released after the year 2000 "
+                  "sorted by rating")
+NOLAN_SQL = "SELECT t.primary_title FROM titles t WHERE t.genres LIKE '%Comedy%'"
+
+
+def nolan_cache():
+    cache = SQLGenerationCache()
+    cache.store(NOLAN_QUESTION, NOLAN_SQL, {})
+    return cache
+
+
+def test_exact_hit():
+    assert nolan_cache().lookup(NOLAN_QUESTION.upper() + "?") == (NOLAN_SQL, {})
+
+
+def test_near_duplicate_hit():
+    question = "Comedy movies directed by Christopher Nolan released after the year 2000, sorted by rating"
+    assert nolan_cache().lookup(question) == (NOLAN_SQL, {})
+
+
+def test_negation_never_hits():
+    cache = nolan_cache()
+    assert cache.lookup(NOLAN_QUESTION.replace("directed by", "not directed by")) is None
+    assert cache.lookup(NOLAN_QUESTION.replace("directed by", "isn't directed by")) is None
+    assert cache.lookup(NOLAN_QUESTION.replace("comedy movies", "movies without comedy")) is None
+
+
+def test_comparatives_never_hit():
+    cache = nolan_cache()
+    assert cache.lookup(NOLAN_QUESTION.replace("after", "before")) is None
+    assert cache.lookup(NOLAN_QUESTION + " highest first") is None
+
+
+def test_different_numbers_never_hit():
+    assert nolan_cache().lookup(NOLAN_QUESTION.replace("2000", "2001")) is None
+
+
+def test_decades_and_ordinals_never_hit():
+    # A threshold low enough for the shingles alone to match, so only the anchors tell them apart
+    cache = SQLGenerationCache(similarity_threshold=0.8)
+    question = "sci-fi movies from the 80s with at least 10000 votes and their directors"
+    cache.store(question, NOLAN_SQL, {})
+    assert cache.lookup("sci-fi movies from the 80s with at least 10000 votes, and directors") == (NOLAN_SQL, {})
+    assert cache.lookup(question.replace("80s", "90s")) is None
+    assert cache.lookup(question + " 2nd") is None
@@ -0,0 +1,27 @@
+import sqlite3
+
+from app.result_cache import ResultCache
+
+
+def make_cache(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    sqlite3.connect(db_path).close()
+    return ResultCache(db_path)
+
+
+def test_put_and_get(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("SELECT 1 AS n", 0, 10, [(1,)], ["n"], None)
+    assert cache.get("SELECT 1 AS n", 0, 10) == [[[1]], ["n"], None, None]
+
+
+def test_put_keeps_keyset_continuation(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("SELECT n FROM t ORDER BY n", 0, 1, [(1,)], ["n"], 1, next_after=([1], 1))
+    assert cache.get("SELECT n FROM t ORDER BY n", 0, 1) == [[[1]], ["n"], 1, [[1], 1]]
+
+
+def test_unserializable_page_is_skipped(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("SELECT x'00' AS b", 0, 10, [(b"\x00",)], ["b"], None)
+    assert cache.get("SELECT x'00' AS b", 0, 10) is None
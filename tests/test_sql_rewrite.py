@@ -0,0 +1,84 @@
+from app.sql_rewrite import rewrite_statement, table_references
+
+REWRITE_TABLES = {"people_fts", "titles_fts", "genres", "title_genres"}
+
+
+def test_table_references_bare_column_list():
+    assert table_references("SELECT title_id, primary_title FROM titles ORDER BY title_id") == {"titles": "titles"}
+    assert table_references("SELECT name, born FROM people WHERE born > 1950") == {"people": "people"}
+
+
+def test_table_references_qualified_column_list():
+    references = table_references(
+        "SELECT t.primary_title, r.rating FROM titles t JOIN ratings AS r ON r.title_id = t.title_id")
+    assert references == {"titles": "titles", "t": "titles", "ratings": "ratings", "r": "ratings"}
+
+
+def test_table_references_comma_separated_from_list():
+    references = table_references(
+        "SELECT p.name, t.primary_title FROM people p, crew c, titles AS t WHERE p.person_id = c.person_id")
+    assert references == {"people": "people", "p": "people", "crew": "crew", "c": "crew",
+                          "titles": "titles", "t": "titles"}
+
+
+def test_rewrite_fts_with_bare_column_list():
+    sql_query, params = rewrite_statement("SELECT name, born FROM people WHERE name LIKE '%Hanks%'", {},
+                                          REWRITE_TABLES)
+    assert "people_fts MATCH" in sql_query
+    assert "name LIKE '%Hanks%'" in sql_query
+    assert params == {}
+
+
+def test_rewrite_fts_with_qualified_column_list():
+    sql_query, _ = rewrite_statement("SELECT p.name, p.born FROM people p WHERE p.name LIKE '%Hanks%'", {},
+                                     REWRITE_TABLES)
+    assert "p.rowid IN (SELECT rowid FROM people_fts" in sql_query
+
+
+def test_rewrite_fts_keeps_negated_filters():
+    # NOT over a LIKE on a NULL name stays NULL; NOT over the FTS lookup would be true
+    for sql_query in ("SELECT p.name FROM people p WHERE NOT p.name LIKE '%Hanks%'",
+                      "SELECT t.primary_title FROM titles t WHERE NOT (t.premiered > 2000 AND "
+                      "t.primary_title LIKE '%Star%')"):
+        assert rewrite_statement(sql_query, {}, REWRITE_TABLES) == (sql_query, {})
+
+
+def test_rewrite_fts_keeps_computed_values():
+    sql_query = "SELECT p.name, p.name LIKE '%Hanks%' AS is_hanks FROM people p"
+    assert rewrite_statement(sql_query, {}, REWRITE_TABLES) == (sql_query, {})
+
+
+def test_rewrite_genre_with_bare_column_list():
+    sql_query, _ = rewrite_statement(
+        "SELECT primary_title, premiered FROM titles WHERE genres LIKE '%Comedy%'", {}, REWRITE_TABLES)
+    assert "title_genres" in sql_query
+
+
+def test_rewrite_genre_with_qualified_column_list():
+    sql_query, _ = rewrite_statement(
+        "SELECT t.primary_title, t.premiered FROM titles t WHERE t.genres LIKE '%Comedy%'", {}, REWRITE_TABLES)
+    assert "t.title_id IN (SELECT title_id FROM title_genres" in sql_query
+
+
+def test_rewrite_genre_keeps_negated_filters():
+    # NOT over a LIKE on a NULL genres column stays NULL; NOT over the lookup would be true
+    for sql_query in ("SELECT t.primary_title FROM titles t WHERE NOT t.genres LIKE '%Comedy%'",
+                      "SELECT t.primary_title FROM titles t WHERE NOT (t.premiered > 2000 AND t.genres LIKE '%Comedy%')"):
+        assert rewrite_statement(sql_query, {}, REWRITE_TABLES) == (sql_query, {})
+
+
+def test_rewrite_genre_keeps_computed_values():
+    sql_query = "SELECT t.primary_title, t.genres LIKE '%Comedy%' AS comedy FROM titles t"
+    assert rewrite_statement(sql_query, {}, REWRITE_TABLES) == (sql_query, {})
+
+
+def test_rewrite_genre_inside_condition():
+    sql_query, _ = rewrite_statement(
+        "SELECT t.primary_title FROM titles t WHERE t.primary_title = 'Not Funny' AND "
+        "(t.genres LIKE '%Comedy%' OR t.genres LIKE '%Drama%') ORDER BY t.premiered", {}, REWRITE_TABLES)
+    assert sql_query.count("t.title_id IN (SELECT title_id FROM title_genres") == 2
+
+
+def test_rewrite_leaves_statement_without_built_tables():
+    sql_query = "SELECT name, born FROM people WHERE name LIKE '%Hanks%'"
+    assert rewrite_statement(sql_query, {}, set()) == (sql_query, {})
@@ -0,0 +1,6 @@
+from app import create_app
+
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# The indexes are warmed once in the gunicorn master before it forks the workers, and
+# the workers share LOG_FILE, which is rotated externally rather than by each worker.
+app = create_app(warmup=False, shared_log_file=True)